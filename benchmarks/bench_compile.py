@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""Benchmark `Injector.compile` against `apply`, `eager_partial` & by hand.
+
+A compiled wrapper reads resolved values directly, and should approach the
+cost of calling the function with its arguments by hand. Run with plain
+Python from the repository root::
+
+    python benchmarks/bench_compile.py
+"""
+
+from __future__ import print_function
+
+import harness
+
+import jeni
+
+
+NOTES = (1, 10)
+NUMBER = 100000
+
+
+class Injector(jeni.Injector):
+    pass
+
+
+for i in range(max(NOTES)):
+    Injector.factory('note{}'.format(i), lambda: 'value')
+Injector.factory('echo', lambda name=None: name)
+
+
+def annotated(count, *extra):
+    """Annotated callable of `count` notes, and extra notes."""
+    notes = ['note{}'.format(i) for i in range(count)] + list(extra)
+    return jeni.annotate(*notes)(lambda *a: a)
+
+
+def make_apply(fn):
+    def make():
+        injector = Injector()
+        injector.apply(fn)
+        return lambda: injector.apply(fn)
+    return make
+
+
+def make_eager_partial(fn):
+    return lambda: Injector().eager_partial(fn)
+
+
+def make_compiled(fn):
+    def make():
+        compiled = Injector().compile(fn)
+        compiled()
+        return compiled
+    return make
+
+
+def make_by_hand(fn, count):
+    args = ('value',) * count
+    return lambda: lambda: fn(*args)
+
+
+def register(suite):
+    for count in NOTES:
+        fn = annotated(count)
+        number = max(1, NUMBER // count)
+        label = '{} notes, {}'.format(count, '{}')
+        suite.add(label.format('apply'), make_apply(fn), number)
+        suite.add(
+            label.format('eager_partial, call'), make_eager_partial(fn),
+            number)
+        suite.add(label.format('compiled'), make_compiled(fn), number)
+        suite.add(label.format('by hand'), make_by_hand(fn, count), number)
+    fn = annotated(10, 'echo:name')
+    suite.add('10 notes & get-by-name, apply', make_apply(fn), NUMBER // 10)
+    suite.add(
+        '10 notes & get-by-name, compiled', make_compiled(fn), NUMBER // 10)
+
+
+if __name__ == '__main__':
+    harness.main(register)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Benchmark `Injector.apply` latency with slow, independent providers.
+
+Each provider simulates a blocking network handshake on initialization.
+Compares sequential resolution to concurrent resolution with an executor.
+Run with plain Python 3 (or Python 2 with the futures backport) from the
+repository root::
+
+    python benchmarks/bench_concurrent.py
+"""
+
+from __future__ import print_function
+
+import time
+
+import harness
+
+import jeni
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
+
+LATENCY = 0.02
+PROVIDERS = (1, 2, 4, 8)
+NUMBER = 5
+
+
+def handshake():
+    time.sleep(LATENCY)
+    return object()
+
+
+def build(count):
+    """Build injector class & callable annotated with `count` slow notes."""
+    class Injector(jeni.Injector):
+        pass
+    notes = ['service{}'.format(i) for i in range(count)]
+    for note in notes:
+        Injector.factory(note, handshake)
+    fn = jeni.annotate(*notes)(lambda *services: services)
+    return Injector, fn
+
+
+def register(suite):
+    if ThreadPoolExecutor is None:
+        return
+    executor = ThreadPoolExecutor(max_workers=max(PROVIDERS))
+    for count in PROVIDERS:
+        Injector, fn = build(count)
+        label = 'apply {} slow providers, {}'.format(count, '{}')
+        suite.add(
+            label.format('sequential'),
+            lambda Injector=Injector, fn=fn: (
+                lambda: Injector().apply(fn)),
+            NUMBER)
+        suite.add(
+            label.format('concurrent'),
+            lambda Injector=Injector, fn=fn: (
+                lambda: Injector(executor=executor).apply(fn)),
+            NUMBER)
+
+
+if __name__ == '__main__':
+    harness.main(register)
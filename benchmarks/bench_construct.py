@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""Benchmark per-request injectors: construct, apply & close.
+
+Compares constructing a new injector per request to reusing injectors of an
+`InjectorPool` and to a `child` of an injector which already resolved all
+notes, and measures memory allocated per live injector, before and after
+one request's worth of resolution. Run with plain Python from the
+repository root::
+
+    python benchmarks/bench_construct.py
+"""
+
+from __future__ import print_function
+
+import harness
+
+import jeni
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+NUMBER = 100000
+LIVE = 10000
+
+
+class Injector(jeni.Injector):
+    pass
+
+
+class SlottedInjector(Injector):
+    __slots__ = ()
+
+
+Injector.value('config', {'debug': False})
+Injector.factory('request_id', lambda: 42)
+
+
+@jeni.annotate('config', 'request_id')
+def handler(config, request_id):
+    return request_id
+
+
+def fresh(injector_class):
+    def request():
+        injector = injector_class()
+        injector.apply(handler)
+        injector.close()
+    return request
+
+
+def pooled(injector_class):
+    pool = jeni.InjectorPool(injector_class)
+    def request():
+        injector = pool.acquire()
+        injector.apply(handler)
+        pool.release(injector)
+    return request
+
+
+def parent():
+    injector = Injector()
+    injector.apply(handler)
+    return injector
+
+
+def memory_per_injector(injector_class, apply=False):
+    """Bytes allocated per live injector."""
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    injectors = [injector_class() for _ in range(LIVE)]
+    if apply:
+        for injector in injectors:
+            injector.apply(handler)
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del injectors
+    return size / float(LIVE)
+
+
+def register(suite):
+    for label, make in (
+            ('fresh', lambda: fresh(Injector)),
+            ('fresh, slotted', lambda: fresh(SlottedInjector)),
+            ('pooled', lambda: pooled(Injector)),
+            ('pooled, slotted', lambda: pooled(SlottedInjector)),
+            ('child', lambda: fresh(parent().child)),
+            ('pooled child', lambda: pooled(parent().child))):
+        suite.add('construct+apply+close, ' + label, make, NUMBER)
+    if tracemalloc is None:
+        return
+    for label, injector_class in (
+            ('subclass', Injector),
+            ('slotted', SlottedInjector),
+            ('child', parent().child)):
+        for state, apply in (('idle', False), ('applied', True)):
+            suite.measure(
+                'memory per live injector, {}, {}'.format(label, state),
+                lambda c=injector_class, a=apply: memory_per_injector(c, a),
+                'bytes')
+
+
+if __name__ == '__main__':
+    harness.main(register)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Benchmark `Injector.get` & `Injector.close` against resolved providers.
+
+Each provider is resolved by name, which does not hit `Injector.values` and
+therefore records the provider in `Injector.get_order` on every get. Per-get
+cost should be flat as the number of resolved providers grows, and close
+should be linear in the number of resolved providers. Run with plain Python
+from the repository root::
+
+    python benchmarks/bench_get_order.py
+"""
+
+from __future__ import print_function
+
+import harness
+
+import jeni
+
+
+COUNTS = (10, 100, 1000, 10000)
+NUMBER = 100000
+
+
+def echo(name=None):
+    return name
+
+
+def generator():
+    yield 'value'
+
+
+def build_class(count):
+    """Build injector class with `count` factories & `count` generators."""
+    class Injector(jeni.Injector):
+        pass
+    for i in range(count):
+        Injector.factory('record{}'.format(i), echo)
+        Injector.provider('generator{}'.format(i), generator)
+    return Injector
+
+
+def build_injector(Injector, count, prefix='record', name=':name'):
+    """Build injector with `count` providers, all resolved once."""
+    injector = Injector()
+    for i in range(count):
+        injector.get('{}{}{}'.format(prefix, i, name))
+    return injector
+
+
+def register(suite):
+    for count in COUNTS:
+        Injector = build_class(count)
+        def make_get(Injector=Injector, count=count):
+            injector = build_injector(Injector, count)
+            # Get the most recently resolved note, worst case for a list scan.
+            note = 'record{}:name'.format(count - 1)
+            return lambda: injector.get(note)
+        suite.add('get by name, {} resolved'.format(count), make_get, NUMBER)
+
+        suite.add_cold(
+            'close, {} generators'.format(count),
+            lambda Injector=Injector, count=count: build_injector(
+                Injector, count, 'generator', ''),
+            lambda injector: injector.close(), max(1, 10000 // count))
+
+
+if __name__ == '__main__':
+    harness.main(register)
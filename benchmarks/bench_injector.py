@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""Benchmark hot paths of `Injector`: get, apply, partial & generators.
+
+Cold benchmarks time the first call on a new injector, such that providers
+are called; warm benchmarks time repeat calls, served by resolved values.
+Run with plain Python from the repository root::
+
+    python benchmarks/bench_injector.py
+"""
+
+from __future__ import print_function
+
+import harness
+
+import jeni
+
+
+NOTES = (1, 10, 50)
+NUMBER = 100000
+COLD = 20000
+
+
+class Injector(jeni.Injector):
+    pass
+
+
+class UncountedInjector(Injector):
+    stats_policy = jeni.STATS_OFF
+
+
+class SampledInjector(Injector):
+    stats_policy = 100
+
+
+Injector.value('value', 'value')
+Injector.factory('factory', lambda name=None: name)
+Injector.factory('memoized', lambda name=None: name, memoize=True)
+
+
+@Injector.provider('generator')
+def generator():
+    yield 'generator'
+
+
+for i in range(max(NOTES)):
+    Injector.factory('note{}'.format(i), lambda: 'value')
+
+
+@Injector.provider('kv')
+class KeyValueProvider(jeni.Provider):
+    def get(self, name=None):
+        return name
+
+
+@Injector.provider('kv_many')
+class KeyValueManyProvider(KeyValueProvider):
+    def get_many(self, names):
+        return names
+
+
+def annotated(count):
+    """Annotated callable of `count` notes."""
+    notes = ['note{}'.format(i) for i in range(count)]
+    return jeni.annotate(*notes)(lambda *a: a)
+
+
+def resolved(*notes):
+    """New injector, with given notes resolved."""
+    injector = Injector()
+    for note in notes:
+        injector.get(note)
+    return injector
+
+
+def make_apply_warm(count, instrument=None, injector_class=Injector):
+    fn = annotated(count)
+    def make():
+        injector = injector_class(instrument=instrument)
+        injector.apply(fn)
+        return lambda: injector.apply(fn)
+    return make
+
+
+def make_apply_names(basenote, count):
+    notes = ['{}:key{}'.format(basenote, i) for i in range(count)]
+    fn = jeni.annotate(*notes)(lambda *a: a)
+    def make():
+        injector = Injector()
+        return lambda: injector.apply(fn)
+    return make
+
+
+def make_partial_repeat():
+    partial = Injector().partial(annotated(10))
+    partial()
+    return partial
+
+
+def make_partial_repeat_kwargs():
+    notes = ['note{}'.format(i) for i in range(10)]
+    fn = jeni.annotate(*notes)(lambda *a, **kw: a)
+    partial = Injector().partial(fn, flag=True)
+    partial()
+    return lambda: partial(1, flag=False)
+
+
+def make_eager_partial():
+    fn = annotated(10)
+    injector = Injector()
+    return lambda: injector.eager_partial(fn)
+
+
+def init_close(injector):
+    injector.get('generator')
+    injector.close()
+
+
+def register(suite):
+    suite.add_cold('get, cold', Injector, lambda i: i.get('factory'), COLD)
+    get = resolved('factory').get
+    suite.add('get, warm', lambda: lambda: get('factory'), NUMBER)
+    suite.add(
+        'get by name', lambda: lambda: get('factory:name'), NUMBER)
+    suite.add(
+        'get by name, memoized', lambda: lambda: get('memoized:name'), NUMBER)
+    for count in NOTES:
+        suite.add_cold(
+            'apply {} notes, cold'.format(count), Injector,
+            lambda i, fn=annotated(count): i.apply(fn), max(1, COLD // count))
+        suite.add(
+            'apply {} notes, warm'.format(count),
+            make_apply_warm(count), max(1, NUMBER // count))
+    suite.add(
+        'apply 10 names, get', make_apply_names('kv', 10), NUMBER // 10)
+    suite.add(
+        'apply 10 names, get_many', make_apply_names('kv_many', 10),
+        NUMBER // 10)
+    partial_fn = annotated(10)
+    suite.add_cold(
+        'partial 10 notes, first call',
+        lambda: Injector().partial(partial_fn), lambda partial: partial(),
+        COLD)
+    suite.add('partial 10 notes, repeat call', make_partial_repeat, NUMBER)
+    suite.add(
+        'partial 10 notes, repeat call with kwargs',
+        make_partial_repeat_kwargs, NUMBER)
+    suite.add('eager_partial 10 notes', make_eager_partial, NUMBER // 10)
+    suite.add_cold('generator init & close', Injector, init_close, COLD)
+
+    for cls in (UncountedInjector, SampledInjector):
+        get_policy = cls().get
+        get_policy('factory')
+        suite.add(
+            'get, warm, stats {}'.format(cls.stats_policy),
+            lambda get_policy=get_policy: lambda: get_policy('factory'),
+            NUMBER)
+        suite.add(
+            'apply 10 notes, warm, stats {}'.format(cls.stats_policy),
+            make_apply_warm(10, injector_class=cls), NUMBER // 10)
+
+    instrument = jeni.Instrument()
+    get_timed = Injector(instrument=instrument).get
+    get_timed('factory')
+    suite.add(
+        'get, warm, instrumented', lambda: lambda: get_timed('factory'),
+        NUMBER)
+    suite.add(
+        'apply 10 notes, warm, instrumented',
+        make_apply_warm(10, instrument), NUMBER // 10)
+    suite.add_cold(
+        'generator init & close, instrumented',
+        lambda: Injector(instrument=instrument), init_close, COLD)
+
+
+if __name__ == '__main__':
+    harness.main(register)
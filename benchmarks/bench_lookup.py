@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""Benchmark `Injector.lookup` against depth of Injector subclass tree.
+
+Compares the flattened registry of `Injector.lookup` to a walk of the method
+resolution order, as `lookup` was implemented before registries were merged.
+Run with plain Python from the repository root::
+
+    python benchmarks/bench_lookup.py
+"""
+
+from __future__ import print_function
+
+import harness
+
+import jeni
+
+
+DEPTHS = (1, 5, 20, 100)
+NUMBER = 100000
+
+
+def build_tree(depth):
+    """Build Injector subclass chain of given depth, registering at base."""
+    cls = type('Injector0', (jeni.Injector,), {})
+    cls.value('base', 'base')
+    for level in range(1, depth):
+        cls = type('Injector{}'.format(level), (cls,), {})
+        cls.value('level{}'.format(level), level)
+    return cls
+
+
+def mro_lookup(cls, basenote):
+    """Look up note by walking the class tree on every call."""
+    for c in cls.mro():
+        if 'provider_registry' not in vars(c):
+            continue
+        if basenote in c.provider_registry:
+            return c.provider_registry[basenote]
+    raise LookupError(repr(basenote))
+
+
+def register(suite):
+    for depth in DEPTHS:
+        cls = build_tree(depth)
+        suite.add(
+            'lookup, depth {}'.format(depth),
+            lambda cls=cls: lambda: cls.lookup('base'), NUMBER)
+        suite.add(
+            'lookup by mro walk, depth {}'.format(depth),
+            lambda cls=cls: lambda: mro_lookup(cls, 'base'), NUMBER)
+
+
+if __name__ == '__main__':
+    harness.main(register)
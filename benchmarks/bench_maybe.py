@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""Benchmark `maybe` notes which are mostly absent, i.e. miss-heavy apply.
+
+Handlers commonly annotate optional dependencies with `annotate.maybe`, of
+which most are not registered, or are unset. Compares apply with all maybe
+notes present to apply with maybe notes missing. Run with plain Python from
+the repository root::
+
+    python benchmarks/bench_maybe.py
+"""
+
+from __future__ import print_function
+
+import harness
+
+import jeni
+
+
+NOTES = (1, 10)
+NUMBER = 100000
+
+
+class Injector(jeni.Injector):
+    pass
+
+
+for i in range(max(NOTES)):
+    Injector.value('present{}'.format(i), i)
+
+
+@Injector.provider('unset')
+class UnsetProvider(jeni.Provider):
+    def get(self, name=None):
+        raise jeni.UnsetError()
+
+
+def annotated(notes):
+    """Annotated callable with a maybe keyword note per note."""
+    keyword_notes = dict(
+        ('arg{}'.format(i), jeni.maybe(note)) for i, note in enumerate(notes))
+    return jeni.annotate(**keyword_notes)(lambda **kw: kw)
+
+
+def make_apply(fn, injector_class=Injector):
+    def make():
+        injector = injector_class()
+        injector.apply(fn)
+        return lambda: injector.apply(fn)
+    return make
+
+
+def register(suite):
+    for count in NOTES:
+        number = max(1, NUMBER // count)
+        label = 'apply {} maybe notes, {}'.format(count, '{}')
+        present = annotated(['present{}'.format(i) for i in range(count)])
+        suite.add(label.format('present'), make_apply(present), number)
+        missing = annotated(['missing{}'.format(i) for i in range(count)])
+        suite.add(label.format('missing'), make_apply(missing), number)
+        unset = annotated(['unset:{}'.format(i) for i in range(count)])
+        suite.add(label.format('unset'), make_apply(unset), number)
+    get = Injector().get
+    suite.add(
+        'get missing, catch LookupError',
+        lambda: lambda: catch(get, 'missing'), NUMBER)
+    if hasattr(jeni.Injector, 'try_get'):
+        try_get = Injector().try_get
+        suite.add(
+            'try_get missing', lambda: lambda: try_get('missing'), NUMBER)
+
+
+def catch(get, note):
+    try:
+        return get(note)
+    except LookupError:
+        return None
+
+
+if __name__ == '__main__':
+    harness.main(register)
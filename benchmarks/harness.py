@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""Harness of jeni benchmarks, reporting ops/sec & ns/call.
+
+Each ``bench_*.py`` module in this directory defines ``register(suite)`` to
+add its benchmarks to a `Suite`, and runs alone with ``harness.main``. Run
+all benchmarks with plain Python from the repository root::
+
+    python benchmarks/harness.py
+    python benchmarks/harness.py --json results.json get apply
+
+Positional arguments select benchmarks by substring of name. Use ``--scale``
+to multiply the number of calls, e.g. ``--scale 0.1`` for a quick run. JSON
+output includes the git commit, if any, to compare results across commits.
+"""
+
+from __future__ import print_function
+
+import argparse
+import glob
+import importlib
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+sys.path.insert(0, ROOT)
+
+import jeni
+
+
+class Suite(object):
+    """Collects benchmarks, then times each with warm-up and repeats.
+
+    A benchmark is a `make` function returning the callable to time. Setup
+    which must not be timed goes in `make`, which is called once to warm up
+    and once per repeat::
+
+        injector = Injector()
+        suite.add('get', lambda: lambda: injector.get('note'))
+
+    A benchmark of a first call (e.g. a get on a new injector) sets up a new
+    object per call, outside of the timed loop, see `add_cold`::
+
+        suite.add_cold('get, cold', Injector, lambda i: i.get('note'))
+    """
+
+    def __init__(self, repeat=5, scale=1.0, selected=()):
+        self.repeat = repeat
+        self.scale = scale
+        self.selected = selected
+        self.benchmarks = []
+        self.results = []
+
+    def add(self, name, make, number=10000):
+        """Add benchmark timing `number` calls of the callable from `make`."""
+        self.benchmarks.append((name, lambda number: make(), number, None))
+
+    def add_cold(self, name, setup, fn, number=10000):
+        """Add benchmark timing `fn(obj)`, with a new `obj = setup()` per call.
+        """
+        def make(number):
+            objs = iter([setup() for _ in range(number)])
+            return lambda: fn(next(objs))
+        self.benchmarks.append((name, make, number, None))
+
+    def measure(self, name, fn, unit):
+        """Add measurement other than time, e.g. memory, as `fn()` in unit."""
+        self.benchmarks.append((name, fn, None, unit))
+
+    def is_selected(self, name):
+        if not self.selected:
+            return True
+        return any(pattern in name for pattern in self.selected)
+
+    def run(self, out=sys.stdout):
+        """Run selected benchmarks in order added, printing as results come.
+        """
+        print('{:<44} {:>14} {:>14} {:>14}'.format(
+            'benchmark', 'ops/sec', 'best ns', 'median ns'), file=out)
+        for name, make, number, unit in self.benchmarks:
+            if not self.is_selected(name):
+                continue
+            if unit is not None:
+                result = {'name': name, 'value': make(), 'unit': unit}
+                print('{:<44} {:>14,.1f} {}'.format(
+                    name, result['value'], unit), file=out)
+            else:
+                number = max(1, int(number * self.scale))
+                result = self.time(name, make, number)
+                print('{:<44} {:>14,.0f} {:>14,.1f} {:>14,.1f}'.format(
+                    name, result['ops_per_sec'],
+                    result['best_ns'], result['median_ns']), file=out)
+            out.flush()
+            self.results.append(result)
+        return self.results
+
+    def time(self, name, make, number):
+        """Time a benchmark, with a warm-up of up to 1000 calls."""
+        warmup = min(number, 1000)
+        fn = make(warmup)
+        for _ in itertools.repeat(None, warmup):
+            fn()
+        timer = timeit.default_timer
+        times = []
+        for _ in range(self.repeat):
+            fn = make(number)
+            start = timer()
+            for _ in itertools.repeat(None, number):
+                fn()
+            times.append((timer() - start) / number)
+        times.sort()
+        best = times[0]
+        return {
+            'name': name,
+            'number': number,
+            'repeat': self.repeat,
+            'best_ns': best * 1e9,
+            'median_ns': times[len(times) // 2] * 1e9,
+            'ops_per_sec': 1.0 / best if best else float('inf'),
+        }
+
+    def dump(self, path):
+        """Write results as JSON, with context to compare across runs."""
+        document = {
+            'commit': git_commit(),
+            'jeni': jeni.__version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'results': self.results,
+        }
+        with open(path, 'w') as fd:
+            json.dump(document, fd, indent=2, sort_keys=True)
+            fd.write('\n')
+
+
+def git_commit():
+    """Commit of the repository checkout, or None if unavailable."""
+    try:
+        with open(os.devnull, 'w') as devnull:
+            output = subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], cwd=ROOT, stderr=devnull)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('ascii').strip()
+
+
+def discover():
+    """Import all benchmark modules, returning their register functions."""
+    sys.path.insert(0, HERE)
+    registers = []
+    for path in sorted(glob.glob(os.path.join(HERE, 'bench_*.py'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        registers.append(importlib.import_module(name).register)
+    return registers
+
+
+def main(*registers, **kw):
+    """Run benchmarks of given register functions, or of all modules."""
+    argv = kw.pop('argv', None)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('names', nargs='*', help='select by substring')
+    parser.add_argument('--json', help='write results to JSON file')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    suite = Suite(repeat=args.repeat, scale=args.scale, selected=args.names)
+    for register in registers or discover():
+        register(suite)
+    suite.run()
+    if args.json:
+        suite.dump(args.json)
+    return suite
+
+
+if __name__ == '__main__':
+    main()
@@ -8,17 +8,37 @@ __version__ = '0.3.6-dev'
 
 import abc
 import collections
+import contextlib
 import functools
 import inspect
+import itertools
+import json
+import keyword
+import os
 import re
 import sys
+import threading
+import timeit
 
 import six
 
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 
 MAYBE = 'maybe'
 PARTIAL = 'partial'
 EAGER_PARTIAL = 'eager_partial'
+LAZY = 'lazy'
+GET_MANY = 'get_many'
+SINGLETON = 'singleton'
+PER_INJECTOR = 'per_injector'
+TRANSIENT = 'transient'
+SCOPES = (SINGLETON, PER_INJECTOR, TRANSIENT)
+STATS_OFF = 'off'
+STATS_FULL = 'full'
 WRAPPER_ASSIGNMENTS = functools.WRAPPER_ASSIGNMENTS + ('__notes__',)
 
 
@@ -44,6 +64,13 @@ class Provider(object):
         get-by-name pattern is useful for providers which have a dependency
         which supports lookups by key (e.g. HTTP headers or records in a
         key-value store).
+
+        Providers which look up many names at once, e.g. in a single round
+        trip to a key-value store, implement ``get_many(names)`` to return a
+        sequence of values in order of names. An injector calls `get_many`
+        once for all get-by-name notes of a callable which share a basenote,
+        see `Injector.get_many`, and calls `get` per name otherwise. A
+        `get_many` which raises LookupError falls back to `get` per name.
         """
 
     def close(self):
@@ -198,7 +225,8 @@ class Annotator(object):
         Notes which are provided to `annotate` (above 'foo' and 'bar') can be
         any hashable object (i.e. object able to be used as a key in a dict)
         and is not limited to strings. If tuples are used as notes, they must
-        be of length 2, and `('maybe', ...)` and `('partial', ...)` are
+        be of length 2, and `('maybe', ...)`, `('partial', ...)`,
+        `('eager_partial', ...)` and `('lazy', ...)` are
         reserved.
         """
         if not keyword_notes and len(notes) == 1 and is_callable(notes[0]):
@@ -306,22 +334,1048 @@ class Annotator(object):
         """
         return (EAGER_PARTIAL, (__fn, a, tuple(kw.items())))
 
+    @staticmethod
+    def lazy(note):
+        """Wrap a note for injection of a proxy which resolves on first use.
+
+        The note is not resolved on apply; the injected `LazyProxy` resolves
+        the note on first attribute access or call, and then forwards to the
+        resolved object. Use for dependencies which are expensive to resolve
+        and only used on some code paths::
+
+            from jeni import annotate
+
+            @annotate('foo', report=annotate.lazy('report_service'))
+            def handler(foo, report):
+                if foo.wants_report:
+                    report.send() # 'report_service' is resolved here.
+
+        The provider of a lazy note is opened (and later closed by the
+        injector) only if the proxy is used. A proxy used after its injector
+        is closed raises RuntimeError.
+        """
+        return (LAZY, note)
+
 
 annotate = Annotator()
 wraps = annotate.wraps
 maybe = annotate.maybe
 partial = annotate.partial
 eager_partial = annotate.eager_partial
+lazy = annotate.lazy
+
+
+class Note(object):
+    """Parsed note, ``'object:name'`` as `basenote` with an optional `name`.
+
+    Notes are interned on parse, such that each note in a process is parsed
+    exactly once; `Note.parse` of a note already parsed is a dict lookup::
+
+        note = Note.parse('hello:world')
+        note.basenote, note.name # ('hello', 'world')
+        note is Note.parse('hello:world') # True
+
+    Injector methods which take a note accept either the original note or
+    its parsed `Note`. Any hashable object is supported as a note; notes which
+    are not strings parse to a `basenote` of the note itself. Tuple notes must
+    be of length 2, parsing into ``(basenote, name)``. The `mode` of a partial
+    note is `PARTIAL` or `EAGER_PARTIAL`, `LAZY` for a lazy note, and None for
+    all other notes.
+    """
+    __slots__ = ('note', 'basenote', 'name', 'mode')
+
+    re_note = re.compile(r'^(.*?)(?::(.*))?$') # annotation is 'object:name'
+
+    #: Intern table, note -> Note, shared process-wide.
+    #: The table is cleared when it reaches `intern_size`.
+    interned = {}
+    intern_size = 4096
+
+    def __init__(self, note, basenote, name=None, mode=None):
+        self.note = note
+        self.basenote = basenote
+        self.name = name
+        self.mode = mode
+
+    @classmethod
+    def parse(cls, note):
+        """Parse note into an interned `Note`, passing through parsed notes."""
+        if isinstance(note, Note):
+            return note
+        try:
+            return cls.interned[note]
+        except KeyError:
+            pass
+        except TypeError:
+            # Note is not hashable and cannot be interned.
+            return cls.from_note(note)
+        parsed = cls.from_note(note)
+        if len(cls.interned) >= cls.intern_size:
+            cls.interned.clear()
+        cls.interned[note] = parsed
+        return parsed
+
+    @classmethod
+    def from_note(cls, note):
+        """Parse note into a new `Note`, without interning."""
+        if isinstance(note, tuple):
+            if len(note) != 2:
+                raise ValueError('tuple annotations must be length 2')
+            if note[0] in (PARTIAL, EAGER_PARTIAL, LAZY):
+                return cls(note, note[0], note[1], mode=note[0])
+            return cls(note, note[0], note[1])
+        try:
+            match = cls.re_note.match(note)
+        except TypeError:
+            # Note is not a string. Support any Python object as a note.
+            return cls(note, note)
+        return cls(note, *match.groups())
+
+    def __eq__(self, other):
+        if not isinstance(other, Note):
+            return NotImplemented
+        return self.note == other.note
+
+    def __ne__(self, other):
+        if not isinstance(other, Note):
+            return NotImplemented
+        return self.note != other.note
+
+    def __hash__(self):
+        return hash(self.note)
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.note)
+
+
+class InjectionPlan(
+        collections.namedtuple('InjectionPlan', 'args kwargs batches')):
+    """Immutable, pre-parsed form of the notes of an annotated callable.
+
+    `args` is a tuple of `Note` for positional notes, and `kwargs` is a tuple
+    of ``(arg, note, maybe)`` for keyword notes, where `maybe` records whether
+    the note was wrapped with `annotate.maybe`. `batches` groups get-by-name
+    notes which share a basenote, see `group_batches`.
+
+    Plans are compiled once per callable by `Injector.get_plan`, such that
+    repeat injections only pay for resolving values.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def compile(cls, notes, keyword_notes):
+        """Compile notes into a plan."""
+        args = tuple(Note.parse(note) for note in notes)
+        kwargs = []
+        for arg in keyword_notes:
+            note = keyword_notes[arg]
+            maybe = False
+            if isinstance(note, tuple) and len(note) == 2 and note[0] == MAYBE:
+                note, maybe = note[1], True
+            kwargs.append((arg, Note.parse(note), maybe))
+        batches = cls.group_batches(args + tuple(n for _, n, _ in kwargs))
+        return cls(args, tuple(kwargs), batches)
+
+    @staticmethod
+    def group_batches(notes):
+        """Group get-by-name notes by basenote, for `Provider.get_many`.
+
+        Returns a tuple of groups of notes, with a group per basenote of more
+        than one distinct name.
+        """
+        groups = collections.OrderedDict()
+        for note in notes:
+            if note.mode is not None or note.name is None:
+                continue
+            try:
+                group = groups.setdefault(note.basenote, [])
+            except TypeError:
+                # Basenote is not hashable; get by name one at a time.
+                continue
+            if note not in group:
+                group.append(note)
+        return tuple(
+            tuple(group) for group in groups.values() if len(group) > 1)
+
+
+class OrderedSet(object):
+    """Insertion-ordered set, with constant-time membership and add.
+
+    Injectors record the order in which providers are first resolved with an
+    ordered set, in order to close providers in reverse order.
+    """
+    __slots__ = ('items', 'members')
+
+    def __init__(self, iterable=()):
+        self.items = []
+        self.members = set()
+        for item in iterable:
+            self.add(item)
+
+    def add(self, item):
+        """Add item if not already a member, keeping first insertion order."""
+        if item not in self.members:
+            self.members.add(item)
+            self.items.append(item)
+
+    def __contains__(self, item):
+        return item in self.members
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __reversed__(self):
+        return reversed(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def clear(self):
+        """Remove all items."""
+        del self.items[:]
+        self.members.clear()
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.items)
+
+
+class ThreadStats(Mapping):
+    """Statistics for resolved notes, note -> count, counted per thread.
+
+    Thread-safe injectors count requests per thread, such that threads do not
+    contend on shared counts. Reads merge the counts of all threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.counters = []
+
+    def add(self, note, count=1):
+        """Count a request for note in the current thread."""
+        try:
+            counts = self.local.counts
+        except AttributeError:
+            counts = self.local.counts = collections.defaultdict(int)
+            with self.lock:
+                self.counters.append(counts)
+        counts[note] += count
+
+    def merged(self):
+        """Merge counts of all threads into a single dict."""
+        merged = collections.defaultdict(int)
+        for counts in list(self.counters):
+            for note, count in counts.copy().items():
+                merged[note] += count
+        return merged
+
+    def clear(self):
+        """Reset counts of all threads."""
+        with self.lock:
+            for counts in self.counters:
+                counts.clear()
+
+    def __getitem__(self, note):
+        return sum(counts.get(note, 0) for counts in list(self.counters))
+
+    def __contains__(self, note):
+        return any(note in counts for counts in list(self.counters))
+
+    def __iter__(self):
+        return iter(self.merged())
+
+    def __len__(self):
+        return len(self.merged())
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, dict(self.merged()))
+
+
+class StatsAggregate(Mapping):
+    """Statistics of many injectors, note -> count, aggregated process-wide.
+
+    Set as `Injector.stats_aggregate` of an injector class, such that each
+    injector adds its `stats` on close, in order to read counts per request
+    across many short-lived injectors without keeping them alive::
+
+        from jeni import Injector as BaseInjector, StatsAggregate
+
+        class Injector(BaseInjector):
+            stats_aggregate = StatsAggregate()
+
+        Injector.stats_aggregate.mean('session') # Requests per injector.
+
+    Partial notes are counted by the name of the partially applied function,
+    in order to not keep functions alive.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = collections.defaultdict(int)
+        #: Number of injectors added.
+        self.injectors = 0
+
+    def add(self, stats):
+        """Add stats of an injector, note -> count."""
+        stats = [(self.key(note), count) for note, count in stats.items()]
+        with self.lock:
+            self.injectors += 1
+            for key, count in stats:
+                self.counts[key] += count
+
+    @staticmethod
+    def key(note):
+        """Key of a note in the aggregate, naming functions of partials."""
+        if isinstance(note, tuple) and len(note) == 2 and (
+                note[0] in (PARTIAL, EAGER_PARTIAL)):
+            fn = note[1][0]
+            return (note[0], getattr(fn, '__name__', repr(fn)))
+        return note
+
+    def mean(self, note):
+        """Mean count of note per injector added."""
+        with self.lock:
+            if not self.injectors:
+                return 0.0
+            return self.counts.get(note, 0) / float(self.injectors)
+
+    def clear(self):
+        """Reset counts & number of injectors."""
+        with self.lock:
+            self.counts.clear()
+            self.injectors = 0
+
+    def __getitem__(self, note):
+        return self.counts.get(note, 0)
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.counts))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __repr__(self):
+        with self.lock:
+            counts = dict(self.counts)
+        return '{}({!r}, injectors={!r})'.format(
+            self.__class__.__name__, counts, self.injectors)
+
+
+class Memo(object):
+    """Values got by name for a single basenote, bounded with LRU eviction.
+
+    An injector memoizes get-by-name of notes registered with `memoize`,
+    such that a repeat get of 'note:name' does not call the provider again.
+    Once `maxsize` names are memoized, the least recently used is evicted.
+    Counts of hits & misses measure the hit rate, see `as_dict`.
+    """
+    __slots__ = ('maxsize', 'values', 'hits', 'misses', 'lock')
+
+    #: Returned by `lookup` for a name which is not memoized.
+    missing = object()
+
+    def __init__(self, maxsize, thread_safe=False):
+        self.maxsize = maxsize
+        self.values = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock() if thread_safe else None
+
+    def lookup(self, name):
+        """Value memoized for name, else `missing`, counting hit or miss."""
+        if self.lock is not None:
+            with self.lock:
+                return self._lookup(name)
+        return self._lookup(name)
+
+    def _lookup(self, name):
+        values = self.values
+        try:
+            value = values.pop(name)
+        except KeyError:
+            self.misses += 1
+            return Memo.missing
+        # Reinsert as most recently used.
+        values[name] = value
+        self.hits += 1
+        return value
+
+    def put(self, name, value):
+        """Memoize value for name, evicting the least recently used name."""
+        if self.lock is not None:
+            with self.lock:
+                return self._put(name, value)
+        return self._put(name, value)
+
+    def _put(self, name, value):
+        values = self.values
+        values[name] = value
+        if len(values) > self.maxsize:
+            values.popitem(last=False)
+
+    def as_dict(self):
+        """Memo stats as a dict, including hit rate."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits, 'misses': self.misses,
+            'size': len(self.values), 'maxsize': self.maxsize,
+            'hit_rate': self.hits / float(total) if total else 0.0}
+
+    def __repr__(self):
+        return '{}(maxsize={!r}, hits={!r}, misses={!r})'.format(
+            self.__class__.__name__, self.maxsize, self.hits, self.misses)
+
+
+class Timing(object):
+    """Count, total & maximum of durations in seconds, see `Instrument`."""
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed):
+        """Record a duration in seconds."""
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    def as_dict(self):
+        """Timing as a dict, including mean duration."""
+        mean = self.total / self.count if self.count else 0.0
+        return {
+            'count': self.count, 'total': self.total, 'max': self.max,
+            'mean': mean}
+
+    def __repr__(self):
+        return '{}(count={!r}, total={!r}, max={!r})'.format(
+            self.__class__.__name__, self.count, self.total, self.max)
+
+
+class NoteTimings(object):
+    """Timings of a single basenote, see `Instrument`."""
+    __slots__ = ('init', 'get_cold', 'get_warm', 'close', 'errors', 'unset')
+
+    def __init__(self):
+        self.init = Timing()
+        self.get_cold = Timing()
+        self.get_warm = Timing()
+        self.close = Timing()
+        self.errors = 0
+        self.unset = 0
+
+    def as_dict(self):
+        """Timings as a dict of dicts, see `Instrument.snapshot`."""
+        return {
+            'init': self.init.as_dict(),
+            'get_cold': self.get_cold.as_dict(),
+            'get_warm': self.get_warm.as_dict(),
+            'close': self.close.as_dict(),
+            'errors': self.errors,
+            'unset': self.unset,
+        }
+
+
+class Instrument(object):
+    """Records latency of resolving notes, per basenote.
+
+    Pass an instrument to injectors to record, for each basenote, the time
+    to initialize its provider instance (provider class or generator), the
+    time of each get split into cold (calls the provider) and warm (served
+    from resolved values), the time to close its provider, and counts of
+    errors and of `UnsetError`::
+
+        instrument = Instrument()
+        with Injector(instrument=instrument) as injector:
+            injector.apply(handler)
+        instrument.snapshot()['database']['get_cold']['max']
+
+    Get times are inclusive of resolving the dependencies of a provider. An
+    instrument is thread-safe and can be shared by many injectors (e.g. per
+    request) to aggregate their timings. Injectors without an instrument do
+    not measure anything.
+
+    Hooks are called after each get and close, with the note requested or
+    the basenote closed, the duration in seconds, and the exception raised
+    if any. Resolve hooks get whether the get was cold::
+
+        def on_resolve(note, elapsed, cold, exc):
+            if elapsed > 0.1:
+                log.warning('slow dependency: %s', note)
+
+        instrument = Instrument(on_resolve=on_resolve)
+    """
+
+    #: Clock in seconds, for durations.
+    clock = staticmethod(timeit.default_timer)
+
+    def __init__(self, on_resolve=None, on_close=None):
+        self.on_resolve = on_resolve
+        self.on_close = on_close
+        self.lock = threading.Lock()
+        self.notes = {}
+
+    def timings(self, basenote):
+        # Get timings of basenote, to update while holding `lock`.
+        timings = self.notes.get(basenote)
+        if timings is None:
+            timings = self.notes[basenote] = NoteTimings()
+        return timings
+
+    def record_get(self, note, start, end, cold, exc=None):
+        """Record a get of a parsed note, from start to end of `clock`."""
+        elapsed = end - start
+        with self.lock:
+            timings = self.timings(note.basenote)
+            if exc is None:
+                (timings.get_cold if cold else timings.get_warm).add(elapsed)
+            elif isinstance(exc, UnsetError):
+                timings.unset += 1
+            else:
+                timings.errors += 1
+        if self.on_resolve is not None:
+            self.on_resolve(note.note, elapsed, cold, exc)
+
+    def record_init(self, basenote, start, end):
+        """Record initialization of a provider instance."""
+        with self.lock:
+            self.timings(basenote).init.add(end - start)
+
+    def record_resolve(self, note, kind, start, end):
+        """Record a call of the resolver of a kind of provider, see `Tracer`.
+
+        Resolution is already recorded by `record_get`; this is a no-op.
+        """
+
+    def record_close(self, basenote, start, end, exc=None):
+        """Record close of a provider instance."""
+        elapsed = end - start
+        with self.lock:
+            timings = self.timings(basenote)
+            if exc is None:
+                timings.close.add(elapsed)
+            else:
+                timings.errors += 1
+        if self.on_close is not None:
+            self.on_close(basenote, elapsed, exc)
+
+    def snapshot(self):
+        """Copy of timings as plain dicts, basenote -> timings.
+
+        Timings of each basenote have keys 'init', 'get_cold', 'get_warm' and
+        'close', each a dict of 'count', 'total', 'max' & 'mean' in seconds,
+        as well as the counts 'errors' and 'unset'.
+        """
+        with self.lock:
+            return dict(
+                (basenote, timings.as_dict())
+                for basenote, timings in self.notes.items())
+
+    def reset(self):
+        """Discard all timings."""
+        with self.lock:
+            self.notes = {}
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, sorted(self.notes))
+
+
+class Tracer(Instrument):
+    """Instrument which records nested spans in Chrome trace-event format.
+
+    In addition to the timings of `Instrument`, a tracer records a span for
+    each get, each call of a provider's resolver, each initialization of a
+    provider instance and each close, with its note, kind of provider,
+    duration and thread. Write the spans as a JSON trace to open in Chrome's
+    ``about:tracing`` or in Perfetto, to view the resolution tree as flames::
+
+        tracer = Tracer()
+        with Injector(instrument=tracer) as injector:
+            injector.apply(handler)
+        tracer.dump('trace.json')
+
+    Only the last `max_events` spans are kept. Spans of an `AsyncInjector`
+    share the thread of the event loop, such that concurrent resolutions
+    overlap in view.
+    """
+
+    def __init__(self, on_resolve=None, on_close=None, max_events=100000):
+        super(Tracer, self).__init__(on_resolve=on_resolve, on_close=on_close)
+        self.events = collections.deque(maxlen=max_events)
+        self.threads = {}
+        self.origin = self.clock()
+        self.pid = os.getpid()
+
+    def span(self, name, category, start, end, args):
+        """Record a complete event, with times of `clock`."""
+        thread = threading.current_thread()
+        tid = thread.ident
+        if tid not in self.threads:
+            self.threads[tid] = thread.name
+        self.events.append({
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': (start - self.origin) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': self.pid,
+            'tid': tid,
+            'args': args,
+        })
+
+    @staticmethod
+    def label(note):
+        """Label of a note in the trace, its repr unless a string."""
+        if isinstance(note, six.string_types):
+            return note
+        return repr(note)
+
+    def record_get(self, note, start, end, cold, exc=None):
+        label = self.label(note.note)
+        args = {'note': label, 'cold': cold}
+        if exc is not None:
+            args['error'] = repr(exc)
+        self.span('get ' + label, 'get', start, end, args)
+        super(Tracer, self).record_get(note, start, end, cold, exc)
+
+    def record_init(self, basenote, start, end):
+        label = self.label(basenote)
+        args = {'note': label}
+        self.span('init ' + label, 'init', start, end, args)
+        super(Tracer, self).record_init(basenote, start, end)
+
+    def record_resolve(self, note, kind, start, end):
+        label = self.label(note.note)
+        args = {'note': label, 'kind': kind}
+        self.span(kind + ' ' + label, 'resolve', start, end, args)
+
+    def record_close(self, basenote, start, end, exc=None):
+        label = self.label(basenote)
+        args = {'note': label}
+        if exc is not None:
+            args['error'] = repr(exc)
+        self.span('close ' + label, 'close', start, end, args)
+        super(Tracer, self).record_close(basenote, start, end, exc)
+
+    def trace(self):
+        """Trace as a dict in Chrome trace-event format."""
+        events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid,
+             'args': {'name': name}}
+            for tid, name in list(self.threads.items())]
+        events.extend(list(self.events))
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path):
+        """Write trace as JSON to path, see `trace`."""
+        with open(path, 'w') as fd:
+            json.dump(self.trace(), fd)
+
+    def reset(self):
+        """Discard all timings and spans."""
+        super(Tracer, self).reset()
+        self.events.clear()
+
+
+class Registration(object):
+    """Provider as registered with an Injector, classified once by kind.
+
+    The kind of a registration determines how an injector resolves it, with a
+    dedicated resolver per kind (see `Injector.resolvers`), such that
+    resolution does not need to inspect the provider on every get:
+
+    * `VALUE` -- a scalar value, see `Injector.value`.
+    * `FACTORY` -- a function or object with a `get` method.
+    * `ANNOTATED_FACTORY` -- as `FACTORY`, with annotations to inject.
+    * `PROVIDER_CLASS` -- a class, instantiated once per injector.
+    * `ANNOTATED_PROVIDER_CLASS` -- as `PROVIDER_CLASS`, with annotated init.
+    * `GENERATOR` -- a generator function, see `GeneratorProvider`.
+    * `NAME_GENERATOR` -- as `GENERATOR`, with support for get-by-name.
+
+    `fn` is the function to call for factories and `annotated_get` records
+    whether the `get` method of a provider class is annotated. `scope` is the
+    lifetime of the provided value, see `Injector.provider`. `memoize` is the
+    maximum number of values got by name to memoize per injector, see `Memo`,
+    or 0 to call the provider on every get-by-name. `timeout` is the limit in
+    seconds to resolve the note, or None.
+    """
+    VALUE = 'value'
+    FACTORY = 'factory'
+    ANNOTATED_FACTORY = 'annotated_factory'
+    PROVIDER_CLASS = 'provider_class'
+    ANNOTATED_PROVIDER_CLASS = 'annotated_provider_class'
+    GENERATOR = 'generator'
+    NAME_GENERATOR = 'name_generator'
+
+    __slots__ = (
+        'provider', 'kind', 'fn', 'annotated_get', 'scope', 'memoize',
+        'timeout')
+
+    def __init__(self, provider, kind, fn=None, annotated_get=False,
+                 scope=PER_INJECTOR, memoize=0, timeout=None):
+        self.provider = provider
+        self.kind = kind
+        self.fn = fn
+        self.annotated_get = annotated_get
+        self.scope = scope
+        self.memoize = memoize
+        self.timeout = timeout
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(
+            self.__class__.__name__, self.provider, self.kind)
+
+
+class DependencyError(Exception):
+    """Dependency graph of an Injector class has missing notes or cycles.
+
+    `missing` maps each basenote to the notes it requires which are not
+    registered, and `cycles` lists each cycle as a list of basenotes. See
+    `DependencyGraph.validate`.
+    """
+
+    def __init__(self, missing, cycles):
+        self.missing = missing
+        self.cycles = cycles
+        lines = []
+        for basenote, notes in sorted(missing.items(), key=repr):
+            lines.append('{!r} requires unregistered {}'.format(
+                basenote, ', '.join(repr(note) for note in notes)))
+        for cycle in cycles:
+            lines.append('cycle: {}'.format(
+                ' -> '.join(repr(basenote) for basenote in cycle)))
+        super(DependencyError, self).__init__('\n'.join(lines))
+
+
+class WarmUpError(Exception):
+    """Notes failed to resolve in `Injector.warm`.
+
+    `errors` maps each basenote which failed to its exception, `skipped`
+    lists basenotes not resolved because a dependency failed, and `times`
+    maps each basenote resolved to its time to resolve in seconds.
+    """
+
+    def __init__(self, errors, skipped, times):
+        self.errors = errors
+        self.skipped = skipped
+        self.times = times
+        lines = [
+            '{!r}: {!r}'.format(basenote, error)
+            for basenote, error in sorted(errors.items(), key=repr)]
+        if skipped:
+            lines.append('skipped: {}'.format(
+                ', '.join(repr(basenote) for basenote in skipped)))
+        super(WarmUpError, self).__init__('\n'.join(lines))
+
+
+class CyclicDependencyError(DependencyError):
+    """A note requires itself during its own resolution.
+
+    `cycle` lists the basenotes in resolution, from the first to re-enter to
+    itself, e.g. ``['a', 'b', 'a']``.
+    """
+
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super(CyclicDependencyError, self).__init__({}, [cycle])
+
+
+class ResolutionTimeoutError(UnsetError):
+    """A note did not resolve within its timeout or the injector's deadline.
+
+    `path` lists the basenotes in resolution, outermost first, ending with
+    the note which timed out, and `timeout` is the limit in seconds. As an
+    `UnsetError`, a note wrapped with `annotate.maybe` which times out is
+    skipped rather than failing the call. See `Injector.provider`.
+    """
+
+    def __init__(self, *a, **kw):
+        self.path = kw.pop('path', ())
+        self.timeout = kw.pop('timeout', None)
+        super(ResolutionTimeoutError, self).__init__(*a, **kw)
+
+
+class DependencyGraph(object):
+    """Dependencies of all providers registered with an Injector class.
+
+    The graph is built statically from the merged registry of the class and
+    the annotations of each provider (annotated provider class ``__init__``
+    and ``get``, annotated factories and generators), including the notes of
+    callables injected with `annotate.partial` and `annotate.eager_partial`::
+
+        graph = Injector.dependency_graph()
+        graph.validate() # Raises DependencyError, to fail fast at startup.
+
+    `edges` maps each registered basenote to its dependencies, as a dict of
+    dependency basenote -> `Dependency`.
+    """
+
+    #: Dependency of a basenote: `required` if resolution fails without it,
+    #: `lazy` if only resolved when a partial function is called.
+    Dependency = collections.namedtuple('Dependency', 'note required lazy')
+
+    def __init__(self, injector_class):
+        self.injector_class = injector_class
+        self.registry = injector_class.merge_registry()
+        self.annotator = injector_class.annotator_class()
+        self.edges = {}
+        for basenote, registration in self.registry.items():
+            edges = self.edges[basenote] = collections.OrderedDict()
+            for fn, partial in self.annotated_callables(registration):
+                self.add_edges(edges, fn, partial, lazy=False, seen=set())
+
+    def annotated_callables(self, registration):
+        """Annotated callables of a registration, with whether applied with
+        ``partial=True``, as by `Injector`.
+        """
+        annotator = self.annotator
+        provider = registration.provider
+        if registration.kind == Registration.VALUE:
+            candidates = []
+        elif inspect.isclass(provider):
+            candidates = [(getattr(provider, '__init__', None), False)]
+            if registration.annotated_get:
+                candidates.append((provider.get, True))
+        elif registration.fn is not None:
+            candidates = [(registration.fn, True)]
+        else:
+            candidates = [(provider, False)]
+        return [
+            (fn, partial) for fn, partial in candidates
+            if fn is not None and annotator.has_annotations(fn)]
+
+    def add_edges(self, edges, fn, partial, lazy, seen):
+        # Add dependencies of annotated fn to edges, recursing into partials.
+        if id(fn) in seen:
+            return
+        seen.add(id(fn))
+        plan = InjectionPlan.compile(*self.annotator.get_annotations(fn))
+        dependencies = [(note, True) for note in plan.args]
+        dependencies.extend(
+            (note, not (maybe or partial)) for _, note, maybe in plan.kwargs)
+        for note, required in dependencies:
+            if note.mode == LAZY:
+                note, lazy_note = Note.parse(note.name), True
+            else:
+                lazy_note = lazy
+            if note.mode is not None:
+                partial_fn = note.name[0]
+                self.add_edges(
+                    edges, partial_fn, True,
+                    lazy_note or note.mode == PARTIAL, seen)
+                continue
+            edge = self.Dependency(note.note, required, lazy_note)
+            previous = edges.get(note.basenote)
+            if previous is not None:
+                # Keep strongest dependency: required, eager & without name.
+                if Note.parse(previous.note).name is None:
+                    note = Note.parse(previous.note)
+                edge = self.Dependency(
+                    note.note, required or previous.required,
+                    lazy_note and previous.lazy)
+            edges[note.basenote] = edge
+
+    def dependencies(self, basenote, lazy=True):
+        """Dependency basenotes of basenote, optionally without lazy."""
+        return [
+            dependency for dependency, edge in self.edges[basenote].items()
+            if lazy or not edge.lazy]
+
+    def required(self, basenote):
+        """Dependency basenotes which basenote requires at resolution."""
+        return [
+            dependency for dependency, edge in self.edges.get(
+                basenote, {}).items()
+            if edge.required and not edge.lazy]
+
+    def missing(self):
+        """Unregistered required notes, basenote -> list of notes."""
+        missing = {}
+        for basenote, edges in self.edges.items():
+            notes = [
+                edge.note for dependency, edge in edges.items()
+                if edge.required and dependency not in self.registry]
+            if notes:
+                missing[basenote] = notes
+        return missing
+
+    def cycles(self):
+        """Cycles of eager dependencies, each a list of basenotes.
+
+        A cycle is listed from its first basenote back to itself, e.g.
+        ``['a', 'b', 'a']``. Dependencies only resolved when a `partial`
+        function is called do not form cycles at resolution.
+        """
+        cycles = []
+        found = set()
+        state = {}
+        for root in self.edges:
+            if root in state:
+                continue
+            # Iterative depth-first search, with path as the current stack.
+            path = [root]
+            stack = [iter(self.dependencies(root, lazy=False))]
+            state[root] = 'active'
+            while stack:
+                for dependency in stack[-1]:
+                    if dependency not in self.edges:
+                        continue
+                    if state.get(dependency) == 'active':
+                        cycle = path[path.index(dependency):]
+                        key = frozenset(cycle)
+                        if key not in found:
+                            found.add(key)
+                            cycles.append(cycle + [dependency])
+                    elif dependency not in state:
+                        state[dependency] = 'active'
+                        path.append(dependency)
+                        stack.append(
+                            iter(self.dependencies(dependency, lazy=False)))
+                        break
+                else:
+                    state[path.pop()] = 'done'
+                    stack.pop()
+        return cycles
+
+    def depths(self):
+        """Depth of each basenote, basenote -> int.
+
+        A basenote without eager dependencies on registered basenotes has a
+        depth of 0; otherwise its depth is one more than its deepest
+        dependency. Edges which close a cycle are not counted.
+        """
+        depths = {}
+        for root in self.edges:
+            if root in depths:
+                continue
+            path = [root]
+            active = set(path)
+            stack = [iter(self.dependencies(root, lazy=False))]
+            while stack:
+                for dependency in stack[-1]:
+                    if dependency in self.edges and (
+                            dependency not in depths and
+                            dependency not in active):
+                        path.append(dependency)
+                        active.add(dependency)
+                        stack.append(
+                            iter(self.dependencies(dependency, lazy=False)))
+                        break
+                else:
+                    basenote = path.pop()
+                    active.discard(basenote)
+                    stack.pop()
+                    depths[basenote] = 1 + max([-1] + [
+                        depths[dependency]
+                        for dependency in self.dependencies(
+                            basenote, lazy=False)
+                        if dependency in depths])
+        return depths
+
+    def levels(self):
+        """Basenotes grouped by depth, shallowest first.
+
+        Basenotes of a level only depend on basenotes of earlier levels, such
+        that the notes of each level can be resolved concurrently.
+        """
+        levels = []
+        for basenote, depth in self.depths().items():
+            while len(levels) <= depth:
+                levels.append([])
+            levels[depth].append(basenote)
+        return [sorted(level, key=repr) for level in levels]
+
+    def validate(self):
+        """Raise `DependencyError` if any notes are missing or cyclic."""
+        missing, cycles = self.missing(), self.cycles()
+        if missing or cycles:
+            raise DependencyError(missing, cycles)
+        return self
+
+    def __repr__(self):
+        return '{}({!r})'.format(
+            self.__class__.__name__, self.injector_class)
 
 
 class Injector(object):
     """Collects dependencies and reads annotations to inject them."""
+    __slots__ = (
+        'scope', 'annotator', 'executor', 'thread_safe', 'lock', 'locks',
+        'local', 'instrument', 'parent', 'closed', 'deadline', '_instances',
+        '_values', '_get_order', '_stats', '_resolving', '_memos',
+        '_deadline_at')
+
     annotator_class = Annotator
     generator_provider = GeneratorProvider
-    re_note = re.compile(r'^(.*?)(?::(.*))?$') # annotation is 'object:name'
 
-    def __init__(self):
-        """An Injector could take arguments to init, but this base does not.
+    #: Compiled injection plans, (annotator_class, callable) -> InjectionPlan,
+    #: shared by all injectors. The cache is cleared when it reaches
+    #: `plan_cache_size`.
+    plans = {}
+    plan_cache_size = 1024
+
+    #: Maximum number of names memoized per note registered with
+    #: ``memoize=True``, see `provider`.
+    memo_size = 128
+
+    #: Policy of counting requests in `stats`: `STATS_FULL`, `STATS_OFF`, or
+    #: an int N to count 1 in N requests, see `stats`.
+    stats_policy = STATS_FULL
+
+    #: `StatsAggregate` to add stats of each injector to on close, or None.
+    stats_aggregate = None
+
+    #: Requests of all injectors, process-wide, to sample 1 in N requests.
+    sample_counter = itertools.count()
+
+    #: Clock of timeouts & deadlines, in seconds.
+    clock = staticmethod(timeit.default_timer)
+
+    #: Resolver method names by kind of `Registration`.
+    resolvers = {
+        Registration.VALUE: '_resolve_value',
+        Registration.FACTORY: '_resolve_factory',
+        Registration.ANNOTATED_FACTORY: '_resolve_factory',
+        Registration.PROVIDER_CLASS: '_resolve_provider_class',
+        Registration.ANNOTATED_PROVIDER_CLASS: '_resolve_provider_class',
+        Registration.GENERATOR: '_resolve_generator',
+        Registration.NAME_GENERATOR: '_resolve_generator',
+    }
+
+    #: Kinds of registration which store an instance on first resolution.
+    instance_kinds = frozenset([
+        Registration.PROVIDER_CLASS,
+        Registration.ANNOTATED_PROVIDER_CLASS,
+        Registration.GENERATOR,
+        Registration.NAME_GENERATOR,
+    ])
+
+    #: Kinds of registration which are a provider class.
+    class_kinds = frozenset([
+        Registration.PROVIDER_CLASS,
+        Registration.ANNOTATED_PROVIDER_CLASS,
+    ])
+
+    #: Kinds of registration which do not support concurrent get-by-name.
+    serial_kinds = frozenset([Registration.NAME_GENERATOR])
+
+    #: Lock to create singleton injectors, see `singleton_injector`.
+    singleton_lock = threading.Lock()
+
+    #: Annotators by annotator class, shared by all injectors. See
+    #: `shared_annotator`.
+    annotators = {}
+
+    #: Version of all provider registries, incremented on every `register`.
+    #: Merged registries of Injector classes are rebuilt on version change.
+    registry_version = 0
+
+    def __init__(self, executor=None, thread_safe=None, instrument=None,
+                 deadline=None):
+        """An Injector takes optional arguments to init.
 
         An Injector subclass inherits the provider registry of its base
         classes, but can override any provider by re-registering notes. When
@@ -335,21 +1389,302 @@ class Injector(object):
 
             class Injector(BaseInjector):
                 "Subclass provides namespace when registering providers."
+
+        Given an `executor` (e.g. a `concurrent.futures.ThreadPoolExecutor`),
+        the injector resolves the notes of an annotated callable concurrently,
+        such that a callable with slow, independent providers waits on the
+        slowest provider rather than the sum of all of them::
+
+            injector = Injector(executor=ThreadPoolExecutor(max_workers=8))
+
+        Notes resolved within the executor (e.g. an annotated provider
+        ``__init__``) are resolved sequentially, in order to not wait on the
+        executor from within the executor. For the same reason, do not apply
+        callables with an injector from within the injector's own executor.
+
+        An injector with an executor is `thread_safe`. Use ``thread_safe=True``
+        to share a single, long-lived injector across threads::
+
+            injector = Injector(thread_safe=True)
+
+        A thread-safe injector initializes each provider exactly once, with a
+        lock per basenote held only during its first resolution. Values
+        already resolved are read without a lock. Generators supporting
+        get-by-name are sent one name at a time. Stats are counted per thread,
+        see `ThreadStats`.
+
+        Construction is cheap, as an injector allocates its state on first
+        use, see `instances`, `values`, `get_order` and `stats`. Subclasses
+        may declare ``__slots__ = ()`` to avoid an instance ``__dict__``. To
+        reuse injectors across requests, see `InjectorPool`.
+
+        Given an `instrument`, the injector records the latency of resolving
+        and closing each note, see `Instrument`.
+
+        Given a `deadline` in seconds, all resolutions of the injector must
+        complete within the deadline, starting with its first resolution, or
+        raise `ResolutionTimeoutError`, e.g. for an injector per request. See
+        `provider` for timeouts::
+
+            injector = Injector(deadline=2.0)
         """
-        self.annotator = self.annotator_class()
+        #: Scope of this injector, `SINGLETON` for `singleton_injector`.
+        self.scope = PER_INJECTOR
+
+        #: Annotator to read annotations, see `shared_annotator`.
+        annotator = Injector.annotators.get(self.annotator_class)
+        if annotator is None:
+            annotator = self.shared_annotator()
+        self.annotator = annotator
+
+        #: Injector of which this injector is a `child`, if any.
+        self.parent = None
+
+        if thread_safe is None:
+            thread_safe = executor is not None
+        elif executor is not None and not thread_safe:
+            raise ValueError('injector with an executor must be thread-safe')
+        self.executor = executor
+        self.thread_safe = thread_safe
+        self.instrument = instrument
+        if deadline is not None and deadline <= 0:
+            raise ValueError('invalid deadline: {!r}'.format(deadline))
+        self.deadline = deadline
+        if thread_safe:
+            #: Locks for thread-safe mode, see `handle_provider`.
+            self.lock = threading.Lock()
+            self.locks = {}
+            self.local = threading.local()
+        else:
+            self.lock = self.locks = self.local = None
 
         self.closed = False
-        self.instances = {}
-        self.values = {}
+        if thread_safe:
+            # Allocate up front, to not race on allocation across threads.
+            self._instances = {}
+            self._values = {}
+            self._get_order = OrderedSet()
+            self._stats = ThreadStats()
+            self._memos = {}
+        else:
+            self._instances = self._values = None
+            self._get_order = self._stats = self._memos = None
+        self._resolving = self._deadline_at = None
+
+    @classmethod
+    def shared_annotator(cls):
+        """Instance of `annotator_class`, shared as it is stateless."""
+        annotator_class = cls.annotator_class
+        try:
+            return Injector.annotators[annotator_class]
+        except KeyError:
+            return Injector.annotators.setdefault(
+                annotator_class, annotator_class())
+
+    @property
+    def instances(self):
+        """Provider instances by basenote, to get values & close."""
+        if self._instances is None:
+            self._instances = {}
+        return self._instances
+
+    @property
+    def values(self):
+        """Resolved values by basenote, for notes without a name."""
+        if self._values is None:
+            self._values = {}
+        return self._values
+
+    @property
+    def get_order(self):
+        """Basenotes in the order first resolved, for close in reverse order.
+        """
+        if self._get_order is None:
+            self._get_order = OrderedSet()
+        return self._get_order
+
+    @property
+    def stats(self):
+        """Statistics for resolved notes, note -> count.
+
+        Records counts as soon as get is called, even if unset or error.
+
+        Requests are counted as set by `stats_policy` of the injector class.
+        By default, every request is counted (`STATS_FULL`). With `STATS_OFF`,
+        requests are not counted, at no cost to `get`. With an int N, 1 in N
+        requests of the process is counted, with a count of N to estimate
+        all requests::
+
+            class Injector(BaseInjector):
+                stats_policy = 100
+
+        See `stats_aggregate` to aggregate stats across injectors.
+        """
+        if self._stats is None:
+            self._stats = collections.defaultdict(int)
+        return self._stats
+
+    @property
+    def memos(self):
+        """Memoized values got by name, basenote -> `Memo`."""
+        if self._memos is None:
+            self._memos = {}
+        return self._memos
+
+    def memo_stats(self):
+        """Hits, misses & hit rate of memoized notes, basenote -> dict."""
+        return dict(
+            (basenote, memo.as_dict())
+            for basenote, memo in list(self.memos.items()))
+
+    def reset(self):
+        """Reset a closed injector for reuse, as if newly constructed.
+
+        Resolved values, provider instances, memos and stats are cleared.
+        Allocated state is kept in order to not allocate again. See
+        `InjectorPool`.
+        """
+        if not self.closed:
+            raise RuntimeError('{!r} not closed'.format(self))
+        for state in (self._instances, self._values,
+                      self._get_order, self._stats, self._memos):
+            if state is not None:
+                state.clear()
+        self._deadline_at = None
+        self.closed = False
+
+    def child(self, **kw):
+        """Create an injector which shares values resolved by this injector.
 
-        self.get_order = []
+        A child injector gets values and provider instances already resolved
+        by its parent (or further ancestors) from the parent, without
+        initializing them again. Notes not yet resolved by an ancestor are
+        resolved by the child, and closed when the child is closed. Closing
+        a child never closes providers of its parent. Stats and `get_order`
+        are tracked per child::
 
-        #: Statistics for resolved notes, note -> count.
-        #: Records counts as soon as get is called, even if unset or error.
-        self.stats = collections.defaultdict(int)
+            app_injector = Injector(thread_safe=True)
+            app_injector.get('database')
+
+            with app_injector.child() as injector:
+                injector.apply(handler) # Shares app's 'database'.
+
+        Keyword arguments are passed to construct the child, which shares
+        the `instrument` and `deadline` of its parent unless given. A pool of
+        children is ``InjectorPool(app_injector.child)``.
+        """
+        kw.setdefault('instrument', self.instrument)
+        kw.setdefault('deadline', self.deadline)
+        child = self.__class__(**kw)
+        child.parent = self
+        return child
+
+    def warm(self, notes=None, executor=None):
+        """Resolve notes ahead of use, returning init times by basenote.
+
+        Resolves the basenotes of given notes and their dependencies (except
+        those requested by name), or all registered notes not of `TRANSIENT`
+        scope, level by level along the dependency graph
+        (see `DependencyGraph.levels`), such that each provider is resolved
+        after its dependencies. Given an `executor`, or with the injector's
+        own executor, the independent notes of each level are resolved in
+        parallel::
+
+            times = injector.warm(executor=executor)
+
+        Providers used only by name, which raise `UnsetError` on get without
+        a name, are warmed by initializing their instance.
+
+        Returns the time to resolve each basenote in seconds, excluding its
+        dependencies. Errors do not stop warm-up; notes which depend on a
+        failed note are skipped, and `WarmUpError` is raised at the end with
+        all errors.
+        """
+        if executor is None:
+            executor = self.executor
+        elif not self.thread_safe:
+            raise ValueError('injector with an executor must be thread-safe')
+        graph, levels = self.warm_levels(notes)
+        times, errors, skipped, failed = {}, {}, [], set()
+        for level in levels:
+            batch = []
+            for basenote in level:
+                if failed.intersection(graph.required(basenote)):
+                    skipped.append(basenote)
+                    failed.add(basenote)
+                else:
+                    batch.append(basenote)
+            if executor is None or len(batch) < 2:
+                results = [self._warm_note(basenote) for basenote in batch]
+            else:
+                futures = [
+                    executor.submit(self._warm_note, basenote, True)
+                    for basenote in batch]
+                results = [future.result() for future in futures]
+            for basenote, (elapsed, error) in zip(batch, results):
+                if error is None:
+                    times[basenote] = elapsed
+                else:
+                    errors[basenote] = error
+                    failed.add(basenote)
+        if errors:
+            raise WarmUpError(errors, skipped, times)
+        return times
+
+    def warm_levels(self, notes=None):
+        """Dependency graph & levels of basenotes to resolve in `warm`.
+
+        Basenotes which are not registered are in the first level, to fail
+        before the basenotes which require them.
+        """
+        graph = self.dependency_graph()
+        if notes is None:
+            selected = set(
+                basenote for basenote, registration in graph.registry.items()
+                if registration.scope != TRANSIENT)
+        else:
+            selected = set()
+            pending = [Note.parse(note).basenote for note in notes]
+            while pending:
+                basenote = pending.pop()
+                if basenote in selected:
+                    continue
+                selected.add(basenote)
+                for dependency, edge in graph.edges.get(basenote, {}).items():
+                    # Dependencies by name are resolved when used, and
+                    # optional dependencies only if registered.
+                    if edge.lazy or Note.parse(edge.note).name is not None:
+                        continue
+                    if edge.required or dependency in graph.edges:
+                        pending.append(dependency)
+        unregistered = [
+            basenote for basenote in selected if basenote not in graph.edges]
+        levels = [sorted(unregistered, key=repr)]
+        levels.extend(
+            [basenote for basenote in level if basenote in selected]
+            for level in graph.levels())
+        return graph, [level for level in levels if level]
+
+    def _warm_note(self, basenote, in_worker=False):
+        # Resolve basenote, returning (elapsed, None) or (None, error).
+        note = Note(basenote, basenote)
+        start = timeit.default_timer()
+        try:
+            if in_worker:
+                self._get_in_worker(note)
+            else:
+                self._get(note)
+        except UnsetError:
+            # Provider used only by name, warmed if its instance initialized.
+            if basenote not in self.instances:
+                return None, sys.exc_info()[1]
+        except Exception:
+            return None, sys.exc_info()[1]
+        return timeit.default_timer() - start, None
 
     @classmethod
-    def provider(cls, note, provider=None, name=False):
+    def provider(cls, note, provider=None, name=False, scope=PER_INJECTOR,
+                 memoize=False, timeout=None):
         """Register a provider, either a Provider class or a generator.
 
         Provider class::
@@ -384,18 +1719,70 @@ class Injector(object):
         Registration can be a decorator or a direct method call::
 
             Injector.provider('hello', HelloProvider)
+
+        By default, providers are scoped `PER_INJECTOR`: each injector
+        instance creates its own provider and closes it on `close`. Providers
+        of expensive resources shared by all injectors of the class can be
+        scoped as a `SINGLETON`, created once and closed on `shutdown`::
+
+            @Injector.provider('pool', scope=SINGLETON)
+            def pool():
+                pool = create_pool()
+                yield pool
+                pool.close()
+
+        Providers scoped `TRANSIENT` are called on every get, and values are
+        never cached by the injector. Provider classes are still created once
+        per injector, calling `get` on every get. Generators provide a single
+        value and do not support the `TRANSIENT` scope.
+
+        Get-by-name calls the provider on every get, e.g. to read a header
+        by name. To memoize values got by name per injector, with eviction of
+        the least recently used names beyond `memo_size`, use `memoize`, or
+        an int for a maximum number of names other than `memo_size`::
+
+            @Injector.provider('header', memoize=True)
+            class HeaderProvider(Provider):
+                def get(self, name=None):
+                    return parse_header(name)
+
+        See `memo_stats` for the hit rate of memoized notes.
+
+        Given a `timeout` in seconds, resolution of the note (i.e. provider
+        init and get, including dependencies) raises `ResolutionTimeoutError`
+        if it does not complete in time::
+
+            @Injector.provider('kv', timeout=0.5)
+            def kv():
+                client = connect()
+                yield client
+                client.close()
+
+        Resolution with a timeout, or on an injector with a `deadline`, runs
+        in a separate thread, as a blocking call cannot be interrupted, and
+        its dependencies resolve in the same thread. Providers then run in a
+        thread other than the one which requested them, which matters for
+        resources bound to the thread which creates them, e.g. a sqlite3
+        connection, which by default is usable only in that thread. Values
+        resolve inline, as they cannot block. A resolution which times
+        out is abandoned; if it completes later, its value is discarded and
+        the provider instance it created, if any, is closed, leaving any
+        instance and value stored meanwhile in place.
         """
         def decorator(fn_or_class):
             if inspect.isgeneratorfunction(fn_or_class):
                 fn = fn_or_class
                 fn.support_name = name
-                cls.register(note, fn)
+                cls.register(
+                    note, fn, scope=scope, memoize=memoize, timeout=timeout)
             else:
                 provider = fn_or_class
                 if not hasattr(provider, 'get'):
                     msg = "{!r} does not meet provider interface with 'get'"
                     raise ValueError(msg.format(provider))
-                cls.register(note, provider)
+                cls.register(
+                    note, provider, scope=scope, memoize=memoize,
+                    timeout=timeout)
             return fn_or_class
         if provider is not None:
             decorator(provider)
@@ -403,7 +1790,8 @@ class Injector(object):
             return decorator
 
     @classmethod
-    def factory(cls, note, fn=None):
+    def factory(cls, note, fn=None, scope=PER_INJECTOR, memoize=False,
+                timeout=None):
         """Register a function as a provider.
 
         Function (name support is optional)::
@@ -421,12 +1809,24 @@ class Injector(object):
         Registration can be a decorator or a direct method call::
 
             Injector.factory('echo', echo)
+
+        Factories support a `scope` as documented in `provider`, e.g. to
+        call a factory on every get::
+
+            @Injector.factory('now', scope=TRANSIENT)
+            def now():
+                return datetime.datetime.now()
+
+        Factories support `memoize` of values got by name and a `timeout`, as
+        documented in `provider`.
         """
         if fn is not None:
-            cls.register(note, fn)
+            cls.register(
+                note, fn, scope=scope, memoize=memoize, timeout=timeout)
         else:
             def decorator(f):
-                cls.register(note, f)
+                cls.register(
+                    note, f, scope=scope, memoize=memoize, timeout=timeout)
                 return f
             return decorator
 
@@ -436,7 +1836,7 @@ class Injector(object):
 
         Supports base notes only, does not support get-by-name notes.
         """
-        cls.factory(note, lambda: scalar)
+        cls.register(note, Registration(scalar, Registration.VALUE))
 
     def apply(self, fn, *a, **kw):
         """Fully apply annotated callable, returning callable's result."""
@@ -445,7 +1845,7 @@ class Injector(object):
         return fn(*args, **kwargs)
 
     def partial(self, fn, *user_args, **user_kwargs):
-        """Return function with closure to lazily inject annotated callable.
+        """Return `LazyPartial` to lazily inject annotated callable.
 
         Repeat calls to the resulting function will reuse injections from the
         first call.
@@ -468,24 +1868,8 @@ class Injector(object):
 
         `annotate.partial` accepts arguments in same manner as this `partial`.
         """
-        self.get_annotations(fn) # Assert has annotations.
-        def lazy_injection_fn(*run_args, **run_kwargs):
-            arg_pack = getattr(lazy_injection_fn, 'arg_pack', None)
-            if arg_pack is not None:
-                pack_args, pack_kwargs = arg_pack
-            else:
-                jeni_args, jeni_kwargs = self.prepare_callable(fn, partial=True)
-                pack_args = jeni_args + user_args
-                pack_kwargs = {}
-                pack_kwargs.update(jeni_kwargs)
-                pack_kwargs.update(user_kwargs)
-                lazy_injection_fn.arg_pack = (pack_args, pack_kwargs)
-            final_args = pack_args + run_args
-            final_kwargs = {}
-            final_kwargs.update(pack_kwargs)
-            final_kwargs.update(run_kwargs)
-            return fn(*final_args, **final_kwargs)
-        return lazy_injection_fn
+        self.get_plan(fn) # Assert has annotations.
+        return LazyPartial(self, fn, user_args, user_kwargs)
 
     def eager_partial(self, fn, *a, **kw):
         """Partially apply annotated callable, returning a partial function.
@@ -503,6 +1887,123 @@ class Injector(object):
         args += a; kwargs.update(kw)
         return functools.partial(fn, *args, **kwargs)
 
+    def compile(self, fn):
+        """Compile a wrapper specialized to apply annotated callable.
+
+        The wrapper is equivalent to ``injector.apply(fn, *a, **kw)``, with
+        source generated for the notes of `fn`, such that a warm call reads
+        resolved values directly rather than looping over the notes of the
+        plan and building arguments::
+
+            handler = injector.compile(handler)
+            handler(request) # Same as injector.apply(handler, request).
+
+        Base notes of providers which are not `TRANSIENT` are read from
+        resolved values, and get-by-name, transient and partial notes are
+        resolved on every call. Until its values are resolved, and after the
+        injector is closed or reset, the wrapper calls `apply`. Requests read
+        from resolved values are not counted in `stats`.
+
+        Instrumented and child injectors do not specialize, and always call
+        `apply`. See `inject` to compile with a decorator.
+        """
+        plan = self.get_plan(fn)
+        if self.instrument is None and self.parent is None:
+            source, namespace = self.compile_source(fn, plan)
+        else:
+            source, namespace = None, None
+        if source is None:
+            def compiled(*a, **kw):
+                return self.apply(fn, *a, **kw)
+        else:
+            six.exec_(source, namespace)
+            compiled = namespace['compiled']
+        # Copy name & docs, but not notes, as the wrapper is not annotated.
+        assigned = [
+            attr for attr in ('__module__', '__name__', '__doc__')
+            if hasattr(fn, attr)]
+        return functools.update_wrapper(
+            compiled, fn, assigned=assigned, updated=())
+
+    def inject(self, fn):
+        """Decorator to `compile` an annotated callable with this injector::
+
+            injector = Injector(thread_safe=True)
+
+            @injector.inject
+            @annotate('database')
+            def handler(database, request):
+                "..."
+
+            handler(request)
+        """
+        return self.compile(fn)
+
+    def compile_source(self, fn, plan):
+        """Generate source of `compile` for a plan, with its namespace.
+
+        Returns ``(None, None)`` if the plan cannot be specialized.
+        """
+        namespace = {
+            'injector': self, 'apply': self.apply, 'fn': fn,
+            'values': self.values, 'get': self._get}
+        cached, args, kwargs, maybes = [], [], [], []
+        for i, note in enumerate(plan.args):
+            namespace['n{}'.format(i)] = note
+            if self.is_cacheable(note):
+                namespace['b{}'.format(i)] = note.basenote
+                cached.append('v{0} = values[b{0}]'.format(i))
+                args.append('v{}'.format(i))
+            else:
+                args.append('get(n{})'.format(i))
+        for j, (arg, note, maybe) in enumerate(plan.kwargs):
+            i = len(plan.args) + j
+            if not is_identifier(arg):
+                return None, None
+            namespace['n{}'.format(i)] = note
+            if self.is_cacheable(note):
+                namespace['b{}'.format(i)] = note.basenote
+                cached.append('v{0} = values[b{0}]'.format(i))
+                kwargs.append('{}=v{}'.format(arg, i))
+            elif maybe:
+                maybes.append((arg, i))
+            else:
+                kwargs.append('{}=get(n{})'.format(arg, i))
+        lines = [
+            'def compiled(*a, **kw):',
+            '    if injector.closed:',
+            '        return apply(fn, *a, **kw)']
+        if cached:
+            lines.append('    try:')
+            lines.extend('        ' + line for line in cached)
+            lines.append('    except KeyError:')
+            lines.append('        return apply(fn, *a, **kw)')
+        call_args = ', '.join(args + ['*a'])
+        if not maybes:
+            lines.append('    if not kw:')
+            lines.append('        return fn({})'.format(
+                ', '.join(args + ['*a'] + kwargs)))
+        lines.append('    kwargs = dict({})'.format(', '.join(kwargs)))
+        for arg, i in maybes:
+            lines.append('    try:')
+            lines.append("        kwargs['{}'] = get(n{})".format(arg, i))
+            lines.append('    except LookupError:')
+            lines.append('        pass')
+        lines.append('    kwargs.update(kw)')
+        lines.append('    return fn({}, **kwargs)'.format(call_args))
+        return '\n'.join(lines) + '\n', namespace
+
+    def is_cacheable(self, note):
+        """True if values of note are read from resolved values, else False.
+        """
+        if note.mode is not None or note.name is not None:
+            return False
+        try:
+            registration = self.lookup_registration(note.basenote)
+        except (LookupError, TypeError):
+            return False
+        return registration.scope != TRANSIENT
+
     def apply_regardless(self, fn, *a, **kw):
         """Like `apply`, but applies if callable is not annotated."""
         if self.has_annotations(fn):
@@ -524,30 +2025,260 @@ class Injector(object):
 
     def get(self, note):
         """Resolve a single note into an object."""
+        return self._get(Note.parse(note))
+
+    def _get(self, note, timed=False):
+        # Resolve a parsed note. See `get`.
+        if self.instrument is not None and not timed:
+            return self._get_timed(note)
         if self.closed:
             raise RuntimeError('{!r} already closed'.format(self))
 
         # Record request for note even if it fails to resolve.
-        self.stats[note] += 1
+        policy = self.stats_policy
+        if policy == STATS_FULL:
+            stats = self._stats
+            if stats is None:
+                stats = self.stats
+            if self.locks is None:
+                stats[note.note] += 1
+            else:
+                stats.add(note.note)
+        elif policy != STATS_OFF and not next(self.sample_counter) % policy:
+            self.record_request(note, policy)
 
         # Handle injection of partially applied annotated functions.
-        if isinstance(note, tuple) and len(note) == 2:
-            if note[0] == PARTIAL:
-                fn, a, kw_items = note[1]
+        if note.mode is not None:
+            if note.mode == LAZY:
+                return LazyProxy(self, note.name)
+            fn, a, kw_items = note.name
+            if note.mode == PARTIAL:
                 return self.partial(fn, *a, **dict(kw_items))
-            elif note[0] == EAGER_PARTIAL:
-                fn, a, kw_items = note[1]
-                return self.eager_partial(fn, *a, **dict(kw_items))
-
-        basenote, name = self.parse_note(note)
-        if name is None and basenote in self.values:
-            return self.values[basenote]
+            return self.eager_partial(fn, *a, **dict(kw_items))
+
+        values = self._values
+        if values and note.name is None and note.basenote in values:
+            return values[note.basenote]
+        injector = self
+        if self.parent is not None:
+            injector = self._resolved_by(note.basenote) or self
+            values = injector._values
+            if values and note.name is None and note.basenote in values:
+                return values[note.basenote]
         try:
-            provider_or_fn = self.lookup(basenote)
+            registration = self.lookup_registration(note.basenote)
         except LookupError:
             msg = "Unable to resolve '{}'"
-            raise LookupError(msg.format(note))
-        return self.handle_provider(provider_or_fn, note)
+            raise LookupError(msg.format(note.note))
+        return injector.handle_provider(registration, note)
+
+    def try_get(self, note, default=None):
+        """Resolve a single note into an object, else return `default`.
+
+        Like `get`, but returns `default` if the note is not registered or
+        its provider raises `UnsetError`, instead of raising LookupError.
+        Notes which are not registered are skipped without raising, see
+        `can_provide`, such that notes which are mostly absent are cheap.
+        """
+        note = Note.parse(note)
+        if self._skip_missing(note):
+            return default
+        try:
+            return self._get(note)
+        except LookupError:
+            return default
+
+    def can_provide(self, note):
+        """True if note is registered or already resolved, else False.
+
+        Does not resolve the note, i.e. a provider may still raise
+        `UnsetError` on get.
+        """
+        note = Note.parse(note)
+        if note.mode is not None:
+            return True
+        basenote = note.basenote
+        injector = self
+        while injector is not None:
+            values = injector._values
+            if values and basenote in values:
+                return True
+            injector = injector.parent
+        try:
+            if basenote in self.current_registry():
+                return True
+        except TypeError:
+            # Basenote is not hashable, and cannot be registered.
+            return False
+        if self.overrides_lookup():
+            try:
+                self.lookup(basenote)
+            except LookupError:
+                return False
+            return True
+        return False
+
+    def _skip_missing(self, note):
+        # True if note cannot be provided, counting the request as `_get`
+        # does, such that optional notes are skipped without LookupError.
+        if note.mode is not None or self.instrument is not None:
+            return False
+        if self.closed:
+            raise RuntimeError('{!r} already closed'.format(self))
+        if self.can_provide(note):
+            return False
+        self.count_request(note)
+        return True
+
+    def _get_timed(self, note):
+        # Resolve a parsed note, recording its latency with `instrument`.
+        instrument = self.instrument
+        cold = not self._is_resolved(note)
+        start = instrument.clock()
+        try:
+            value = self._get(note, timed=True)
+        except Exception:
+            instrument.record_get(
+                note, start, instrument.clock(), cold, sys.exc_info()[1])
+            raise
+        instrument.record_get(note, start, instrument.clock(), cold)
+        return value
+
+    def _is_resolved(self, note):
+        # True if note is served from resolved values of self or ancestors.
+        if note.name is not None or note.mode is not None:
+            return False
+        injector = self
+        while injector is not None:
+            values = injector._values
+            if values and note.basenote in values:
+                return True
+            injector = injector.parent
+        return False
+
+    def _resolved_by(self, basenote):
+        # Nearest of self & ancestors which resolved basenote, or None.
+        injector = self
+        while injector is not None:
+            if injector.closed:
+                raise RuntimeError('{!r} already closed'.format(injector))
+            values, instances = injector._values, injector._instances
+            if (values and basenote in values) or (
+                    instances and basenote in instances):
+                return injector
+            injector = injector.parent
+        return None
+
+    def get_many(self, notes):
+        """Resolve notes into a list of objects, in order of notes.
+
+        Get-by-name notes which share a basenote are got with a single call
+        of the provider's `get_many`, if implemented, see `Provider.get`::
+
+            key1, key2, other = injector.get_many(['kv:1', 'kv:2', 'other'])
+
+        `prepare_notes` and `apply` batch notes of a callable likewise, unless
+        notes are resolved concurrently with an executor.
+        """
+        notes = [Note.parse(note) for note in notes]
+        batched = self._get_batches(InjectionPlan.group_batches(notes))
+        get = self._get
+        return [
+            self._get_batched(batched, note) if note in batched else get(note)
+            for note in notes]
+
+    def _get_batches(self, batches):
+        # Get notes of batches with get_many, note -> value. Notes of a batch
+        # which cannot be batched are left to get one at a time.
+        values = {}
+        for notes in batches:
+            try:
+                request = self._batch_request(notes)
+                if request is None:
+                    continue
+                injector, registration, batch_note, memoized = request
+                results = injector.handle_provider(registration, batch_note)
+            except LookupError:
+                continue
+            values.update(self._batch_values(
+                injector, registration, notes, batch_note, memoized, results))
+        return values
+
+    def _batch_request(self, notes):
+        # Look up the provider of notes which share a basenote, returning
+        # the injector & note to get names not memoized, or None if the
+        # provider does not implement get_many.
+        if self.closed:
+            raise RuntimeError('{!r} already closed'.format(self))
+        basenote = notes[0].basenote
+        injector = self
+        if self.parent is not None:
+            injector = self._resolved_by(basenote) or self
+        registration = self.lookup_registration(basenote)
+        provider = registration.provider
+        if registration.kind == Registration.FACTORY:
+            if registration.fn is provider:
+                return None
+        elif registration.kind not in self.class_kinds or (
+                registration.annotated_get):
+            return None
+        if not hasattr(provider, 'get_many'):
+            return None
+        memoized = {}
+        if registration.memoize:
+            memo = injector._memo(registration, basenote)
+            for note in notes:
+                value = memo.lookup(note.name)
+                if value is not Memo.missing:
+                    memoized[note] = value
+        names = tuple(
+            note.name for note in notes if note not in memoized)
+        batch_note = Note(basenote, basenote, names, mode=GET_MANY)
+        return injector, registration, batch_note, memoized
+
+    def _batch_values(self, injector, registration, notes, batch_note,
+                      memoized, results):
+        # Match results of get_many to notes, recording stats & memos.
+        results = list(results)
+        if len(results) != len(batch_note.name):
+            msg = '{!r} get_many returned {} values for {} names'
+            raise ValueError(msg.format(
+                registration.provider, len(results), len(batch_note.name)))
+        values = dict(memoized)
+        memo = injector.memos.get(batch_note.basenote)
+        pending = [note for note in notes if note not in memoized]
+        for note, value in zip(pending, results):
+            values[note] = value
+            if memo is not None:
+                memo.put(note.name, value)
+        return values
+
+    def _get_batched(self, batched, note):
+        # Get value of note from batched values, recording stats as `_get`.
+        self.count_request(note)
+        return batched[note]
+
+    def count_request(self, note):
+        """Count a request for note in `stats`, if sampled by `stats_policy`.
+        """
+        policy = self.stats_policy
+        if policy == STATS_FULL:
+            self.record_request(note)
+        elif policy != STATS_OFF and not next(self.sample_counter) % policy:
+            self.record_request(note, policy)
+
+    def record_request(self, note, count=1):
+        """Count a request for note in `stats`, see `stats_policy`."""
+        if self.locks is None:
+            self.stats[note.note] += count
+        else:
+            self.stats.add(note.note, count)
+
+    def aggregate_stats(self):
+        """Add stats of this injector to `stats_aggregate`, if any."""
+        aggregate = self.stats_aggregate
+        if aggregate is not None:
+            aggregate.add(self._stats or {})
 
     def close(self):
         """Close injector & injected Provider instances, including generators.
@@ -558,130 +2289,808 @@ class Injector(object):
         """
         if self.closed:
             raise RuntimeError('{!r} already closed'.format(self))
-        for basenote in reversed(self.get_order):
-            if basenote not in self.instances:
-                # Provider is not an instance; no close implementation.
-                continue
-            # Note: Unable to apply injector on close method.
-            self.instances[basenote].close()
+        instances = self._instances
+        if instances and self._get_order is not None:
+            for basenote in reversed(self._get_order):
+                if basenote not in instances:
+                    # Provider is not an instance; no close implementation.
+                    continue
+                # Note: Unable to apply injector on close method.
+                if self.instrument is None:
+                    instances[basenote].close()
+                else:
+                    self._close_timed(basenote, instances[basenote])
         self.closed = True
+        if self.stats_aggregate is not None:
+            self.aggregate_stats()
+
+    def _close_timed(self, basenote, provider):
+        # Close provider, recording its latency with `instrument`.
+        instrument = self.instrument
+        start = instrument.clock()
+        try:
+            provider.close()
+        except Exception:
+            instrument.record_close(
+                basenote, start, instrument.clock(), sys.exc_info()[1])
+            raise
+        instrument.record_close(basenote, start, instrument.clock())
 
     def prepare_callable(self, fn, partial=False):
         """Prepare arguments required to apply function."""
-        notes, keyword_notes = self.get_annotations(fn)
-        return self.prepare_notes(*notes, __partial=partial, **keyword_notes)
+        return self.prepare_plan(self.get_plan(fn), partial=partial)
 
     def prepare_notes(self, *notes, **keyword_notes):
         """Get injection values for all given notes."""
         __partial = keyword_notes.pop('__partial', False)
-        args = tuple(self.get(note) for note in notes)
+        plan = InjectionPlan.compile(notes, keyword_notes)
+        return self.prepare_plan(plan, partial=__partial)
+
+    def prepare_plan(self, plan, partial=False):
+        """Get injection values for a compiled `InjectionPlan`.
+
+        Keyword notes are optional when annotated as `maybe`, or when preparing
+        a partial application, in which case notes which cannot be provided are
+        not included in the resulting keyword arguments.
+
+        On an injector with a `deadline`, bounded resolutions of the plan run
+        in turn in one worker thread, started on first use.
+        """
+        if self.deadline is not None:
+            local = self.thread_local()
+            if getattr(local, 'bound_at', None) is None and (
+                    not hasattr(local, 'worker')):
+                return self._prepare_plan_bounded(local, plan, partial)
+        if self.executor is not None and (
+                not getattr(self.local, 'sequential', 0)):
+            if self.count_unresolved(plan, 2) > 1:
+                return self._prepare_plan_concurrently(plan, partial)
+        get = self._get
+        if plan.batches:
+            batched = self._get_batches(plan.batches)
+            if batched:
+                def get(note, get=get):
+                    if note in batched:
+                        return self._get_batched(batched, note)
+                    return get(note)
+        args = tuple([get(note) for note in plan.args])
         kwargs = {}
-        for arg in keyword_notes:
-            note = keyword_notes[arg]
-            if isinstance(note, tuple) and len(note) == 2 and note[0] == MAYBE:
-                try:
-                    kwargs[arg] = self.get(note[1])
-                except LookupError:
+        values = self._values
+        for arg, note, maybe in plan.kwargs:
+            if maybe or partial:
+                # Skip notes which cannot be provided, without LookupError.
+                if not (values and note.basenote in values) and (
+                        self._skip_missing(note)):
                     continue
-            elif __partial:
                 try:
-                    kwargs[arg] = self.get(note)
+                    kwargs[arg] = get(note)
                 except LookupError:
                     continue
             else:
-                kwargs[arg] = self.get(note)
+                kwargs[arg] = get(note)
         return args, kwargs
 
-    @classmethod
-    def parse_note(cls, note):
-        """Parse string annotation into object reference with optional name."""
-        if isinstance(note, tuple):
-            if len(note) != 2:
-                raise ValueError('tuple annotations must be length 2')
-            return note
+    def count_unresolved(self, plan, limit=None):
+        """Count notes of an `InjectionPlan` without a resolved value, up to
+        `limit`, if given.
+        """
+        values = self._values or ()
+        count = 0
+        for note in itertools.chain(plan.args, [kw[1] for kw in plan.kwargs]):
+            if note.name is not None or note.mode is not None or (
+                    note.basenote not in values):
+                count += 1
+                if count == limit:
+                    break
+        return count
+
+    def _prepare_plan_concurrently(self, plan, partial):
+        # Resolve each note in the executor, raising the first error in order
+        # of the plan only after all notes are resolved. Resolved values are
+        # read inline rather than wait on a worker.
+        submit, get = self.executor.submit, self._get_in_worker
+        path = tuple(self.resolving())
+        values = self._values or ()
+        start = len(self.get_order)
+
+        def dispatch(note):
+            if note.name is None and note.mode is None and (
+                    note.basenote in values):
+                return ResolvedFuture(self._get, note)
+            return submit(get, note, path)
+
+        arg_futures = [dispatch(note) for note in plan.args]
+        kwarg_futures = [
+            None if (maybe or partial) and self._skip_missing(note)
+            else dispatch(note) for _, note, maybe in plan.kwargs]
+        errors = [
+            f.exception() for f in arg_futures + kwarg_futures
+            if f is not None]
+        self._order_resolved(plan, start)
+        for error in errors[:len(arg_futures)]:
+            if error is not None:
+                raise error
+        args = tuple([future.result() for future in arg_futures])
+        kwargs = {}
+        for (arg, note, maybe), future in zip(plan.kwargs, kwarg_futures):
+            if future is None:
+                # Optional note which cannot be provided.
+                continue
+            error = future.exception()
+            if error is None:
+                kwargs[arg] = future.result()
+            elif not ((maybe or partial) and isinstance(error, LookupError)):
+                raise error
+        return args, kwargs
+
+    def _order_resolved(self, plan, start):
+        # Reorder basenotes first resolved since `start` in `get_order` as if
+        # resolved sequentially, i.e. notes of the plan in order of the plan,
+        # each after its dependencies, rather than in order of completion.
+        get_order = self.get_order
+        with self.lock:
+            resolved = get_order.items[start:]
+            if len(resolved) < 2:
+                return
+            edges = self.current_graph().edges
+            pending = set(resolved)
+            order = []
+
+            def visit(basenote):
+                if basenote in pending:
+                    pending.discard(basenote)
+                    for dependency in edges.get(basenote, ()):
+                        visit(dependency)
+                    order.append(basenote)
+
+            notes = itertools.chain(plan.args, [kw[1] for kw in plan.kwargs])
+            for note in notes:
+                if note.mode is None:
+                    visit(note.basenote)
+            for basenote in resolved:
+                visit(basenote)
+            get_order.items[start:] = order
+
+    def _get_in_worker(self, note, path=()):
+        # Resolve note in executor, marking thread to resolve sequentially,
+        # continuing the resolution path of the requesting thread.
+        local = self.local
+        local.sequential = getattr(local, 'sequential', 0) + 1
+        resolving = getattr(local, 'resolving', None)
+        local.resolving = list(path)
         try:
-            match = cls.re_note.match(note)
+            return self._get(note)
+        finally:
+            local.sequential -= 1
+            if resolving is None:
+                del local.resolving
+            else:
+                local.resolving = resolving
+
+    def get_plan(self, fn):
+        """Get the `InjectionPlan` of an annotated callable, compiling once.
+
+        Plans are cached by function object, using the function of a method,
+        and by `annotator_class`, which reads the annotations. Raises
+        AttributeError if the callable is not annotated.
+        """
+        key = self.annotator_class, getattr(fn, '__func__', fn)
+        try:
+            return self.plans[key]
+        except KeyError:
+            pass
         except TypeError:
-            # Note is not a string. Support any Python object as a note.
-            return note, None
-        return match.groups()
+            # Callable is not hashable; compile without caching.
+            key = None
+        notes, keyword_notes = self.get_annotations(fn)
+        plan = InjectionPlan.compile(notes, keyword_notes)
+        if key is not None:
+            if len(self.plans) >= self.plan_cache_size:
+                self.plans.clear()
+            self.plans[key] = plan
+        return plan
+
+    @classmethod
+    def parse_note(cls, note):
+        """Parse string annotation into object reference with optional name.
+
+        See `Note` for the parsed representation used by the injector.
+        """
+        note = Note.parse(note)
+        return note.basenote, note.name
 
     def handle_provider(self, provider_or_fn, note):
-        """Get value from provider as requested by note."""
+        """Get value from provider as requested by note.
+
+        Accepts a `Registration` or a provider not yet classified.
+        """
         # Implementation in separate method to support accurate book-keeping.
-        basenote, name = self.parse_note(note)
-        result = self._handle_provider(provider_or_fn, note, basenote, name)
+        note = Note.parse(note)
+        if not isinstance(provider_or_fn, Registration):
+            provider_or_fn = self.classify(provider_or_fn)
+        if provider_or_fn.scope == SINGLETON and self.scope != SINGLETON:
+            return self._handle_singleton(provider_or_fn, note)
+        basenote = note.basenote
+        resolving = self._resolving
+        if resolving is None or self.local is not None:
+            resolving = self.resolving()
+        if basenote in resolving:
+            cycle = resolving[resolving.index(basenote):] + [basenote]
+            raise CyclicDependencyError(cycle)
+        resolving.append(basenote)
+        try:
+            if self.locks is not None:
+                return self._handle_provider_locked(provider_or_fn, note)
+            result = self._handle_provider(provider_or_fn, note)
+            self.get_order.add(basenote)
+            return result
+        finally:
+            resolving.pop()
+
+    def resolving(self):
+        """Basenotes in resolution, outermost first, in the current thread.
+
+        A basenote which re-enters resolution raises `CyclicDependencyError`.
+        Notes resolved in the executor continue the path of the thread which
+        requested them.
+        """
+        if self.local is None:
+            if self._resolving is None:
+                self._resolving = []
+            return self._resolving
+        try:
+            return self.local.resolving
+        except AttributeError:
+            resolving = self.local.resolving = []
+            return resolving
+
+    def _handle_singleton(self, registration, note):
+        # Resolve in the singleton injector of the class, caching values but
+        # not instances, which are closed on shutdown.
+        singletons = self.singleton_injector()
+        basenote = note.basenote
+        if note.name is None and basenote in singletons.values:
+            value = singletons.values[basenote]
+        else:
+            value = singletons.handle_provider(registration, note)
+        if note.name is None:
+            value = self._store(self.values, basenote, value)
+        return value
+
+    def _handle_provider_locked(self, registration, note):
+        # Resolve with a lock per basenote on first resolution, such that each
+        # provider is initialized once. Following resolutions do not lock,
+        # except get-by-name of kinds which do not support concurrent calls.
+        basenote = note.basenote
+        if registration.kind in self.instance_kinds and (
+                basenote not in self.instances):
+            locked = True
+        elif note.name is None:
+            locked = registration.scope != TRANSIENT
+        else:
+            locked = registration.kind in self.serial_kinds
+        if not locked:
+            result = self._handle_provider(registration, note)
+        else:
+            lock = self.locks.get(basenote)
+            if lock is None:
+                lock = self.locks.setdefault(basenote, threading.RLock())
+            # Resolve dependencies sequentially while holding the lock, as
+            # executor workers may be waiting on it.
+            local = self.local
+            with lock:
+                if note.name is None and basenote in self.values:
+                    return self.values[basenote]
+                local.sequential = getattr(local, 'sequential', 0) + 1
+                try:
+                    result = self._handle_provider(registration, note)
+                finally:
+                    local.sequential -= 1
         if basenote not in self.get_order:
-            self.get_order.append(basenote)
+            with self.lock:
+                self.get_order.add(basenote)
         return result
 
-    def _handle_provider(self, provider_or_fn, note, basenote, name):
+    def _handle_provider(self, registration, note):
+        memo = None
+        if registration.memoize and note.name is not None and (
+                note.mode is None):
+            memo = self._memo(registration, note.basenote)
+            value = memo.lookup(note.name)
+            if value is not Memo.missing:
+                return value
+        resolver = getattr(self, self.resolvers[registration.kind])
+        bounded = registration.timeout is not None or (
+            self.deadline is not None)
+        if bounded and registration.kind != Registration.VALUE:
+            # A value cannot block, so resolve it inline.
+            resolver = functools.partial(self._resolve_within, resolver)
+        if self.instrument is None:
+            value = resolver(registration, note)
+        else:
+            instrument = self.instrument
+            start = instrument.clock()
+            try:
+                value = resolver(registration, note)
+            finally:
+                instrument.record_resolve(
+                    note, registration.kind, start, instrument.clock())
+        if memo is not None:
+            memo.put(note.name, value)
+        return value
+
+    def _prepare_plan_bounded(self, local, plan, partial):
+        # Prepare plan with the worker of the current thread, on first use,
+        # see `_start_bounded`, stopping it once the plan is prepared.
+        local.worker = None
+        try:
+            return self.prepare_plan(plan, partial)
+        finally:
+            worker = local.worker
+            del local.worker
+            if worker is not None:
+                worker.stop()
+
+    def thread_local(self):
+        """Thread-local state of resolution, allocated on first use.
+
+        Injectors which are not `thread_safe` allocate it for resolution in a
+        separate thread, see `Injector.provider`.
+        """
+        local = self.local
+        if local is None:
+            # Track resolution per thread from now on; see `resolving`.
+            resolving = self.resolving()
+            local = self.local = threading.local()
+            local.resolving = resolving
+        return local
+
+    def _start_bounded(self, run, basenote):
+        # Run a bounded resolution in the worker of the plan in preparation
+        # in the current thread, if any, or else in a thread of its own.
+        # Return the worker, or None.
+        local = self.local
+        worker = getattr(local, 'worker', False)
+        name = 'jeni {!r}'.format(basenote)
+        if worker is False:
+            thread = threading.Thread(target=run, name=name)
+            thread.daemon = True
+            thread.start()
+            return None
+        if worker is None:
+            worker = local.worker = ResolutionWorker()
+        worker.submit(run, name)
+        return worker
+
+    def _resolve_within(self, resolver, registration, note):
+        # Resolve in a separate thread, raising ResolutionTimeoutError if it
+        # does not complete by the time limit of the registration. Nested
+        # resolutions run in the same thread, within the limit of the
+        # resolution which encloses them, unless their own limit is sooner.
+        local = self.thread_local()
+        now = self.clock()
+        limit_at = self.resolve_by(registration, now)
+        path = list(self.resolving())
+        if limit_at <= now:
+            raise self.timeout_error(note, path, limit_at - now)
+        bound_at = getattr(local, 'bound_at', None)
+        if bound_at is not None and bound_at <= limit_at:
+            return resolver(registration, note)
+        basenote = note.basenote
+        guard = threading.Lock()
+        outcome, abandoned = [], []
+        done = threading.Event()
+
+        def run():
+            # Continue the resolution path of the requesting thread, with its
+            # own stack, and resolve dependencies sequentially. Keep what the
+            # resolution stores for basenote aside, see `_store`, to publish
+            # it only if the resolution completes in time.
+            sequential = getattr(local, 'sequential', 0)
+            local.resolving = list(path)
+            local.bound_at = limit_at
+            local.sequential = sequential + 1
+            local.detached, local.stash = basenote, []
+            try:
+                result = resolver(registration, note), None
+            except BaseException:
+                result = None, sys.exc_info()
+            stash, local.detached, local.stash = local.stash, None, None
+            local.bound_at, local.sequential = None, sequential
+            with guard:
+                late = bool(abandoned)
+                if not late:
+                    self._publish(stash)
+                outcome.append(result)
+            done.set()
+            if late:
+                # No caller can use the instance this resolution created.
+                for state, _, obj in stash:
+                    if state is self._instances:
+                        obj.close()
+
+        worker = self._start_bounded(run, basenote)
+        if not done.wait(limit_at - now):
+            with guard:
+                if not outcome:
+                    abandoned.append(True)
+            if abandoned:
+                if worker is not None:
+                    # Leave the worker to the abandoned resolution.
+                    worker.stop()
+                    local.worker = None
+                raise self.timeout_error(note, path, limit_at - now)
+        value, exc_info = outcome[0]
+        if exc_info is not None:
+            six.reraise(*exc_info)
+        return value
+
+    def _store(self, state, basenote, obj):
+        # Store value or instance of basenote in state, unless stored already,
+        # e.g. by a resolution which completed after it timed out, returning
+        # the stored object. Within a bounded resolution of basenote, keep it
+        # aside, to `_publish` if the resolution completes in time.
+        local = self.local
+        if local is not None and getattr(local, 'detached', None) == basenote:
+            local.stash.append((state, basenote, obj))
+            return obj
+        return state.setdefault(basenote, obj)
+
+    def _publish(self, stash):
+        # Store what a bounded resolution kept aside, closing any instance it
+        # created which is a duplicate of an instance stored meanwhile.
+        for state, basenote, obj in stash:
+            if state.setdefault(basenote, obj) is not obj:
+                if state is self._instances:
+                    obj.close()
+
+    def resolve_by(self, registration, now):
+        """Time of `clock` by which to resolve a registration, or None.
+
+        The deadline of the injector starts with its first resolution which
+        is subject to it.
+        """
+        deadline_at = self._deadline_at
+        if deadline_at is None and self.deadline is not None:
+            deadline_at = self._deadline_at = now + self.deadline
+        if registration.timeout is not None:
+            timeout_at = now + registration.timeout
+            if deadline_at is None or timeout_at < deadline_at:
+                return timeout_at
+        return deadline_at
+
+    @staticmethod
+    def timeout_error(note, path, limit):
+        """Create `ResolutionTimeoutError` of note, in resolution path."""
+        msg = '{!r} timed out after {:.3g}s, resolving {}'.format(
+            note.note, max(limit, 0), ' -> '.join(map(repr, path)))
+        return ResolutionTimeoutError(
+            msg, note=note.note, path=path, timeout=limit)
+
+    def _memo(self, registration, basenote):
+        # Get the memo of basenote, created on first get-by-name.
+        memos = self.memos
+        memo = memos.get(basenote)
+        if memo is None:
+            memo = memos.setdefault(basenote, Memo(
+                registration.memoize, thread_safe=self.locks is not None))
+        return memo
+
+    def _resolve_value(self, registration, note):
+        if note.name is not None:
+            msg = 'value does not support get-by-name: {!r}'
+            raise TypeError(msg.format(note.note))
+        value = registration.provider
+        if registration.scope != TRANSIENT:
+            self._store(self.values, note.basenote, value)
+        return value
+
+    def _resolve_factory(self, registration, note):
+        if note.mode == GET_MANY:
+            return registration.provider.get_many(note.name)
+        return self._call_provider(
+            registration.fn, note,
+            registration.kind == Registration.ANNOTATED_FACTORY,
+            registration.scope != TRANSIENT)
+
+    def _resolve_provider_class(self, registration, note):
+        basenote = note.basenote
         if basenote in self.instances:
-            provider_or_fn = self.instances[basenote]
-        elif inspect.isclass(provider_or_fn):
-            # Inject class __init__, if annotated.
-            cls = provider_or_fn
-            if hasattr(cls, '__init__') and self.has_annotations(cls.__init__):
+            provider = self.instances[basenote]
+        else:
+            instrument = self.instrument
+            if instrument is not None:
+                start = instrument.clock()
+            cls = registration.provider
+            if registration.kind == Registration.ANNOTATED_PROVIDER_CLASS:
+                # Inject class __init__.
                 args, kwargs = self.prepare_callable(cls.__init__)
-                provider_or_fn = provider_or_fn(*args, **kwargs)
+                provider = cls(*args, **kwargs)
             else:
-                provider_or_fn = provider_or_fn()
-            self.instances[basenote] = provider_or_fn
-        elif inspect.isgeneratorfunction(provider_or_fn):
-            provider_or_fn, value = self.init_generator(provider_or_fn)
-            self.instances[basenote] = provider_or_fn
-            self.values[basenote] = value
-            if name is None:
-                return value
-        if hasattr(provider_or_fn, 'get'):
-            fn = provider_or_fn.get
+                provider = cls()
+            stored = self._store(self.instances, basenote, provider)
+            if stored is not provider:
+                provider.close()
+                provider = stored
+            if instrument is not None:
+                instrument.record_init(basenote, start, instrument.clock())
+        if note.mode == GET_MANY:
+            return provider.get_many(note.name)
+        return self._call_provider(
+            getattr(provider, 'get', provider), note,
+            registration.annotated_get, registration.scope != TRANSIENT)
+
+    def _resolve_generator(self, registration, note):
+        basenote = note.basenote
+        if basenote in self.instances:
+            provider = self.instances[basenote]
         else:
-            fn = provider_or_fn
-        if self.has_annotations(fn):
-            fn = self.partial(fn)
+            instrument = self.instrument
+            if instrument is not None:
+                start = instrument.clock()
+            provider, value = self.init_generator(registration.provider)
+            stored = self._store(self.instances, basenote, provider)
+            if stored is not provider:
+                provider.close()
+                provider = stored
+                value = self.values.get(basenote, value)
+            else:
+                value = self._store(self.values, basenote, value)
+            if instrument is not None:
+                instrument.record_init(basenote, start, instrument.clock())
+            if note.name is None:
+                return value
+        return self._call_provider(provider.get, note)
+
+    def _call_provider(self, fn, note, annotated=False, cache=True):
+        # Call provider function, partially injected if annotated, caching
+        # value of base note unless scoped as transient.
         try:
-            if name is None:
-                value = fn()
-                self.values[basenote] = value
+            if annotated:
+                args, kwargs = self.prepare_callable(fn, partial=True)
+            else:
+                args, kwargs = (), {}
+            if note.name is None:
+                value = fn(*args, **kwargs)
+                if cache:
+                    value = self._store(self.values, note.basenote, value)
                 return value
-            return fn(name=name)
+            kwargs['name'] = note.name
+            return fn(*args, **kwargs)
         except UnsetError:
             # Use sys.exc_info to support both Python 2 and Python 3.
             exc_type, exc_value, tb = sys.exc_info()
             exc_msg = str(exc_value)
             if exc_msg:
-                msg = '{}: {!r}'.format(exc_msg, note)
+                msg = '{}: {!r}'.format(exc_msg, note.note)
+            else:
+                msg = repr(note.note)
+            if exc_value.note is None:
+                # Raised by this provider; annotate in place, as creating a
+                # new error is costly where unset notes are common (`maybe`).
+                exc_value.args, exc_value.note = (msg,), note.note
+                raise
+            if isinstance(exc_value, ResolutionTimeoutError):
+                # Names the note which timed out and its resolution path.
+                raise
+            six.reraise(exc_type, exc_type(msg, note=note.note), tb)
+
+    @classmethod
+    def classify(cls, provider):
+        """Classify a provider into a `Registration` of its kind."""
+        if isinstance(provider, Registration):
+            return provider
+        annotator = cls.annotator_class()
+        if inspect.isclass(provider):
+            init = getattr(provider, '__init__', None)
+            if init is not None and annotator.has_annotations(init):
+                kind = Registration.ANNOTATED_PROVIDER_CLASS
             else:
-                msg = repr(note)
-            six.reraise(exc_type, exc_type(msg, note=note), tb)
+                kind = Registration.PROVIDER_CLASS
+            get = getattr(provider, 'get', None)
+            annotated_get = get is not None and annotator.has_annotations(get)
+            return Registration(provider, kind, annotated_get=annotated_get)
+        elif inspect.isgeneratorfunction(provider):
+            if getattr(provider, 'support_name', False):
+                return Registration(provider, Registration.NAME_GENERATOR)
+            return Registration(provider, Registration.GENERATOR)
+        fn = getattr(provider, 'get', provider)
+        if annotator.has_annotations(fn):
+            kind = Registration.ANNOTATED_FACTORY
+        else:
+            kind = Registration.FACTORY
+        return Registration(provider, kind, fn=fn)
 
     @classmethod
-    def register(cls, note, provider):
-        """Implementation to register provider via `provider` & `factory`."""
-        basenote, name = cls.parse_note(note)
+    def register(cls, note, provider, scope=None, memoize=None,
+                 timeout=None):
+        """Implementation to register provider via `provider` & `factory`.
+
+        The `scope` of the registration defaults to `PER_INJECTOR`, unless the
+        provider is a `Registration` with its own scope, and likewise for
+        `memoize`, which defaults to not memoize, and `timeout`.
+        """
+        basenote = Note.parse(note).basenote
+        registration = cls.classify(provider)
+        if scope is not None:
+            if scope not in SCOPES:
+                raise ValueError('unknown scope: {!r}'.format(scope))
+            registration.scope = scope
+        if memoize is not None:
+            if memoize is True:
+                memoize = cls.memo_size
+            elif memoize is False:
+                memoize = 0
+            if not isinstance(memoize, six.integer_types) or memoize < 0:
+                raise ValueError('invalid memoize: {!r}'.format(memoize))
+            registration.memoize = memoize
+        if timeout is not None:
+            if timeout <= 0:
+                raise ValueError('invalid timeout: {!r}'.format(timeout))
+            registration.timeout = timeout
+        if registration.scope == TRANSIENT and registration.kind in (
+                cls.instance_kinds - cls.class_kinds):
+            msg = '{!r} does not support transient scope'
+            raise ValueError(msg.format(provider))
+        if registration.scope == TRANSIENT and registration.memoize:
+            msg = '{!r} of transient scope does not support memoize'
+            raise ValueError(msg.format(provider))
         if 'provider_registry' not in vars(cls):
             cls.provider_registry = {}
-        cls.provider_registry[basenote] = provider
+        cls.provider_registry[basenote] = registration
+        Injector.registry_version += 1
+
+    @classmethod
+    def dependency_graph(cls):
+        """Build the `DependencyGraph` of providers registered on this class.
+        """
+        return DependencyGraph(cls)
+
+    @classmethod
+    def current_graph(cls):
+        """`DependencyGraph` of the class, built again if outdated."""
+        try:
+            version, graph = cls.__dict__['merged_graph']
+        except KeyError:
+            version, graph = None, None
+        if version != Injector.registry_version:
+            version = Injector.registry_version
+            graph = cls.dependency_graph()
+            cls.merged_graph = (version, graph)
+        return graph
+
+    @classmethod
+    def validate(cls):
+        """Raise `DependencyError` if any registered provider depends on an
+        unregistered note or on itself through a cycle. Returns the graph.
+        """
+        return cls.dependency_graph().validate()
+
+    @classmethod
+    def singleton_injector(cls):
+        """Get the injector holding providers of `SINGLETON` scope.
+
+        The singleton injector of a class is thread-safe and shared by all
+        injectors of the class. It is created on first use, and created again
+        on first use after `shutdown`.
+        """
+        injector = cls.__dict__.get('singletons')
+        if injector is None or injector.closed:
+            with Injector.singleton_lock:
+                injector = cls.__dict__.get('singletons')
+                if injector is None or injector.closed:
+                    injector = cls(thread_safe=True)
+                    injector.scope = SINGLETON
+                    cls.singletons = injector
+        return injector
+
+    @classmethod
+    def shutdown(cls):
+        """Close providers of `SINGLETON` scope of this class, if any."""
+        injector = cls.__dict__.get('singletons')
+        if injector is not None and not injector.closed:
+            injector.close()
 
     @classmethod
     def lookup(cls, basenote):
-        """Look up note in registered annotations, walking class tree."""
-        # Walk method resolution order, which includes current class.
-        for c in cls.mro():
+        """Look up note in registered annotations, walking class tree.
+
+        Subclasses may override `lookup` to provide notes which are not
+        registered, in which case resolution calls it for each note not yet
+        resolved, see `lookup_registration`.
+        """
+        if isinstance(basenote, Note):
+            basenote = basenote.basenote
+        registry = cls.current_registry()
+        if basenote in registry:
+            return registry[basenote].provider
+        raise LookupError(repr(basenote))
+
+    @classmethod
+    def lookup_registration(cls, basenote):
+        """Look up the `Registration` of a note, as classified on register.
+
+        If the class overrides `lookup`, the provider it returns is classified
+        on every call, unless it is the registered provider.
+        """
+        if isinstance(basenote, Note):
+            basenote = basenote.basenote
+        registry = cls.current_registry()
+        if cls.overrides_lookup():
+            provider = cls.lookup(basenote)
+            registration = registry.get(basenote)
+            if registration is None or registration.provider is not provider:
+                registration = cls.classify(provider)
+            return registration
+        if basenote in registry:
+            return registry[basenote]
+        raise LookupError(repr(basenote))
+
+    @classmethod
+    def overrides_lookup(cls):
+        """True if the class overrides `lookup`, else False."""
+        return cls.lookup.__func__ is not Injector.lookup.__func__
+
+    @classmethod
+    def current_registry(cls):
+        """Merged registry, basenote -> `Registration`, merged if outdated."""
+        try:
+            version, registry = cls.__dict__['merged_registry']
+        except KeyError:
+            version, registry = None, None
+        if version != Injector.registry_version:
+            registry = cls.merge_registry()
+        return registry
+
+    @classmethod
+    def merge_registry(cls):
+        """Flatten registries of the class tree into a single dict.
+
+        The merged registry is stored on the class, stamped with the current
+        `registry_version`, such that `lookup` is a single dict access until
+        a provider is registered on any Injector class.
+        """
+        version = Injector.registry_version
+        registry = {}
+        # Walk method resolution order in reverse, which includes current
+        # class, such that subclass registrations override base classes.
+        for c in reversed(cls.mro()):
             if 'provider_registry' not in vars(c):
                 # class is a mixin, super to base class, or never registered.
                 continue
-            if basenote in c.provider_registry:
-                # note is in the registry.
-                return c.provider_registry[basenote]
-        raise LookupError(repr(basenote))
+            registry.update(c.provider_registry)
+        for registration in registry.values():
+            if registration.kind == Registration.FACTORY:
+                cls.reclassify(registration)
+        cls.merged_registry = (version, registry)
+        return registry
+
+    @classmethod
+    def reclassify(cls, registration):
+        """Classify a factory again, in case annotated after registration.
+
+        A decorator may annotate a factory after registering it, e.g. with
+        `annotate` stacked above `factory`::
+
+            @annotate('foo')
+            @Injector.factory('bar')
+            def bar(foo):
+                return foo
+
+        Factories are reclassified when the registry is merged, i.e. on the
+        first lookup after registration.
+        """
+        classified = cls.classify(registration.provider)
+        if classified.kind == Registration.ANNOTATED_FACTORY:
+            registration.kind = classified.kind
+            registration.fn = classified.fn
 
     def init_generator(self, fn):
         """Implementation to initialize generator providers."""
-        provider = self.generator_provider(fn, support_name=fn.support_name)
+        support_name = getattr(fn, 'support_name', False)
+        provider = self.generator_provider(fn, support_name=support_name)
         if self.has_annotations(provider.function):
-            notes, keyword_notes = self.get_annotations(provider.function)
-            args, kwargs = self.prepare_notes(*notes, **keyword_notes)
+            args, kwargs = self.prepare_callable(provider.function)
             value = provider.init(*args, **kwargs)
         else:
             value = provider.init()
@@ -715,6 +3124,63 @@ class Injector(object):
         return self.annotator.has_annotations(*a, **kw)
 
 
+class InjectorPool(object):
+    """Hands out injectors of a class, reused after close & reset.
+
+    A per-request injector costs an allocation of its state for each request.
+    A pool keeps up to `size` closed injectors to reset and hand out again::
+
+        pool = InjectorPool(Injector)
+
+        with pool.injector() as injector:
+            injector.apply(handler)
+
+    Alternatively, `acquire` an injector and `release` it when done, which
+    closes the injector if not yet closed. Keyword arguments are passed to
+    construct new injectors. Acquire and release are thread-safe.
+    """
+
+    def __init__(self, injector_class, size=64, **kw):
+        self.injector_class = injector_class
+        self.size = size
+        self.kwargs = kw
+        self.idle = collections.deque()
+
+    def acquire(self):
+        """Get an injector ready for use, reused if any are idle."""
+        try:
+            return self.idle.pop()
+        except IndexError:
+            return self.injector_class(**self.kwargs)
+
+    def release(self, injector):
+        """Close injector if not yet closed, and keep it for reuse.
+
+        An injector which fails to close is not reused.
+        """
+        if not injector.closed:
+            injector.close()
+        if len(self.idle) < self.size:
+            injector.reset()
+            self.idle.append(injector)
+
+    @contextlib.contextmanager
+    def injector(self):
+        """Context manager to acquire an injector & release on exit."""
+        injector = self.acquire()
+        try:
+            yield injector
+        finally:
+            self.release(injector)
+
+    def __len__(self):
+        return len(self.idle)
+
+    def __repr__(self):
+        return '{}({!r}, size={!r})'.format(
+            self.__class__.__name__, self.injector_class, self.size)
+
+
 class InjectorProxy(object):
     """Forwards getattr & getitem to enclosed injector.
 
@@ -749,6 +3215,212 @@ class InjectorProxy(object):
         return True
 
 
+class ResolvedFuture(object):
+    """Future of a note resolved inline, see `Injector.prepare_plan`."""
+    __slots__ = ('value', 'error')
+
+    def __init__(self, get, note):
+        self.value = self.error = None
+        try:
+            self.value = get(note)
+        except Exception:
+            self.error = sys.exc_info()[1]
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def exception(self):
+        return self.error
+
+
+class ResolutionWorker(object):
+    """Thread which runs bounded resolutions in turn, named after each.
+
+    Started by `Injector.prepare_plan` on an injector with a `deadline`, such
+    that a plan resolves in one thread rather than a thread per note.
+    """
+    __slots__ = ('jobs',)
+
+    def __init__(self):
+        self.jobs = six.moves.queue.Queue()
+        thread = threading.Thread(target=self.run, name='jeni worker')
+        thread.daemon = True
+        thread.start()
+
+    def submit(self, job, name):
+        self.jobs.put((job, name))
+
+    def stop(self):
+        """Stop once submitted jobs complete."""
+        self.jobs.put(None)
+
+    def run(self):
+        thread = threading.current_thread()
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                return
+            job, thread.name = item
+            job()
+
+
+class LazyPartial(object):
+    """Callable which injects an annotated callable on first call.
+
+    Returned by `Injector.partial`, and injected for notes wrapped with
+    `annotate.partial`. The first call prepares the injected arguments,
+    exactly once even when called concurrently, and repeat calls reuse them.
+    Calls without keyword arguments apply the prepared keyword arguments
+    as-is, without merging dicts, for use in hot loops::
+
+        process = injector.partial(process_record)
+        for record in records:
+            process(record)
+    """
+    __slots__ = ('injector', 'fn', 'args', 'kwargs', 'pack', 'lock')
+
+    def __init__(self, injector, fn, args=(), kwargs=None):
+        self.injector = injector
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs or {}
+        #: Prepared (args, kwargs) to apply, None until the first call.
+        self.pack = None
+        self.lock = threading.Lock()
+
+    def __call__(self, *a, **kw):
+        pack = self.pack
+        if pack is None:
+            pack = self.inject()
+        args, kwargs = pack
+        if a:
+            args = args + a
+        if kw:
+            if kwargs:
+                merged = kwargs.copy()
+                merged.update(kw)
+                kw = merged
+            return self.fn(*args, **kw)
+        return self.fn(*args, **kwargs)
+
+    def inject(self):
+        """Prepare arguments to apply, once, returning ``(args, kwargs)``."""
+        with self.lock:
+            if self.pack is None:
+                args, kwargs = self.injector.prepare_callable(
+                    self.fn, partial=True)
+                kwargs.update(self.kwargs)
+                self.pack = (args + self.args, kwargs)
+            return self.pack
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.fn)
+
+
+class LazyProxy(object):
+    """Proxy of a note, resolved by the injector on first use.
+
+    Injected for notes wrapped with `annotate.lazy`. The note is resolved
+    with `injector.get` on first attribute access, call, item access or
+    other use of the proxy, i.e. the provider opens (and is added to the
+    injector's `get_order` to close) only if the dependency is used. After,
+    the proxy forwards to the resolved object, see `resolve`::
+
+        proxy = injector.get(annotate.lazy('hello'))
+        proxy.resolved # False
+        proxy.upper()  # 'hello' resolves here.
+        proxy.resolved # True
+
+    Use of a proxy after its injector is closed raises RuntimeError.
+    """
+
+    __slots__ = ('_jeni_injector', '_jeni_note', '_jeni_target')
+
+    _unresolved = object()
+
+    def __init__(self, injector, note):
+        object.__setattr__(self, '_jeni_injector', injector)
+        object.__setattr__(self, '_jeni_note', note)
+        object.__setattr__(self, '_jeni_target', LazyProxy._unresolved)
+
+    @property
+    def resolved(self):
+        """True if the note has been resolved, else False."""
+        return self._jeni_target is not LazyProxy._unresolved
+
+    def resolve(self):
+        """Resolve the note, once, and return the resolved object."""
+        target = self._jeni_target
+        if target is LazyProxy._unresolved:
+            # The injector caches the resolved object; a concurrent resolve
+            # gets the same object unless the provider is a factory.
+            target = self._jeni_injector.get(self._jeni_note)
+            object.__setattr__(self, '_jeni_target', target)
+        return target
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.resolve(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self.resolve(), name)
+
+    def __call__(self, *a, **kw):
+        return self.resolve()(*a, **kw)
+
+    def __getitem__(self, key):
+        return self.resolve()[key]
+
+    def __setitem__(self, key, value):
+        self.resolve()[key] = value
+
+    def __delitem__(self, key):
+        del self.resolve()[key]
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __len__(self):
+        return len(self.resolve())
+
+    def __contains__(self, item):
+        return item in self.resolve()
+
+    def __bool__(self):
+        return bool(self.resolve())
+
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        return self.resolve() == other
+
+    def __ne__(self, other):
+        return self.resolve() != other
+
+    def __hash__(self):
+        return hash(self.resolve())
+
+    def __str__(self):
+        return str(self.resolve())
+
+    def __enter__(self):
+        return self.resolve().__enter__()
+
+    def __exit__(self, *exc_info):
+        return self.resolve().__exit__(*exc_info)
+
+    def __repr__(self):
+        if not self.resolved:
+            return '<{} {!r} (unresolved)>'.format(
+                self.__class__.__name__, self._jeni_note)
+        return '<{} {!r}: {!r}>'.format(
+            self.__class__.__name__, self._jeni_note, self._jeni_target)
+
+
 def class_in_progress(stack=None):
     """True if currently inside a class definition, else False."""
     if stack is None:
@@ -765,3 +3437,10 @@ def class_in_progress(stack=None):
 def is_callable(obj):
     """True if object is callable, else False."""
     return hasattr(obj, '__call__')
+
+
+def is_identifier(name):
+    """True if name is a valid Python identifier, else False."""
+    if not isinstance(name, six.string_types) or keyword.iskeyword(name):
+        return False
+    return re.match(r'^[A-Za-z_][A-Za-z0-9_]*$', name) is not None
@@ -0,0 +1,837 @@
+# jeni_async.py
+# Copyright 2013-2014 Ron DuPlain <ron.duplain@gmail.com> (see AUTHORS file).
+# Released under the BSD License (see LICENSE file).
+
+"""``jeni`` injects annotated dependencies, with asyncio (Python 3.6+)."""
+
+import asyncio
+import functools
+import inspect
+import sys
+import timeit
+
+import jeni
+
+try:
+    import contextvars
+except ImportError:
+    # Python 3.6, without detection of cyclic dependencies.
+    contextvars = None
+
+
+ASYNC_GENERATOR = 'async_generator'
+ASYNC_NAME_GENERATOR = 'async_name_generator'
+
+#: Resolution path of the current task, as a tuple of (injector, basenote).
+if contextvars is not None:
+    resolution_path = contextvars.ContextVar('resolution_path', default=())
+else:
+    resolution_path = None
+
+#: Time by which the enclosing resolution of the current task times out.
+if contextvars is not None:
+    resolution_bound = contextvars.ContextVar(
+        'resolution_bound', default=None)
+else:
+    resolution_bound = None
+
+
+class AsyncGeneratorProvider(jeni.Provider):
+    """Manage async generator lifecycle to implement Provider interface.
+
+    `AsyncInjector` uses this class to support registering async generators.
+    When used directly, note that `init` must be awaited before `get`::
+
+        async def generator(foo, bar):
+            yield
+            # continues when AsyncGeneratorProvider.aclose is awaited.
+        provider = AsyncGeneratorProvider(generator)
+        await provider.init('foo', 'bar')
+        await provider.get()
+    """
+
+    def __init__(self, function, support_name=False):
+        """Accept async generator function & whether it supports asend."""
+        if not inspect.isasyncgenfunction(function):
+            msg = '{!r} is not an async generator function'
+            raise TypeError(msg.format(function))
+        self.function = function
+        self.support_name = support_name
+        self.initialized = False
+
+    async def init(self, *a, **kw):
+        """Call function to create generator, passing arguments provided."""
+        self.generator = self.function(*a, **kw)
+        try:
+            self.init_value = await self.generator.__anext__()
+        except StopAsyncIteration:
+            msg = "generator didn't yield: function {!r}"
+            raise RuntimeError(msg.format(self.function))
+        else:
+            self.initialized = True
+            return self.init_value
+
+    async def get(self, name=None):
+        """Get initial yield value, or result of asend(name) if name given."""
+        if not self.initialized:
+            msg = '{!r} not initialized; await `init` before `get`.'
+            raise RuntimeError(msg.format(self))
+        if name is None:
+            return self.init_value
+        elif not self.support_name:
+            msg = "generator does not support get-by-name: function {!r}"
+            raise TypeError(msg.format(self.function))
+        try:
+            value = await self.generator.asend(name)
+        except StopAsyncIteration:
+            msg = "generator didn't yield: function {!r}"
+            raise RuntimeError(msg.format(self.function))
+        return value
+
+    async def aclose(self):
+        """Close the generator."""
+        if not self.initialized:
+            raise RuntimeError('{!r} not initialized'.format(self))
+        if self.support_name:
+            await self.generator.aclose()
+        try:
+            await self.generator.__anext__()
+        except StopAsyncIteration:
+            return
+        else:
+            msg = "generator didn't stop: function {!r}"
+            raise RuntimeError(msg.format(self.function))
+
+
+class AsyncInjector(jeni.Injector):
+    """Collects dependencies and reads annotations to inject them, in asyncio.
+
+    An `AsyncInjector` supports all providers of `Injector`, and in addition
+    supports ``async def`` factories, providers with an ``async def get`` and
+    async generators. Methods which resolve notes are coroutines::
+
+        from jeni_async import AsyncInjector as BaseInjector
+
+        class Injector(BaseInjector):
+            pass
+
+        @Injector.provider('session')
+        async def session():
+            session = await connect()
+            yield session
+            await session.close()
+
+        async with Injector() as injector:
+            await injector.apply(handler)
+
+    Independent notes of an annotated callable are resolved concurrently, such
+    that preparing a callable waits on the slowest of its dependencies rather
+    than the sum of all of them. Each basenote is resolved once per injector,
+    even when requested concurrently.
+    """
+    __slots__ = ('pending',)
+
+    async_generator_provider = AsyncGeneratorProvider
+
+    resolvers = dict(jeni.Injector.resolvers, **{
+        ASYNC_GENERATOR: '_resolve_generator',
+        ASYNC_NAME_GENERATOR: '_resolve_generator',
+    })
+
+    #: Kinds of registration which store an instance on first resolution.
+    instance_kinds = jeni.Injector.instance_kinds | frozenset([
+        ASYNC_GENERATOR,
+        ASYNC_NAME_GENERATOR,
+    ])
+
+    def __init__(self, *a, **kw):
+        """See `Injector.__init__`."""
+        super(AsyncInjector, self).__init__(*a, **kw)
+
+        #: Basenotes currently in first resolution, basenote -> asyncio.Event.
+        self.pending = {}
+
+    @classmethod
+    def provider(cls, note, provider=None, name=False,
+                 scope=jeni.PER_INJECTOR, memoize=False, timeout=None):
+        """Register a provider, including async generators.
+
+        See `Injector.provider`, which this extends to support async
+        generators::
+
+            @Injector.provider('answer')
+            async def answer():
+                yield 42
+
+        A `timeout` cancels the resolution in progress with `asyncio.wait_for`,
+        rather than abandon it in a separate thread.
+        """
+        def decorator(fn_or_class):
+            if inspect.isasyncgenfunction(fn_or_class):
+                fn_or_class.support_name = name
+                cls.register(
+                    note, fn_or_class, scope=scope, memoize=memoize,
+                    timeout=timeout)
+            else:
+                super(AsyncInjector, cls).provider(
+                    note, fn_or_class, name=name, scope=scope,
+                    memoize=memoize, timeout=timeout)
+            return fn_or_class
+        if provider is not None:
+            decorator(provider)
+        else:
+            return decorator
+
+    @classmethod
+    def classify(cls, provider):
+        """Classify a provider into a `Registration`, with async generators."""
+        if inspect.isasyncgenfunction(provider):
+            if getattr(provider, 'support_name', False):
+                return jeni.Registration(provider, ASYNC_NAME_GENERATOR)
+            return jeni.Registration(provider, ASYNC_GENERATOR)
+        return super(AsyncInjector, cls).classify(provider)
+
+    @classmethod
+    async def shutdown(cls):
+        """Close providers of `SINGLETON` scope of this class, if any."""
+        injector = cls.__dict__.get('singletons')
+        if injector is not None and not injector.closed:
+            await injector.close()
+
+    async def warm(self, notes=None):
+        """Resolve notes ahead of use, returning init times by basenote.
+
+        See `Injector.warm`. The independent notes of each level are resolved
+        concurrently.
+        """
+        graph, levels = self.warm_levels(notes)
+        times, errors, skipped, failed = {}, {}, [], set()
+        for level in levels:
+            batch = []
+            for basenote in level:
+                if failed.intersection(graph.required(basenote)):
+                    skipped.append(basenote)
+                    failed.add(basenote)
+                else:
+                    batch.append(basenote)
+            results = await asyncio.gather(
+                *[self._warm_note(basenote) for basenote in batch])
+            for basenote, (elapsed, error) in zip(batch, results):
+                if error is None:
+                    times[basenote] = elapsed
+                else:
+                    errors[basenote] = error
+                    failed.add(basenote)
+        if errors:
+            raise jeni.WarmUpError(errors, skipped, times)
+        return times
+
+    async def _warm_note(self, basenote):
+        # Resolve basenote, returning (elapsed, None) or (None, error).
+        note = jeni.Note(basenote, basenote)
+        start = timeit.default_timer()
+        try:
+            await self._get(note)
+        except jeni.UnsetError as exc:
+            # See `Injector._warm_note`.
+            if basenote not in self.instances:
+                return None, exc
+        except Exception as exc:
+            return None, exc
+        return timeit.default_timer() - start, None
+
+    async def apply(self, fn, *a, **kw):
+        """Fully apply annotated callable, awaiting callable's result."""
+        args, kwargs = await self.prepare_callable(fn)
+        args += a; kwargs.update(kw)
+        return await maybe_await(fn(*args, **kwargs))
+
+    def partial(self, fn, *user_args, **user_kwargs):
+        """Return coroutine function to lazily inject annotated callable.
+
+        See `Injector.partial`.
+        """
+        self.get_plan(fn) # Assert has annotations.
+        arg_pack = []
+        async def lazy_injection_fn(*run_args, **run_kwargs):
+            if not arg_pack:
+                jeni_args, jeni_kwargs = await self.prepare_callable(
+                    fn, partial=True)
+                pack_kwargs = {}
+                pack_kwargs.update(jeni_kwargs)
+                pack_kwargs.update(user_kwargs)
+                arg_pack[:] = [jeni_args + user_args, pack_kwargs]
+            pack_args, pack_kwargs = arg_pack
+            final_kwargs = {}
+            final_kwargs.update(pack_kwargs)
+            final_kwargs.update(run_kwargs)
+            result = fn(*(pack_args + run_args), **final_kwargs)
+            return await maybe_await(result)
+        return lazy_injection_fn
+
+    async def eager_partial(self, fn, *a, **kw):
+        """Partially apply annotated callable, returning a partial function.
+
+        See `Injector.eager_partial`.
+        """
+        args, kwargs = await self.prepare_callable(fn, partial=True)
+        args += a; kwargs.update(kw)
+        return functools.partial(fn, *args, **kwargs)
+
+    def compile(self, fn):
+        """Return coroutine function to apply annotated callable.
+
+        See `Injector.compile`. Resolution in asyncio is not specialized; the
+        coroutine function awaits `apply`.
+        """
+        self.get_plan(fn) # Assert has annotations.
+        async def compiled(*a, **kw):
+            return await self.apply(fn, *a, **kw)
+        assigned = [
+            attr for attr in ('__module__', '__name__', '__doc__')
+            if hasattr(fn, attr)]
+        return functools.update_wrapper(
+            compiled, fn, assigned=assigned, updated=())
+
+    async def apply_regardless(self, fn, *a, **kw):
+        """Like `apply`, but applies if callable is not annotated."""
+        if self.has_annotations(fn):
+            return await self.apply(fn, *a, **kw)
+        return await maybe_await(fn(*a, **kw))
+
+    def partial_regardless(self, fn, *a, **kw):
+        """Like `partial`, but applies if callable is not annotated."""
+        if self.has_annotations(fn):
+            return self.partial(fn, *a, **kw)
+        async def partial_fn(*run_args, **run_kwargs):
+            final_kwargs = dict(kw)
+            final_kwargs.update(run_kwargs)
+            return await maybe_await(fn(*(a + run_args), **final_kwargs))
+        return partial_fn
+
+    async def eager_partial_regardless(self, fn, *a, **kw):
+        """Like `eager_partial`, but applies if callable is not annotated."""
+        if self.has_annotations(fn):
+            return await self.eager_partial(fn, *a, **kw)
+        return functools.partial(fn, *a, **kw)
+
+    async def get(self, note):
+        """Resolve a single note into an object."""
+        return await self._get(jeni.Note.parse(note))
+
+    async def _get(self, note, timed=False):
+        # Resolve a parsed note. See `get`.
+        if self.instrument is not None and not timed:
+            return await self._get_timed(note)
+        if self.closed:
+            raise RuntimeError('{!r} already closed'.format(self))
+
+        # Record request for note even if it fails to resolve.
+        policy = self.stats_policy
+        if policy == jeni.STATS_FULL:
+            stats = self._stats
+            if stats is None:
+                stats = self.stats
+            if self.locks is None:
+                stats[note.note] += 1
+            else:
+                stats.add(note.note)
+        elif policy != jeni.STATS_OFF and (
+                not next(self.sample_counter) % policy):
+            self.record_request(note, policy)
+
+        # Handle injection of partially applied annotated functions.
+        if note.mode is not None:
+            if note.mode == jeni.LAZY:
+                # Attribute access cannot await; inject an awaitable getter.
+                return functools.partial(self.get, note.name)
+            fn, a, kw_items = note.name
+            if note.mode == jeni.PARTIAL:
+                return self.partial(fn, *a, **dict(kw_items))
+            return await self.eager_partial(fn, *a, **dict(kw_items))
+
+        values = self._values
+        if values and note.name is None and note.basenote in values:
+            return values[note.basenote]
+        injector = self
+        if self.parent is not None:
+            injector = self._resolved_by(note.basenote) or self
+            values = injector._values
+            if values and note.name is None and note.basenote in values:
+                return values[note.basenote]
+        try:
+            registration = self.lookup_registration(note.basenote)
+        except LookupError:
+            msg = "Unable to resolve '{}'"
+            raise LookupError(msg.format(note.note))
+        return await injector.handle_provider(registration, note)
+
+    async def _get_timed(self, note):
+        # Resolve a parsed note, recording its latency with `instrument`.
+        instrument = self.instrument
+        cold = not self._is_resolved(note)
+        start = instrument.clock()
+        try:
+            value = await self._get(note, timed=True)
+        except Exception as exc:
+            instrument.record_get(note, start, instrument.clock(), cold, exc)
+            raise
+        instrument.record_get(note, start, instrument.clock(), cold)
+        return value
+
+    async def close(self):
+        """Close injector & injected Provider instances, including generators.
+
+        See `Injector.close`. Providers with an `aclose` method, including
+        async generators, are closed by awaiting `aclose`.
+        """
+        if self.closed:
+            raise RuntimeError('{!r} already closed'.format(self))
+        instances = self._instances
+        if instances and self._get_order is not None:
+            for basenote in reversed(self._get_order):
+                if basenote not in instances:
+                    # Provider is not an instance; no close implementation.
+                    continue
+                provider = instances[basenote]
+                if self.instrument is None:
+                    await self._close_provider(provider)
+                else:
+                    await self._close_timed(basenote, provider)
+        self.closed = True
+        if self.stats_aggregate is not None:
+            self.aggregate_stats()
+
+    async def _close_provider(self, provider):
+        if hasattr(provider, 'aclose'):
+            await provider.aclose()
+        else:
+            await maybe_await(provider.close())
+
+    async def _close_timed(self, basenote, provider):
+        # Close provider, recording its latency with `instrument`.
+        instrument = self.instrument
+        start = instrument.clock()
+        try:
+            await self._close_provider(provider)
+        except Exception as exc:
+            instrument.record_close(basenote, start, instrument.clock(), exc)
+            raise
+        instrument.record_close(basenote, start, instrument.clock())
+
+    async def prepare_callable(self, fn, partial=False):
+        """Prepare arguments required to apply function."""
+        return await self.prepare_plan(self.get_plan(fn), partial=partial)
+
+    async def prepare_notes(self, *notes, **keyword_notes):
+        """Get injection values for all given notes."""
+        __partial = keyword_notes.pop('__partial', False)
+        plan = jeni.InjectionPlan.compile(notes, keyword_notes)
+        return await self.prepare_plan(plan, partial=__partial)
+
+    async def prepare_plan(self, plan, partial=False):
+        """Get injection values for a compiled `InjectionPlan`, concurrently.
+
+        All notes are resolved concurrently. When more than one note fails to
+        resolve, the error of the first note in order of the plan is raised,
+        as with `Injector.prepare_plan`. Optional notes which cannot be
+        provided are skipped without resolving them, see `can_provide`.
+        """
+        keyword_notes = plan.kwargs
+        if keyword_notes:
+            values = self._values
+            keyword_notes = [
+                (arg, note, maybe) for arg, note, maybe in keyword_notes
+                if not (maybe or partial) or (
+                    values and note.basenote in values) or (
+                    not self._skip_missing(note))]
+        notes = list(plan.args) + [note for _, note, _ in keyword_notes]
+        batched = None
+        if plan.batches:
+            batched = await self._get_batches(plan.batches)
+        if batched:
+            results = await asyncio.gather(*[
+                self._get_or_error(note) for note in notes
+                if note not in batched])
+            results = iter(results)
+            results = [
+                self._get_batched(batched, note) if note in batched
+                else next(results) for note in notes]
+        elif len(notes) == 1:
+            results = [await self._get_or_error(notes[0])]
+        else:
+            results = await asyncio.gather(
+                *[self._get_or_error(note) for note in notes])
+        num_args = len(plan.args)
+        args = []
+        for note, result in zip(plan.args, results):
+            if isinstance(result, _Error):
+                result.reraise()
+            args.append(result)
+        kwargs = {}
+        for (arg, note, maybe), result in zip(
+                keyword_notes, results[num_args:]):
+            if isinstance(result, _Error):
+                if (maybe or partial) and result.is_lookup_error():
+                    continue
+                result.reraise()
+            kwargs[arg] = result
+        return tuple(args), kwargs
+
+    async def try_get(self, note, default=None):
+        """Resolve a single note into an object, else return `default`.
+
+        See `Injector.try_get`.
+        """
+        note = jeni.Note.parse(note)
+        if self._skip_missing(note):
+            return default
+        try:
+            return await self._get(note)
+        except LookupError:
+            return default
+
+    async def get_many(self, notes):
+        """Resolve notes into a list of objects, concurrently.
+
+        See `Injector.get_many`. Get-by-name notes which share a basenote are
+        got with a single call of the provider's `get_many`, which may be a
+        coroutine function.
+        """
+        notes = [jeni.Note.parse(note) for note in notes]
+        batched = await self._get_batches(
+            jeni.InjectionPlan.group_batches(notes))
+        results = iter(await asyncio.gather(
+            *[self._get(note) for note in notes if note not in batched]))
+        return [
+            self._get_batched(batched, note) if note in batched
+            else next(results) for note in notes]
+
+    async def _get_batches(self, batches):
+        # Get notes of batches with get_many, see `Injector._get_batches`.
+        values = {}
+        for notes in batches:
+            try:
+                request = self._batch_request(notes)
+                if request is None:
+                    continue
+                injector, registration, batch_note, memoized = request
+                results = await injector.handle_provider(
+                    registration, batch_note)
+            except LookupError:
+                continue
+            values.update(self._batch_values(
+                injector, registration, notes, batch_note, memoized, results))
+        return values
+
+    async def _get_or_error(self, note):
+        # Resolve note, capturing error to support first-error semantics.
+        try:
+            return await self._get(note)
+        except Exception:
+            return _Error(sys.exc_info())
+
+    async def handle_provider(self, provider_or_fn, note):
+        """Get value from provider as requested by note.
+
+        Concurrent requests for a basenote in first resolution wait on the
+        first request, such that each provider is only initialized once.
+        """
+        note = jeni.Note.parse(note)
+        if not isinstance(provider_or_fn, jeni.Registration):
+            provider_or_fn = self.classify(provider_or_fn)
+        if provider_or_fn.scope == jeni.SINGLETON and (
+                self.scope != jeni.SINGLETON):
+            return await self._handle_singleton(provider_or_fn, note)
+        basenote = note.basenote
+        token = self._enter_resolution(basenote)
+        try:
+            while basenote in self.pending:
+                await self.pending[basenote].wait()
+                if note.name is None and basenote in self.values:
+                    return self.values[basenote]
+            if provider_or_fn.kind in self.instance_kinds:
+                first = basenote not in self.instances
+            else:
+                first = (note.name is None and
+                         provider_or_fn.scope != jeni.TRANSIENT)
+            if first:
+                event = self.pending[basenote] = asyncio.Event()
+            try:
+                result = await self._handle_provider(provider_or_fn, note)
+            finally:
+                if first:
+                    del self.pending[basenote]
+                    event.set()
+        finally:
+            if token is not None:
+                resolution_path.reset(token)
+        self.get_order.add(basenote)
+        return result
+
+    def _enter_resolution(self, basenote):
+        # Add basenote to the resolution path of the current task, raising
+        # CyclicDependencyError if it is already in resolution.
+        if resolution_path is None:
+            return None
+        path = resolution_path.get()
+        if (self, basenote) in path:
+            resolving = self.resolving()
+            cycle = resolving[resolving.index(basenote):] + [basenote]
+            raise jeni.CyclicDependencyError(cycle)
+        return resolution_path.set(path + ((self, basenote),))
+
+    def resolving(self):
+        """Basenotes in resolution, outermost first, in the current task.
+
+        Concurrently resolved notes continue the path of the task which
+        requested them, such that a cycle raises `CyclicDependencyError`
+        instead of waiting on itself. Requires Python 3.7+.
+        """
+        if resolution_path is None:
+            return []
+        return [
+            basenote for injector, basenote in resolution_path.get()
+            if injector is self]
+
+    async def _handle_singleton(self, registration, note):
+        singletons = self.singleton_injector()
+        basenote = note.basenote
+        if note.name is None and basenote in singletons.values:
+            value = singletons.values[basenote]
+        else:
+            value = await singletons.handle_provider(registration, note)
+        if note.name is None:
+            self.values[basenote] = value
+        return value
+
+    async def _handle_provider(self, registration, note):
+        memo = None
+        if registration.memoize and note.name is not None and (
+                note.mode is None):
+            memo = self._memo(registration, note.basenote)
+            value = memo.lookup(note.name)
+            if value is not jeni.Memo.missing:
+                return value
+        resolver = getattr(self, self.resolvers[registration.kind])
+        bounded = registration.timeout is not None or (
+            self.deadline is not None)
+        if bounded and registration.kind != jeni.Registration.VALUE:
+            # A value cannot block, so resolve it inline.
+            resolver = functools.partial(self._resolve_within, resolver)
+        if self.instrument is None:
+            value = await resolver(registration, note)
+        else:
+            instrument = self.instrument
+            start = instrument.clock()
+            try:
+                value = await resolver(registration, note)
+            finally:
+                instrument.record_resolve(
+                    note, registration.kind, start, instrument.clock())
+        if memo is not None:
+            memo.put(note.name, value)
+        return value
+
+    async def _resolve_within(self, resolver, registration, note):
+        # Resolve with asyncio.wait_for, which cancels the resolution on
+        # timeout, rather than abandon a thread as `Injector` does. Nested
+        # resolutions run within the limit of the resolution which encloses
+        # them, unless their own limit is sooner, on Python 3.7+.
+        now = self.clock()
+        limit_at = self.resolve_by(registration, now)
+        path = self.resolving()
+        if limit_at <= now:
+            raise self.timeout_error(note, path, limit_at - now)
+        if resolution_bound is None:
+            bound_at = None
+        else:
+            bound_at = resolution_bound.get()
+        if bound_at is not None and bound_at <= limit_at:
+            return await resolver(registration, note)
+        token = None
+        if resolution_bound is not None:
+            token = resolution_bound.set(limit_at)
+        try:
+            return await asyncio.wait_for(
+                resolver(registration, note), limit_at - now)
+        except asyncio.TimeoutError:
+            raise self.timeout_error(note, path, limit_at - now) from None
+        finally:
+            if token is not None:
+                resolution_bound.reset(token)
+
+    async def _resolve_value(self, registration, note):
+        return super(AsyncInjector, self)._resolve_value(registration, note)
+
+    async def _resolve_factory(self, registration, note):
+        if note.mode == jeni.GET_MANY:
+            return await maybe_await(registration.provider.get_many(note.name))
+        return await self._call_provider(
+            registration.fn, note,
+            registration.kind == jeni.Registration.ANNOTATED_FACTORY,
+            registration.scope != jeni.TRANSIENT)
+
+    async def _resolve_provider_class(self, registration, note):
+        basenote = note.basenote
+        if basenote in self.instances:
+            provider = self.instances[basenote]
+        else:
+            instrument = self.instrument
+            if instrument is not None:
+                start = instrument.clock()
+            cls = registration.provider
+            kind = jeni.Registration.ANNOTATED_PROVIDER_CLASS
+            if registration.kind == kind:
+                # Inject class __init__.
+                args, kwargs = await self.prepare_callable(cls.__init__)
+                provider = cls(*args, **kwargs)
+            else:
+                provider = cls()
+            self.instances[basenote] = provider
+            if instrument is not None:
+                instrument.record_init(basenote, start, instrument.clock())
+        if note.mode == jeni.GET_MANY:
+            return await maybe_await(provider.get_many(note.name))
+        return await self._call_provider(
+            getattr(provider, 'get', provider), note,
+            registration.annotated_get, registration.scope != jeni.TRANSIENT)
+
+    async def _resolve_generator(self, registration, note):
+        basenote = note.basenote
+        if basenote in self.instances:
+            provider = self.instances[basenote]
+        else:
+            instrument = self.instrument
+            if instrument is not None:
+                start = instrument.clock()
+            provider, value = await self.init_generator(registration.provider)
+            self.instances[basenote] = provider
+            self.values[basenote] = value
+            if instrument is not None:
+                instrument.record_init(basenote, start, instrument.clock())
+            if note.name is None:
+                return value
+        return await self._call_provider(provider.get, note)
+
+    async def _call_provider(self, fn, note, annotated=False, cache=True):
+        # Call provider function, partially injected if annotated.
+        try:
+            if annotated:
+                args, kwargs = await self.prepare_callable(fn, partial=True)
+            else:
+                args, kwargs = (), {}
+            if note.name is None:
+                value = await maybe_await(fn(*args, **kwargs))
+                if cache:
+                    self.values[note.basenote] = value
+                return value
+            kwargs['name'] = note.name
+            return await maybe_await(fn(*args, **kwargs))
+        except jeni.UnsetError as exc:
+            exc_msg = str(exc)
+            if exc_msg:
+                msg = '{}: {!r}'.format(exc_msg, note.note)
+            else:
+                msg = repr(note.note)
+            if exc.note is None:
+                # Raised by this provider; see `Injector._call_provider`.
+                exc.args, exc.note = (msg,), note.note
+                raise
+            if isinstance(exc, jeni.ResolutionTimeoutError):
+                raise
+            raise type(exc)(msg, note=note.note).with_traceback(
+                exc.__traceback__)
+
+    async def init_generator(self, fn):
+        """Initialize generator providers, including async generators."""
+        support_name = getattr(fn, 'support_name', False)
+        if inspect.isasyncgenfunction(fn):
+            provider = self.async_generator_provider(
+                fn, support_name=support_name)
+        else:
+            provider = self.generator_provider(fn, support_name=support_name)
+        if self.has_annotations(provider.function):
+            args, kwargs = await self.prepare_callable(provider.function)
+        else:
+            args, kwargs = (), {}
+        value = await maybe_await(provider.init(*args, **kwargs))
+        return provider, value
+
+    def __enter__(self):
+        """Not supported; use ``async with``."""
+        msg = '{!r} requires `async with` to close providers.'
+        raise TypeError(msg.format(self))
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Not supported; use ``async with``."""
+        self.__enter__()
+
+    async def __aenter__(self):
+        """Support for async context manager, returning self."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Support for async context manager, close on exit."""
+        await self.close()
+
+
+class AsyncInjectorPool(jeni.InjectorPool):
+    """Hands out async injectors, reused after close & reset.
+
+    See `jeni.InjectorPool`. Release is a coroutine, to await close::
+
+        pool = AsyncInjectorPool(Injector)
+
+        async with pool.injector() as injector:
+            await injector.apply(handler)
+    """
+
+    async def release(self, injector):
+        """Close injector if not yet closed, and keep it for reuse."""
+        if not injector.closed:
+            await injector.close()
+        if len(self.idle) < self.size:
+            injector.reset()
+            self.idle.append(injector)
+
+    def injector(self):
+        """Async context manager to acquire an injector & release on exit."""
+        return _Pooled(self)
+
+
+class _Pooled(object):
+    # Async context manager of `AsyncInjectorPool.injector`.
+    __slots__ = ('pool', 'injector')
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.injector = None
+
+    async def __aenter__(self):
+        self.injector = self.pool.acquire()
+        return self.injector
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.pool.release(self.injector)
+
+
+class _Error(object):
+    # Error captured during concurrent resolution, to reraise in order.
+    __slots__ = ('exc_info',)
+
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+    def is_lookup_error(self):
+        return issubclass(self.exc_info[0], LookupError)
+
+    def reraise(self):
+        raise self.exc_info[1].with_traceback(self.exc_info[2])
+
+
+async def maybe_await(value):
+    """Await value if awaitable, else return value as-is."""
+    if inspect.isawaitable(value):
+        return await value
+    return value
@@ -11,4 +11,11 @@ except SystemExit:
 
 if sys.version_info >= (3,):
     import test_jeni_python3
-    unittest.main(module=test_jeni_python3)
+    try:
+        unittest.main(module=test_jeni_python3)
+    except SystemExit:
+        pass
+
+if sys.version_info >= (3, 6):
+    import test_jeni_async
+    unittest.main(module=test_jeni_async)
@@ -1,3 +1,4 @@
+import sys
 from os import path
 
 from setuptools import setup
@@ -44,6 +45,10 @@ if not path.exists(README):
 with open(path.join(path.dirname(__file__), README)) as fd:
     long_description = '\n' + fd.read()
 
+PY_MODULES = ['jeni']
+if sys.version_info >= (3, 6):
+    PY_MODULES.append('jeni_async')
+
 
 setup(
     name='jeni',
@@ -54,7 +59,7 @@ setup(
     author_email='ron.duplain@gmail.com',
     description='jeni injects annotated dependencies',
     long_description=long_description,
-    py_modules=['jeni'],
+    py_modules=PY_MODULES,
     install_requires=[
         'six',
     ],
@@ -1,6 +1,16 @@
+import json
+import os
 import sys
+import tempfile
+import threading
+import time
 import unittest
 
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
 import jeni
 
 
@@ -751,6 +761,19 @@ class ClosingTestCase(unittest.TestCase):
             close_order,
             [x.note for x in CloseMe.closed_items[num_prev_closed_items:]])
 
+    def test_get_order(self):
+        self.injector.get('via_generator')
+        self.injector.get('echo:thing')
+        self.injector.get('via_class')
+        self.injector.get('via_generator')
+        self.assertEqual(
+            ['via_generator', 'echo', 'via_class'],
+            list(self.injector.get_order))
+        self.assertIn('echo', self.injector.get_order)
+        self.assertNotIn('unset', self.injector.get_order)
+        self.assertEqual(3, len(self.injector.get_order))
+        self.injector.close()
+
     def test_close_order(self):
         # Test multiple times given failed test is random order.
         for x in range(100):
@@ -814,6 +837,580 @@ class InjectorStatsTestCase(unittest.TestCase):
         self.assertEqual(stats, self.injector.stats)
 
 
+@unittest.skipIf(ThreadPoolExecutor is None, 'requires concurrent.futures')
+class ConcurrentInjectorTestCase(unittest.TestCase):
+    def setUp(self):
+        class Injector(BasicInjector):
+            running = 0
+            max_running = 0
+            inits = 0
+        lock = threading.Lock()
+
+        def slow(name=None):
+            with lock:
+                Injector.running += 1
+                Injector.max_running = max(
+                    Injector.max_running, Injector.running)
+            time.sleep(0.05)
+            with lock:
+                Injector.running -= 1
+            return name
+
+        @Injector.provider('slow_class')
+        class SlowProvider(jeni.Provider):
+            @jeni.annotate('slow1:init')
+            def __init__(self, init):
+                with lock:
+                    Injector.inits += 1
+                self.init = init
+
+            def get(self, name=None):
+                return name or self.init
+
+        Injector.factory('slow1', slow)
+        Injector.factory('slow2', slow)
+        Injector.factory('slow3', slow)
+        self.Injector = Injector
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.injector = Injector(executor=self.executor)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_concurrent(self):
+        @jeni.annotate('slow1:a', 'slow2:b', c='slow3:c')
+        def fn(a, b, c=None):
+            return a, b, c
+        self.assertEqual(('a', 'b', 'c'), self.injector.apply(fn))
+        self.assertEqual(3, self.Injector.max_running)
+
+    def test_single_flight(self):
+        @jeni.annotate('slow_class', 'slow_class:x', c='slow_class')
+        def fn(a, b, c=None):
+            return a, b, c
+        self.assertEqual(('init', 'x', 'init'), self.injector.apply(fn))
+        self.assertEqual(1, self.Injector.inits)
+        self.assertEqual(
+            ['slow1', 'slow_class'], list(self.injector.get_order))
+        self.assertEqual(2, self.injector.stats['slow_class'])
+        self.assertEqual(1, self.injector.stats['slow1:init'])
+
+    def test_first_error(self):
+        @jeni.annotate('slow1:a', 'nothing', 'error')
+        def fn(a, nothing, error):
+            "unused"
+        try:
+            self.injector.apply(fn)
+        except LookupError as err:
+            self.assertNotIsInstance(err, jeni.UnsetError)
+        else:
+            self.fail('LookupError not raised')
+
+    def test_maybe(self):
+        @jeni.annotate(
+            'slow1:a', error=jeni.maybe('error'), nothing=jeni.maybe('none'))
+        def fn(a, error=None, nothing=None):
+            return a, error, nothing
+        self.assertEqual(('a', None, None), self.injector.apply(fn))
+        self.assertEqual(('a', None, None), self.injector.partial(fn)())
+
+    def test_close(self):
+        self.injector.get('answer')
+        self.injector.close()
+        self.assertRaises(RuntimeError, self.injector.get, 'hello')
+
+    def test_locked_resolution(self):
+        # Dependencies resolved while holding a lock must not wait on workers
+        # which wait on the lock.
+        class Injector(self.Injector):
+            pass
+
+        @Injector.provider('locked')
+        class LockedProvider(jeni.Provider):
+            @jeni.annotate('slow1:init')
+            def __init__(self, init):
+                self.init = init
+
+            @jeni.annotate('slow2:a', 'slow3:b')
+            def get(self, a, b, name=None):
+                return a, b
+
+        @jeni.annotate('locked', 'slow1:c')
+        def fn(locked, c):
+            return locked
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(executor.shutdown)
+        injector = Injector(executor=executor)
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(injector.get('locked')))]
+        threads.extend(
+            threading.Thread(target=lambda: results.append(injector.apply(fn)))
+            for _ in range(2))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual([('a', 'b')] * 3, results)
+
+    def test_get_order(self):
+        self.Injector.factory('fast', lambda: 'fast')
+
+        @jeni.annotate('slow2', 'fast', 'slow_class')
+        def fn(slow2, fast, slow_class):
+            return slow2, fast, slow_class
+
+        self.assertEqual((None, 'fast', 'init'), self.injector.apply(fn))
+        self.assertEqual(
+            ['slow2', 'fast', 'slow1', 'slow_class'],
+            list(self.injector.get_order))
+
+    def test_resolved_inline(self):
+        self.injector.get('slow1')
+        self.injector.get('slow2')
+
+        @jeni.annotate('slow1', 'slow2')
+        def fn(a, b):
+            return a, b
+
+        self.executor.shutdown() # Must not submit.
+        self.assertEqual((None, None), self.injector.apply(fn))
+
+
+class ThreadSafeInjectorTestCase(unittest.TestCase):
+    num_threads = 64
+
+    def setUp(self):
+        class Injector(BasicInjector):
+            inits = 0
+
+        @Injector.provider('slow_class')
+        class SlowProvider(jeni.Provider):
+            def __init__(self):
+                Injector.inits += 1
+                time.sleep(0.01)
+
+            def get(self, name=None):
+                return self
+
+        self.Injector = Injector
+        self.injector = Injector(thread_safe=True)
+
+    def run_threads(self, fn):
+        results = []
+        def target():
+            results.append(fn())
+        threads = [threading.Thread(target=target)
+                   for _ in range(self.num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_single_flight(self):
+        results = self.run_threads(lambda: self.injector.get('slow_class'))
+        self.assertEqual(1, self.Injector.inits)
+        self.assertEqual(1, len(set(id(result) for result in results)))
+        self.assertEqual(['slow_class'], list(self.injector.get_order))
+
+    def test_name_generator(self):
+        results = self.run_threads(lambda: self.injector.get('spam:2'))
+        self.assertEqual(['spamspam'] * self.num_threads, results)
+
+    def test_stats(self):
+        def fn():
+            for _ in range(100):
+                self.injector.get('eggs')
+        self.run_threads(fn)
+        self.assertEqual(100 * self.num_threads, self.injector.stats['eggs'])
+        self.assertEqual({'eggs': 100 * self.num_threads}, self.injector.stats)
+        self.assertIn('eggs', self.injector.stats)
+        self.assertNotIn('hello', self.injector.stats)
+        self.assertEqual(0, self.injector.stats['hello'])
+
+    def test_close(self):
+        self.run_threads(lambda: self.injector.get('answer'))
+        self.injector.close()
+        self.assertTrue(self.injector.closed)
+
+    def test_executor_requires_thread_safe(self):
+        self.assertRaises(
+            ValueError, self.Injector, executor=object(), thread_safe=False)
+
+
+class PoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.pool = jeni.InjectorPool(CloseTestInjector, size=1)
+
+    def test_lazy_state(self):
+        injector = BasicInjector()
+        self.assertEqual(None, injector._values)
+        self.assertEqual(None, injector._stats)
+        self.assertEqual({}, injector.stats)
+        self.assertEqual(0, injector.stats['eggs'])
+        self.assertEqual('eggs!', injector.get('eggs'))
+        self.assertEqual({'eggs': 'eggs!'}, injector.values)
+        self.assertEqual(None, injector._instances)
+        injector.close()
+
+    def test_slots(self):
+        class Injector(jeni.Injector):
+            __slots__ = ()
+        self.assertFalse(hasattr(Injector(), '__dict__'))
+
+    def test_shared_annotator(self):
+        self.assertIs(BasicInjector().annotator, BasicInjector().annotator)
+
+    def test_set_annotator(self):
+        annotator = jeni.Annotator()
+
+        class Injector(BasicInjector):
+            def __init__(self, *a, **kw):
+                super(Injector, self).__init__(*a, **kw)
+                self.annotator = annotator
+
+        self.assertIs(annotator, Injector().annotator)
+        self.assertEqual('spam eggs!', Injector().apply(spam_eggs))
+
+    def test_reset(self):
+        injector = CloseTestInjector()
+        thing = injector.get('via_generator')
+        self.assertRaises(RuntimeError, injector.reset)
+        injector.close()
+        self.assertEqual(True, thing.closed)
+        injector.reset()
+        self.assertEqual(False, injector.closed)
+        self.assertEqual({}, injector.stats)
+        self.assertEqual([], list(injector.get_order))
+        self.assertIsNot(thing, injector.get('via_generator'))
+        injector.close()
+
+    def test_reuse(self):
+        with self.pool.injector() as injector:
+            thing = injector.get('via_generator')
+        self.assertEqual(True, thing.closed)
+        self.assertEqual(1, len(self.pool))
+        with self.pool.injector() as reused:
+            self.assertIs(injector, reused)
+            self.assertEqual(0, len(self.pool))
+            self.assertIsNot(thing, reused.get('via_generator'))
+        self.assertEqual(1, len(self.pool))
+
+    def test_size(self):
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        self.assertIsNot(first, second)
+        self.pool.release(first)
+        self.pool.release(second)
+        self.assertEqual(True, second.closed)
+        self.assertEqual(1, len(self.pool))
+        self.assertIs(first, self.pool.acquire())
+
+    def test_kwargs(self):
+        pool = jeni.InjectorPool(BasicInjector, thread_safe=True)
+        injector = pool.acquire()
+        self.assertEqual(True, injector.thread_safe)
+        self.assertEqual('eggs!', injector.get('eggs'))
+        pool.release(injector)
+        self.assertEqual(0, injector.stats['eggs'])
+
+
+class ChildTestCase(unittest.TestCase):
+    def setUp(self):
+        self.parent = CloseTestInjector()
+        self.thing = self.parent.get('via_generator')
+
+    def tearDown(self):
+        if not self.parent.closed:
+            self.parent.close()
+
+    def test_shared(self):
+        with self.parent.child() as child:
+            self.assertIs(self.thing, child.get('via_generator'))
+            self.assertEqual(1, child.stats['via_generator'])
+            self.assertEqual([], list(child.get_order))
+        self.assertEqual(False, self.thing.closed)
+        self.assertEqual(1, self.parent.stats['via_generator'])
+
+    def test_local(self):
+        with self.parent.child() as child:
+            thing = child.get('via_class')
+            self.assertEqual(['via_class'], list(child.get_order))
+        self.assertEqual(True, thing.closed)
+        self.assertNotIn('via_class', self.parent.get_order)
+        self.assertEqual(False, self.thing.closed)
+
+    def test_get_by_name(self):
+        thing = self.parent.get('via_generator_with_name')
+        child = self.parent.child()
+        self.assertIs(thing, child.get('via_generator_with_name:name'))
+        self.assertEqual(None, child._instances)
+        child.close()
+        self.assertEqual(False, thing.closed)
+
+    def test_grandchild(self):
+        child = self.parent.child()
+        thing = child.get('via_class')
+        grandchild = child.child()
+        self.assertIs(self.thing, grandchild.get('via_generator'))
+        self.assertIs(thing, grandchild.get('via_class'))
+        grandchild.close()
+        child.close()
+
+    def test_parent_closed(self):
+        child = self.parent.child()
+        self.parent.close()
+        self.assertRaises(RuntimeError, child.get, 'via_generator')
+
+    def test_pool(self):
+        pool = jeni.InjectorPool(self.parent.child)
+        with pool.injector() as child:
+            self.assertIs(self.parent, child.parent)
+            self.assertIs(self.thing, child.get('via_generator'))
+        self.assertEqual(False, self.thing.closed)
+
+
+class TickInstrument(jeni.Instrument):
+    # Instrument with a clock which ticks one second per reading.
+    ticks = 0
+
+    def clock(self):
+        self.ticks += 1
+        return float(self.ticks)
+
+
+class InstrumentTestCase(unittest.TestCase):
+    def setUp(self):
+        self.resolved = []
+        self.closed = []
+        self.instrument = TickInstrument(
+            on_resolve=lambda *a: self.resolved.append(a),
+            on_close=lambda *a: self.closed.append(a))
+        self.injector = CloseTestInjector(instrument=self.instrument)
+
+    def test_get(self):
+        self.injector.get('via_generator')
+        self.injector.get('via_generator')
+        self.injector.get('via_generator_with_name:name')
+        self.injector.close()
+        snapshot = self.instrument.snapshot()
+        timings = snapshot['via_generator']
+        self.assertEqual(1, timings['init']['count'])
+        self.assertEqual(1, timings['get_cold']['count'])
+        self.assertEqual(5.0, timings['get_cold']['total'])
+        self.assertEqual(1, timings['get_warm']['count'])
+        self.assertEqual(1.0, timings['get_warm']['max'])
+        self.assertEqual(1, timings['close']['count'])
+        self.assertEqual(
+            1, snapshot['via_generator_with_name']['get_cold']['count'])
+        self.assertEqual(
+            [('via_generator', 5.0, True, None),
+             ('via_generator', 1.0, False, None),
+             ('via_generator_with_name:name', 5.0, True, None)],
+            self.resolved)
+        self.assertEqual(
+            ['via_generator_with_name', 'via_generator'],
+            [basenote for basenote, _, _ in self.closed])
+
+    def test_errors(self):
+        self.assertRaises(jeni.UnsetError, self.injector.get, 'unset')
+        self.assertRaises(LookupError, self.injector.get, 'nothing')
+        self.assertEqual(1, self.instrument.snapshot()['unset']['unset'])
+        self.assertEqual(0, self.instrument.snapshot()['unset']['errors'])
+        self.assertEqual(1, self.instrument.snapshot()['nothing']['errors'])
+        self.assertIsInstance(self.resolved[-1][-1], LookupError)
+
+    def test_nested(self):
+        @jeni.annotate('via_class', 'via_generator')
+        def fn(via_class, via_generator):
+            return via_class
+        self.injector.apply(fn)
+        self.assertEqual(
+            set(['via_class', 'via_generator']),
+            set(self.instrument.snapshot()))
+
+    def test_shared(self):
+        self.injector.get('via_generator')
+        child = self.injector.child()
+        self.assertIs(self.instrument, child.instrument)
+        child.get('via_generator')
+        timings = self.instrument.snapshot()['via_generator']
+        self.assertEqual(1, timings['get_warm']['count'])
+        self.instrument.reset()
+        self.assertEqual({}, self.instrument.snapshot())
+
+    def test_disabled(self):
+        injector = CloseTestInjector()
+        self.assertEqual(None, injector.instrument)
+        injector.get('via_generator')
+        injector.close()
+        self.assertEqual({}, self.instrument.snapshot())
+
+
+class TracerTestCase(unittest.TestCase):
+    def setUp(self):
+        class Injector(CloseTestInjector):
+            pass
+
+        @Injector.provider('outer')
+        class OuterProvider(jeni.Provider):
+            @jeni.annotate('via_generator')
+            def __init__(self, thing):
+                self.thing = thing
+
+            def get(self):
+                return self.thing
+
+        self.tracer = jeni.Tracer()
+        self.injector = Injector(instrument=self.tracer)
+
+    def spans(self):
+        events = self.tracer.trace()['traceEvents']
+        return dict(
+            (event['name'], event) for event in events if event['ph'] == 'X')
+
+    def test_nested(self):
+        self.injector.get('outer')
+        self.injector.close()
+        spans = self.spans()
+        resolve = 'annotated_provider_class outer'
+        self.assertEqual(
+            set(['get outer', resolve, 'init outer',
+                 'get via_generator', 'generator via_generator',
+                 'init via_generator', 'close via_generator', 'close outer']),
+            set(spans))
+        def contains(outer, inner):
+            outer, inner = spans[outer], spans[inner]
+            return outer['ts'] <= inner['ts'] and (
+                inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur'])
+        self.assertTrue(contains('get outer', resolve))
+        self.assertTrue(contains(resolve, 'init outer'))
+        self.assertTrue(contains('init outer', 'get via_generator'))
+        self.assertTrue(contains('get via_generator', 'init via_generator'))
+        self.assertEqual(
+            'annotated_provider_class', spans[resolve]['args']['kind'])
+        self.assertEqual(
+            threading.current_thread().ident, spans['get outer']['tid'])
+
+    def test_dump(self):
+        self.assertRaises(LookupError, self.injector.get, 'nothing')
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            self.tracer.dump(path)
+            with open(path) as f:
+                trace = json.load(f)
+        finally:
+            os.remove(path)
+        events = trace['traceEvents']
+        self.assertEqual('thread_name', events[0]['name'])
+        self.assertIn('error', events[-1]['args'])
+        self.tracer.reset()
+        self.assertEqual({}, self.spans())
+
+    def test_non_string_notes(self):
+        type(self.injector).value(42, 'answer')
+
+        @jeni.annotate(42)
+        def answer(value):
+            return value
+
+        @jeni.annotate(jeni.annotate.partial(answer))
+        def fn(answer):
+            return answer()
+
+        self.assertEqual('answer', self.injector.get(42))
+        self.assertEqual('answer', self.injector.apply(fn))
+        self.assertIn('get 42', self.spans())
+        self.assertTrue(any(name.startswith("get ('partial'")
+                            for name in self.spans()))
+        json.dumps(self.tracer.trace())
+
+
+class ScopeTestCase(unittest.TestCase):
+    def setUp(self):
+        class Injector(BasicInjector):
+            count = 0
+
+        @Injector.provider('pool', scope=jeni.SINGLETON)
+        def pool():
+            thing = CloseMe('pool')
+            thing.open()
+            yield thing
+            thing.close()
+
+        @Injector.factory('counter', scope=jeni.TRANSIENT)
+        def counter(name=None):
+            Injector.count += 1
+            return Injector.count
+
+        @Injector.provider('singleton_class', scope=jeni.SINGLETON)
+        class SingletonProvider(jeni.Provider):
+            @jeni.annotate('pool')
+            def __init__(self, pool):
+                self.pool = pool
+
+            def get(self, name=None):
+                return self
+
+        self.Injector = Injector
+
+    def tearDown(self):
+        self.Injector.shutdown()
+
+    def test_singleton(self):
+        first, second = self.Injector(), self.Injector()
+        pool = first.get('pool')
+        self.assertIs(pool, second.get('pool'))
+        first.close()
+        second.close()
+        self.assertEqual(False, pool.closed)
+        self.assertIs(pool, self.Injector().get('pool'))
+        self.Injector.shutdown()
+        self.assertEqual(True, pool.closed)
+        self.assertIsNot(pool, self.Injector().get('pool'))
+
+    def test_singleton_dependencies(self):
+        provider = self.Injector().get('singleton_class')
+        self.assertIs(provider, self.Injector().get('singleton_class'))
+        self.assertIs(provider.pool, self.Injector().get('pool'))
+
+    def test_singleton_not_shared_with_subclass(self):
+        class SubInjector(self.Injector):
+            pass
+        pool = self.Injector().get('pool')
+        try:
+            self.assertIsNot(pool, SubInjector().get('pool'))
+        finally:
+            SubInjector.shutdown()
+
+    def test_transient(self):
+        injector = self.Injector()
+        self.assertEqual(1, injector.get('counter'))
+        self.assertEqual(2, injector.get('counter'))
+        self.assertNotIn('counter', injector.values)
+
+    def test_transient_thread_safe(self):
+        injector = self.Injector(thread_safe=True)
+        self.assertEqual(1, injector.get('counter'))
+        self.assertEqual(2, injector.get('counter'))
+
+    def test_transient_generator(self):
+        def generator():
+            yield
+        self.assertRaises(
+            ValueError, self.Injector.provider, 'generator', generator,
+            scope=jeni.TRANSIENT)
+
+    def test_unknown_scope(self):
+        self.assertRaises(
+            ValueError, self.Injector.factory, 'echo', echo, scope='bogus')
+
+
 class ContextManagerTestCase(unittest.TestCase):
     def test_with_block(self):
         with CloseTestInjector() as injector:
@@ -911,6 +1508,1051 @@ class NonStringNoteTestCase(unittest.TestCase):
             ValueError, self.Injector.provider, note, HelloProvider)
 
 
+class NoteTestCase(unittest.TestCase):
+    def test_parse(self):
+        note = jeni.Note.parse('hello:thing')
+        self.assertEqual(('hello', 'thing', None),
+                         (note.basenote, note.name, note.mode))
+        self.assertEqual(('eggs', None), jeni.Injector.parse_note('eggs'))
+
+    def test_interned(self):
+        note = jeni.Note.parse('hello:interned')
+        self.assertIs(note, jeni.Note.parse('hello:interned'))
+        self.assertIs(note, jeni.Note.parse(note))
+        self.assertEqual(note, jeni.Note.from_note('hello:interned'))
+        self.assertNotEqual(note, jeni.Note.parse('hello'))
+        self.assertEqual(hash(note), hash(jeni.Note.from_note(note.note)))
+
+    def test_object(self):
+        obj = object()
+        note = jeni.Note.parse(obj)
+        self.assertEqual((obj, None), (note.basenote, note.name))
+
+    def test_unhashable(self):
+        note = jeni.Note.parse(['hello'])
+        self.assertEqual((['hello'], None), (note.basenote, note.name))
+
+    def test_tuple(self):
+        note = ('hello', 'x')
+        self.assertEqual(('hello', 'x'), jeni.Injector.parse_note(note))
+        self.assertRaises(ValueError, jeni.Note.parse, ('hello',))
+
+    def test_parsed_note(self):
+        injector = BasicInjector()
+        note = jeni.Note.parse('hello:parsed')
+        self.assertEqual('Hello, parsed!', injector.get(note))
+        self.assertEqual(1, injector.stats['hello:parsed'])
+        self.assertIs(HelloProvider, BasicInjector.lookup(note))
+
+
+class RegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        class Base(jeni.Injector):
+            pass
+        class Middle(Base):
+            pass
+        class Leaf(Middle):
+            pass
+        self.Base, self.Middle, self.Leaf = Base, Middle, Leaf
+        Base.value('base', 'base')
+        Base.value('override', 'base')
+        Middle.value('override', 'middle')
+
+    def test_merged(self):
+        self.assertEqual('base', self.Leaf().get('base'))
+        self.assertEqual('middle', self.Leaf().get('override'))
+        self.assertEqual('base', self.Base().get('override'))
+        self.assertNotIn('merged_registry', vars(self.Middle))
+
+    def test_register_on_ancestor(self):
+        self.assertRaises(LookupError, self.Leaf.lookup, 'late')
+        self.Base.value('late', 'late')
+        self.assertEqual('late', self.Leaf().get('late'))
+        self.Middle.value('late', 'later')
+        self.assertEqual('later', self.Leaf().get('late'))
+        self.assertEqual('late', self.Base().get('late'))
+
+    def test_register_on_subclass(self):
+        self.Leaf.lookup('base')
+        self.Leaf.value('base', 'leaf')
+        self.assertEqual('leaf', self.Leaf().get('base'))
+        self.assertEqual('base', self.Middle().get('base'))
+
+
+class RegistrationTestCase(unittest.TestCase):
+    def assert_kind(self, kind, note):
+        self.assertEqual(kind, BasicInjector.lookup_registration(note).kind)
+
+    def test_kinds(self):
+        self.assert_kind(jeni.Registration.VALUE, 'zero')
+        self.assert_kind(jeni.Registration.FACTORY, 'eggs')
+        self.assert_kind(jeni.Registration.PROVIDER_CLASS, 'hello')
+        self.assert_kind(jeni.Registration.GENERATOR, 'answer')
+        self.assert_kind(jeni.Registration.NAME_GENERATOR, 'spam')
+
+    def test_annotated_kinds(self):
+        class Injector(BasicInjector):
+            pass
+        Injector.factory('dish', spam_eggs)
+        Injector.provider('annotated_init', AnnotatedInitProvider)
+        self.assertEqual(jeni.Registration.ANNOTATED_FACTORY,
+                         Injector.lookup_registration('dish').kind)
+        self.assertEqual(jeni.Registration.ANNOTATED_PROVIDER_CLASS,
+                         Injector.lookup_registration('annotated_init').kind)
+
+    def test_value(self):
+        class Injector(BasicInjector):
+            pass
+        value = object()
+        Injector.value('value', value)
+        self.assertIs(value, Injector.lookup('value'))
+        injector = Injector()
+        self.assertIs(value, injector.get('value'))
+        self.assertIs(value, injector.values['value'])
+        self.assertRaises(TypeError, injector.get, 'value:name')
+
+    def test_callable_value(self):
+        class Injector(BasicInjector):
+            pass
+        Injector.value('fn', eggs)
+        self.assertIs(eggs, Injector().get('fn'))
+
+    def test_generator_factory(self):
+        class Injector(BasicInjector):
+            pass
+        def generator():
+            yield 'generated'
+        Injector.factory('generated', generator)
+        self.assertEqual('generated', Injector().get('generated'))
+
+    def test_lookup_override(self):
+        class Injector(BasicInjector):
+            @classmethod
+            def lookup(cls, basenote):
+                if basenote == 'magic':
+                    return lambda: 42
+                return super(Injector, cls).lookup(basenote)
+
+        @jeni.annotate('magic', 'eggs', maybe=jeni.maybe('magic'))
+        def fn(magic, eggs, maybe=None):
+            return magic, eggs, maybe
+
+        injector = Injector()
+        self.assertEqual(42, injector.get('magic'))
+        self.assertEqual((42, 'eggs!', 42), injector.apply(fn))
+        self.assertEqual(True, injector.can_provide('magic'))
+        self.assertRaises(LookupError, injector.get, 'nothing')
+        self.assertEqual(False, BasicInjector.overrides_lookup())
+
+    def test_annotated_after_registration(self):
+        class Injector(BasicInjector):
+            pass
+
+        @jeni.annotate('eggs')
+        @Injector.factory('late_eggs')
+        def late_eggs(eggs):
+            return eggs
+
+        self.assertEqual(jeni.Registration.ANNOTATED_FACTORY,
+                         Injector.lookup_registration('late_eggs').kind)
+        self.assertEqual('eggs!', Injector().get('late_eggs'))
+
+
+class DependencyGraphTestCase(unittest.TestCase):
+    def setUp(self):
+        class Injector(jeni.Injector):
+            pass
+
+        Injector.value('config', {})
+
+        @Injector.provider('database')
+        class DatabaseProvider(jeni.Provider):
+            @jeni.annotate('config')
+            def __init__(self, config):
+                self.config = config
+
+            @jeni.annotate(timeout=jeni.maybe('timeout'))
+            def get(self, timeout=None):
+                return self
+
+        @Injector.provider('session')
+        @jeni.annotate('database', 'cache')
+        def session(database, cache):
+            yield database
+
+        @jeni.annotate('session', 'user')
+        def handler(session, user):
+            "unused"
+
+        @Injector.factory('handler')
+        @jeni.annotate(jeni.annotate.partial(handler))
+        def lazy_handler(handler):
+            return handler
+
+        self.Injector = Injector
+
+    def test_graph(self):
+        graph = self.Injector.dependency_graph()
+        self.assertEqual(
+            ['config', 'timeout'], graph.dependencies('database'))
+        self.assertEqual(False, graph.edges['database']['timeout'].required)
+        self.assertEqual(
+            ['database', 'cache'], graph.dependencies('session'))
+        self.assertEqual(
+            ['session', 'user'], graph.dependencies('handler'))
+        self.assertEqual([], graph.dependencies('handler', lazy=False))
+        self.assertEqual(
+            {'session': ['cache'], 'handler': ['user']}, graph.missing())
+        self.assertEqual(False, graph.edges['database']['config'].lazy)
+        self.assertEqual(True, graph.edges['handler']['session'].lazy)
+        self.assertEqual([], graph.cycles())
+        self.assertEqual(
+            [['config', 'handler'], ['database'], ['session']],
+            graph.levels())
+        self.assertEqual(2, graph.depths()['session'])
+
+    def test_validate(self):
+        self.Injector.value('cache', None)
+        self.Injector.value('user', None)
+        self.assertIsInstance(
+            self.Injector.validate(), jeni.DependencyGraph)
+
+    def test_missing(self):
+        try:
+            self.Injector.validate()
+        except jeni.DependencyError as err:
+            self.assertEqual(['cache'], err.missing['session'])
+            self.assertEqual([], err.cycles)
+            self.assertIn("'session' requires unregistered 'cache'", str(err))
+        else:
+            self.fail('DependencyError not raised')
+
+    def test_cycles(self):
+        @jeni.annotate(user='user')
+        def get_user(user):
+            "unused"
+
+        @self.Injector.factory('cache')
+        @jeni.annotate(jeni.annotate.eager_partial(get_user))
+        def cache(get_user):
+            "unused"
+
+        @self.Injector.provider('user')
+        @jeni.annotate('cache')
+        def user(cache):
+            yield
+
+        graph = self.Injector.dependency_graph()
+        self.assertEqual({}, graph.missing())
+        self.assertEqual(1, len(graph.cycles()))
+        cycle = graph.cycles()[0]
+        self.assertEqual(cycle[0], cycle[-1])
+        self.assertEqual(set(['cache', 'user']), set(cycle))
+        self.assertRaises(jeni.DependencyError, graph.validate)
+
+
+class CyclicDependencyTestCase(unittest.TestCase):
+    def setUp(self):
+        class Injector(jeni.Injector):
+            pass
+
+        @Injector.provider('a')
+        class AProvider(jeni.Provider):
+            @jeni.annotate('b')
+            def __init__(self, b):
+                "unused"
+
+        @Injector.provider('b')
+        @jeni.annotate('c')
+        def b(c):
+            yield c
+
+        @Injector.factory('c')
+        @jeni.annotate('eggs', a='a')
+        def c(eggs, a=None):
+            return a
+
+        Injector.value('eggs', 'eggs')
+        self.Injector = Injector
+
+    def assertCycle(self, cycle, injector, note):
+        try:
+            injector.get(note)
+        except jeni.CyclicDependencyError as err:
+            self.assertEqual(cycle, err.cycle)
+            self.assertIn(' -> '.join(repr(x) for x in cycle), str(err))
+        else:
+            self.fail('CyclicDependencyError not raised')
+
+    def test_cycle(self):
+        injector = self.Injector()
+        self.assertCycle(['a', 'b', 'c', 'a'], injector, 'a')
+        self.assertCycle(['c', 'a', 'b', 'c'], injector, 'c')
+        self.assertEqual([], injector.resolving())
+        self.assertEqual('eggs', injector.get('eggs'))
+
+    def test_self(self):
+        @self.Injector.factory('self')
+        @jeni.annotate('self')
+        def fn(x):
+            "unused"
+        self.assertCycle(['self', 'self'], self.Injector(), 'self')
+
+    def test_thread_safe(self):
+        self.assertCycle(
+            ['a', 'b', 'c', 'a'], self.Injector(thread_safe=True), 'a')
+
+    @unittest.skipIf(ThreadPoolExecutor is None, 'requires futures')
+    def test_executor(self):
+        @jeni.annotate('eggs', 'a')
+        def fn(eggs, a):
+            "unused"
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            injector = self.Injector(executor=executor)
+            try:
+                injector.apply(fn)
+            except jeni.CyclicDependencyError as err:
+                self.assertEqual(['a', 'b', 'c', 'a'], err.cycle)
+            else:
+                self.fail('CyclicDependencyError not raised')
+        finally:
+            executor.shutdown()
+
+    def test_graph(self):
+        cycles = self.Injector.dependency_graph().cycles()
+        self.assertEqual(set(['a', 'b', 'c']), set(cycles[0]))
+
+
+class WarmTestCase(unittest.TestCase):
+    def setUp(self):
+        class Injector(jeni.Injector):
+            inits = []
+
+        def slow(name):
+            def provider():
+                time.sleep(0.05)
+                Injector.inits.append(name)
+                yield name
+            return provider
+
+        Injector.provider('slow1', slow('slow1'))
+        Injector.provider('slow2', slow('slow2'))
+
+        @Injector.factory('both')
+        @jeni.annotate('slow1', 'slow2')
+        def both(slow1, slow2):
+            Injector.inits.append('both')
+            return slow1 + slow2
+
+        @Injector.factory('broken')
+        def broken():
+            raise ValueError('broken')
+
+        @Injector.factory('needs_broken')
+        @jeni.annotate('broken')
+        def needs_broken(broken):
+            "unused"
+
+        Injector.factory('transient', lambda: object(), scope=jeni.TRANSIENT)
+        self.Injector = Injector
+
+    def test_notes(self):
+        injector = self.Injector()
+        times = injector.warm(['both'])
+        self.assertEqual(set(['slow1', 'slow2', 'both']), set(times))
+        self.assertEqual('both', self.Injector.inits[-1])
+        self.assertTrue(times['slow1'] >= 0.05)
+        self.assertTrue(times['both'] < 0.05)
+        self.assertEqual('slow1slow2', injector.values['both'])
+        self.assertEqual(['slow1', 'slow2', 'both'], list(injector.get_order))
+
+    def test_errors(self):
+        injector = self.Injector()
+        try:
+            injector.warm()
+        except jeni.WarmUpError as err:
+            self.assertEqual(['broken'], list(err.errors))
+            self.assertIsInstance(err.errors['broken'], ValueError)
+            self.assertEqual(['needs_broken'], err.skipped)
+            self.assertEqual(
+                set(['slow1', 'slow2', 'both']), set(err.times))
+            self.assertIn("'broken': ValueError('broken'", str(err))
+        else:
+            self.fail('WarmUpError not raised')
+        self.assertNotIn('transient', injector.get_order)
+
+    def test_unregistered(self):
+        injector = self.Injector()
+        try:
+            injector.warm(['nothing', 'slow1'])
+        except jeni.WarmUpError as err:
+            self.assertIsInstance(err.errors['nothing'], LookupError)
+            self.assertEqual(['slow1'], list(err.times))
+        else:
+            self.fail('WarmUpError not raised')
+
+    def test_optional(self):
+        @self.Injector.factory('handler')
+        @jeni.annotate('slow1', optional=jeni.maybe('optional'))
+        def handler(slow1, optional=None):
+            return slow1, optional
+
+        injector = self.Injector()
+        self.assertEqual(
+            set(['slow1', 'handler']), set(injector.warm(['handler'])))
+        self.assertEqual(('slow1', None), injector.values['handler'])
+
+    def test_by_name(self):
+        @self.Injector.provider('kv')
+        class KeyValueProvider(jeni.Provider):
+            def get(self, name=None):
+                if name is None:
+                    raise jeni.UnsetError()
+                return name
+
+        @self.Injector.factory('kv_broken')
+        def kv_broken(name=None):
+            raise jeni.UnsetError()
+
+        injector = self.Injector()
+        times = injector.warm(['kv'])
+        self.assertEqual(['kv'], list(times))
+        self.assertIsInstance(injector.instances['kv'], KeyValueProvider)
+        self.assertEqual('a', injector.get('kv:a'))
+        with self.assertRaises(jeni.WarmUpError) as context:
+            injector.warm(['kv_broken'])
+        self.assertIsInstance(
+            context.exception.errors['kv_broken'], jeni.UnsetError)
+
+    @unittest.skipIf(ThreadPoolExecutor is None, 'requires futures')
+    def test_executor(self):
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            injector = self.Injector(executor=executor)
+            start = time.time()
+            injector.warm(['both', 'transient'])
+            self.assertTrue(time.time() - start < 0.1)
+            self.assertEqual(
+                set(['slow1', 'slow2']), set(self.Injector.inits[:2]))
+            self.assertRaises(
+                ValueError, self.Injector().warm, executor=executor)
+        finally:
+            executor.shutdown()
+
+
+class MemoTestCase(unittest.TestCase):
+    def setUp(self):
+        class Injector(jeni.Injector):
+            pass
+
+        self.calls = calls = []
+
+        @Injector.factory('header', memoize=2)
+        def header(name=None):
+            calls.append(name)
+            return name.upper()
+
+        @Injector.provider('spam', name=True, memoize=True)
+        def spam():
+            count_str = yield 'spam'
+            while True:
+                calls.append(count_str)
+                count_str = yield 'spam' * int(count_str)
+
+        self.Injector = Injector
+        self.injector = Injector()
+
+    def test_memoize(self):
+        for _ in range(3):
+            self.assertEqual('A', self.injector.get('header:a'))
+        self.assertEqual(['a'], self.calls)
+        self.assertEqual('spamspam', self.injector.get('spam:2'))
+        self.assertEqual('spamspam', self.injector.get('spam:2'))
+        self.assertEqual(['a', '2'], self.calls)
+        self.assertEqual(
+            {'hits': 2, 'misses': 1, 'size': 1, 'maxsize': 2,
+             'hit_rate': 2 / 3.0},
+            self.injector.memo_stats()['header'])
+        self.assertEqual(
+            jeni.Injector.memo_size,
+            self.injector.memo_stats()['spam']['maxsize'])
+
+    def test_evict_least_recently_used(self):
+        get = self.injector.get
+        get('header:a'), get('header:b'), get('header:a'), get('header:c')
+        self.assertEqual(['a', 'b', 'c'], self.calls)
+        memo = self.injector.memos['header']
+        self.assertEqual(['a', 'c'], list(memo.values))
+        get('header:a'), get('header:b')
+        self.assertEqual(['a', 'b', 'c', 'b'], self.calls)
+
+    def test_per_injector(self):
+        self.injector.get('header:a')
+        self.injector.close()
+        self.injector.reset()
+        self.assertEqual({}, self.injector.memo_stats())
+        self.injector.get('header:a')
+        self.Injector().get('header:a')
+        self.assertEqual(['a', 'a', 'a'], self.calls)
+
+    def test_invalid(self):
+        self.assertRaises(
+            ValueError, self.Injector.factory, 'now', lambda: None,
+            scope=jeni.TRANSIENT, memoize=True)
+        self.assertRaises(
+            ValueError, self.Injector.factory, 'now', lambda: None,
+            memoize=-1)
+
+
+class GetManyTestCase(unittest.TestCase):
+    def setUp(self):
+        class Injector(jeni.Injector):
+            pass
+
+        self.calls = calls = []
+        store = {'a': 1, 'b': 2, 'c': 3}
+
+        @Injector.provider('kv')
+        class KeyValueProvider(jeni.Provider):
+            def get(self, name=None):
+                calls.append(('get', name))
+                if name not in store:
+                    raise jeni.UnsetError()
+                return store[name]
+
+            def get_many(self, names):
+                calls.append(('get_many', names))
+                if any(name not in store for name in names):
+                    raise jeni.UnsetError()
+                return [store[name] for name in names]
+
+        @Injector.factory('echo')
+        def echo(name=None):
+            calls.append(('get', name))
+            return name
+
+        self.Injector = Injector
+        self.injector = Injector()
+
+    def test_get_many(self):
+        self.assertEqual(
+            [1, 2, 'x', 1], self.injector.get_many(
+                ['kv:a', 'kv:b', 'echo:x', 'kv:a']))
+        self.assertEqual([('get_many', ('a', 'b')), ('get', 'x')], self.calls)
+        self.assertEqual(2, self.injector.stats['kv:a'])
+        self.assertEqual(['kv', 'echo'], list(self.injector.get_order))
+
+    def test_apply(self):
+        @jeni.annotate('kv:a', 'kv:b', c='kv:c', x='echo:x', y='echo:y')
+        def fn(a, b, c, x, y):
+            return a, b, c, x, y
+
+        self.assertEqual((1, 2, 3, 'x', 'y'), self.injector.apply(fn))
+        # Keyword notes are in order of the dict, arbitrary on Python 2.
+        self.assertEqual(('get_many', ('a', 'b', 'c')), self.calls[0])
+        self.assertEqual(
+            [('get', 'x'), ('get', 'y')], sorted(self.calls[1:]))
+
+    def test_fallback(self):
+        @jeni.annotate('kv:a', missing=jeni.maybe('kv:missing'))
+        def fn(a, missing=None):
+            return a, missing
+
+        self.assertEqual((1, None), self.injector.apply(fn))
+        self.assertEqual(
+            [('get_many', ('a', 'missing')),
+             ('get', 'a'), ('get', 'missing')], self.calls)
+
+    def test_memoize(self):
+        self.Injector.provider(
+            'kv', self.Injector.lookup('kv'), memoize=True)
+        self.injector.get('kv:a')
+        self.assertEqual([1, 2], self.injector.get_many(['kv:a', 'kv:b']))
+        self.assertEqual([('get', 'a'), ('get_many', ('b',))], self.calls)
+
+
+class LazyPartialCallTestCase(unittest.TestCase):
+    def setUp(self):
+        class Injector(jeni.Injector):
+            pass
+
+        self.calls = calls = []
+
+        @Injector.factory('slow')
+        def slow():
+            calls.append('slow')
+            time.sleep(0.01)
+            return 'slow'
+
+        @jeni.annotate('slow', flag=jeni.maybe('flag'))
+        def fn(slow, *a, **kw):
+            return slow, a, kw
+
+        self.fn = fn
+        self.injector = Injector(thread_safe=True)
+
+    def test_inject_once(self):
+        partial = self.injector.partial(self.fn, 'a', letter='b')
+        self.assertIsInstance(partial, jeni.LazyPartial)
+        self.assertIs(None, partial.pack)
+        threads = [
+            threading.Thread(target=partial, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(['slow'], self.calls)
+        self.assertEqual(
+            ('slow', ('a', 1), {'letter': 'b', 'c': 2}), partial(1, c=2))
+        self.assertEqual(('slow', ('a',), {'letter': 'b'}), partial())
+
+    def test_retry_on_error(self):
+        partial = self.injector.partial(self.fn)
+        self.injector.close()
+        self.assertRaises(RuntimeError, partial)
+        self.assertIs(None, partial.pack)
+
+
+class CompileTestCase(unittest.TestCase):
+    def setUp(self):
+        class Injector(jeni.Injector):
+            pass
+
+        self.calls = calls = []
+
+        @Injector.factory('database')
+        def database():
+            calls.append('database')
+            return 'database'
+
+        ticks = iter(range(100))
+        Injector.factory('now', lambda: next(ticks), scope=jeni.TRANSIENT)
+        Injector.factory('echo', lambda name=None: name)
+
+        @jeni.annotate(
+            'database', 'echo:x', now='now', cache=jeni.maybe('cache'))
+        def handler(database, x, *a, **kw):
+            "Handle request."
+            return database, x, a, kw
+
+        self.Injector = Injector
+        self.handler = handler
+        self.injector = Injector()
+
+    def test_compile(self):
+        compiled = self.injector.compile(self.handler)
+        self.assertEqual('handler', compiled.__name__)
+        self.assertEqual('Handle request.', compiled.__doc__)
+        self.assertEqual(False, self.injector.has_annotations(compiled))
+        self.assertEqual(
+            ('database', 'x', (), {'now': 0}), compiled())
+        self.assertEqual(
+            ('database', 'x', (1,), {'now': 1, 'cache': 2}),
+            compiled(1, cache=2))
+        self.assertEqual(
+            self.injector.apply(self.handler, 1, now=3), compiled(1, now=3))
+        self.assertEqual(['database'], self.calls)
+        self.Injector.value('cache', 'cache')
+        self.assertEqual('cache', compiled()[3]['cache'])
+
+    def test_reset(self):
+        compiled = self.injector.inject(self.handler)
+        compiled()
+        self.injector.close()
+        self.assertRaises(RuntimeError, compiled)
+        self.injector.reset()
+        self.assertEqual('database', compiled()[0])
+        self.assertEqual(['database', 'database'], self.calls)
+
+    def test_source(self):
+        @jeni.annotate('database', echo='echo:x')
+        def fn(database, echo):
+            return database, echo
+        plan = self.injector.get_plan(fn)
+        source, _ = self.injector.compile_source(fn, plan)
+        self.assertIn('v0 = values[b0]', source)
+        self.assertIn('return fn(v0, *a, echo=get(n1))', source)
+        self.assertEqual(
+            ('database', 'x'), self.injector.compile(fn)())
+
+    def test_child(self):
+        self.injector.get('database')
+        child = self.injector.child()
+        self.assertEqual('database', child.compile(self.handler)()[0])
+        self.assertEqual(['database'], self.calls)
+
+
+class StatsPolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        class Injector(BasicInjector):
+            stats_aggregate = jeni.StatsAggregate()
+
+        self.Injector = Injector
+
+    def test_off(self):
+        self.Injector.stats_policy = jeni.STATS_OFF
+        injector = self.Injector()
+        self.assertEqual('Hello, world!', injector.get('hello'))
+        self.assertEqual({}, dict(injector.stats))
+
+    def test_sampled(self):
+        self.Injector.stats_policy = 4
+        injector = self.Injector(thread_safe=True)
+        for _ in range(40):
+            injector.get('hello')
+        self.assertEqual(40, injector.stats['hello'])
+
+    def test_aggregate(self):
+        for name in ('a', 'b', 'c'):
+            with self.Injector() as injector:
+                injector.get('hello')
+                injector.get('hello:' + name)
+                injector.partial(hello_partial)()
+        with self.Injector() as injector:
+            injector.apply(hello_again_partial)
+        aggregate = self.Injector.stats_aggregate
+        self.assertEqual(4, aggregate.injectors)
+        self.assertEqual(3, aggregate['hello'])
+        self.assertEqual(0.75, aggregate.mean('hello'))
+        self.assertEqual(4, aggregate['hello:partial'])
+        self.assertEqual(1, aggregate[(jeni.PARTIAL, 'hello_partial')])
+        aggregate.clear()
+        self.assertEqual(0, aggregate.mean('hello'))
+
+
+class TryGetTestCase(unittest.TestCase):
+    def setUp(self):
+        self.injector = UnsetInjector()
+
+    def test_try_get(self):
+        default = object()
+        self.assertIs(default, self.injector.try_get('missing', default))
+        self.assertIs(None, self.injector.try_get('unset_msg'))
+        self.injector.values['resolved'] = 'resolved'
+        self.assertEqual('resolved', self.injector.try_get('resolved'))
+        self.assertEqual(1, self.injector.stats['missing'])
+        self.assertEqual(1, self.injector.stats['unset_msg'])
+        self.injector.close()
+        self.assertRaises(RuntimeError, self.injector.try_get, 'missing')
+
+    def test_can_provide(self):
+        self.assertEqual(True, self.injector.can_provide('unset_msg'))
+        self.assertEqual(True, self.injector.can_provide('unset_msg:name'))
+        self.assertEqual(False, self.injector.can_provide('missing'))
+        self.assertEqual(False, self.injector.can_provide(('missing', [])))
+        self.assertEqual(
+            True, self.injector.can_provide(jeni.partial(hello_partial)))
+        self.injector.values['resolved'] = 'resolved'
+        self.assertEqual(
+            True, self.injector.child().can_provide('resolved'))
+
+    def test_maybe_missing(self):
+        @jeni.annotate(missing=jeni.maybe('missing'))
+        def fn(missing='default'):
+            return missing
+
+        self.injector.lookup_registration = None # Must not be called.
+        self.assertEqual('default', self.injector.apply(fn))
+        self.assertEqual(1, self.injector.stats['missing'])
+
+    def test_unset_error(self):
+        class Injector(UnsetInjector):
+            pass
+
+        error = jeni.UnsetError()
+
+        @Injector.factory('unset_instance')
+        def unset_instance():
+            raise error
+
+        try:
+            Injector().get('unset_instance')
+        except jeni.UnsetError as err:
+            self.assertIs(error, err)
+            self.assertEqual('unset_instance', err.note)
+        else:
+            self.fail('UnsetError not raised')
+
+
+class TimeoutTestCase(unittest.TestCase):
+    def setUp(self):
+        class Injector(jeni.Injector):
+            pass
+
+        self.Injector = Injector
+        self.release = release = threading.Event()
+        self.addCleanup(release.set)
+
+        @Injector.factory('slow', timeout=0.05)
+        def slow():
+            release.wait(5)
+            return 'slow'
+
+        @Injector.factory('handler')
+        @jeni.annotate('slow')
+        def handler(slow):
+            return slow
+
+    def test_timeout(self):
+        injector = self.Injector()
+        try:
+            injector.get('handler')
+        except jeni.ResolutionTimeoutError as err:
+            self.assertEqual('slow', err.note)
+            self.assertEqual(['handler', 'slow'], err.path)
+            self.assertAlmostEqual(0.05, err.timeout)
+            self.assertIn("'handler' -> 'slow'", str(err))
+        else:
+            self.fail('ResolutionTimeoutError not raised')
+        self.assertEqual([], injector.resolving())
+
+    def test_maybe(self):
+        @jeni.annotate(slow=jeni.maybe('slow'))
+        def fn(slow='default'):
+            return slow
+
+        self.assertEqual('default', self.Injector().apply(fn))
+
+    def test_within_timeout(self):
+        @self.Injector.factory('fast', timeout=5)
+        def fast():
+            return 'fast'
+
+        @self.Injector.factory('broken', timeout=5)
+        def broken():
+            raise KeyError('broken')
+
+        injector = self.Injector(thread_safe=True)
+        self.assertEqual('fast', injector.get('fast'))
+        self.assertRaises(KeyError, injector.get, 'broken')
+
+    def test_resolve_after_timeout(self):
+        resolved = threading.Event()
+
+        @self.Injector.factory('dependency')
+        def dependency():
+            self.release.wait(5)
+            return 'dependency'
+
+        @self.Injector.factory('late', timeout=0.05)
+        @jeni.annotate('dependency')
+        def late(dependency):
+            resolved.set()
+            return 'late'
+
+        @self.Injector.factory('needs_late')
+        @jeni.annotate('late')
+        def needs_late(late):
+            return late
+
+        injector = self.Injector()
+        self.assertRaises(jeni.ResolutionTimeoutError, injector.get, 'late')
+        self.assertEqual([], injector.resolving())
+        self.release.set()
+        resolved.wait(5)
+        for thread in threading.enumerate():
+            if thread.name == "jeni 'late'":
+                thread.join(5)
+        self.assertNotIn('late', injector.values)
+        self.assertEqual('late', injector.get('needs_late'))
+
+    def test_discard_late_instance(self):
+        closed = []
+        release = self.release
+
+        @self.Injector.provider('late_provider', timeout=0.05)
+        class LateProvider(jeni.Provider):
+            def get(self, name=None):
+                release.wait(5)
+                return 'late'
+
+            def close(self):
+                closed.append(self)
+
+        injector = self.Injector(thread_safe=True)
+        self.assertRaises(
+            jeni.ResolutionTimeoutError, injector.get, 'late_provider')
+        self.release.set()
+        for thread in threading.enumerate():
+            if thread.name == "jeni 'late_provider'":
+                thread.join(5)
+        self.assertEqual(1, len(closed))
+        self.assertNotIn('late_provider', injector.instances)
+
+    def test_retry_after_timeout(self):
+        closed = []
+        release = self.release
+
+        @self.Injector.provider('retried', timeout=0.05)
+        class RetriedProvider(jeni.Provider):
+            def __init__(self):
+                if not closed:
+                    closed.append(None)
+                    release.wait(5)
+
+            def get(self, name=None):
+                return self
+
+            def close(self):
+                closed.append(self)
+
+        injector = self.Injector(thread_safe=True)
+        self.assertRaises(
+            jeni.ResolutionTimeoutError, injector.get, 'retried')
+        provider = injector.get('retried')
+        self.release.set()
+        for thread in threading.enumerate():
+            if thread.name == "jeni 'retried'":
+                thread.join(5)
+        self.assertIs(provider, injector.instances['retried'])
+        self.assertIs(provider, injector.get('retried'))
+        self.assertEqual(2, len(closed))
+        self.assertIsNot(provider, closed[1])
+
+    def test_deadline_per_injector(self):
+        ticks = iter([0, 1.5])
+
+        class Injector(self.Injector):
+            clock = staticmethod(lambda: next(ticks))
+
+        Injector.factory('first', lambda: 'first')
+        Injector.factory('second', lambda: 'second')
+        injector = Injector(deadline=1.0)
+        self.assertEqual('first', injector.get('first'))
+        with self.assertRaises(jeni.ResolutionTimeoutError) as context:
+            injector.apply(jeni.annotate('first', 'second')(lambda *a: a))
+        self.assertEqual('second', context.exception.note)
+        self.assertEqual(['second'], context.exception.path)
+
+    def test_nested_thread(self):
+        threads = []
+
+        @self.Injector.factory('inner')
+        def inner():
+            threads.append(threading.current_thread())
+
+        @self.Injector.factory('outer')
+        @jeni.annotate('inner')
+        def outer(inner):
+            threads.append(threading.current_thread())
+
+        self.Injector(deadline=5).get('outer')
+        self.assertEqual(2, len(threads))
+        self.assertIs(threads[0], threads[1])
+        self.assertIsNot(threading.current_thread(), threads[0])
+
+    def test_deadline(self):
+        ticks = iter([0, 10, 20, 30])
+
+        class Injector(self.Injector):
+            clock = staticmethod(lambda: next(ticks))
+
+        @Injector.provider('service')
+        class Service(jeni.Provider):
+            @jeni.annotate('fast')
+            def __init__(self, fast):
+                self.fast = fast
+
+            def get(self, name=None):
+                return self.fast
+
+        Injector.factory('fast', lambda: 'fast')
+        for thread_safe in (False, True):
+            injector = Injector(thread_safe=thread_safe, deadline=1.0)
+            with self.assertRaises(jeni.ResolutionTimeoutError) as context:
+                injector.get('service')
+            self.assertEqual('fast', context.exception.note)
+            self.assertEqual(['service', 'fast'], context.exception.path)
+
+    def test_deadline_threads(self):
+        threads = set()
+
+        def record(note):
+            threads.add(threading.current_thread())
+            return note
+
+        self.Injector.value('constant', 'constant')
+        self.Injector.factory('first', lambda: record('first'))
+        self.Injector.factory('second', lambda: record('second'))
+        count = threading.active_count()
+        injector = self.Injector(deadline=5.0)
+        self.assertEqual('constant', injector.get('constant'))
+        self.assertEqual(count, threading.active_count())
+        fn = jeni.annotate('constant', 'first', 'second')(lambda *a: a)
+        self.assertEqual(
+            ('constant', 'first', 'second'), injector.apply(fn))
+        self.assertEqual(1, len(threads))
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_child(self):
+        injector = self.Injector(deadline=2.0)
+        self.assertEqual(2.0, injector.child().deadline)
+        self.assertEqual(None, injector.child(deadline=None).deadline)
+
+    def test_invalid(self):
+        self.assertRaises(
+            ValueError, self.Injector.factory, 'invalid', str, timeout=0)
+        self.assertRaises(ValueError, self.Injector, deadline=-1)
+
+
+class LazyTestCase(unittest.TestCase):
+    def setUp(self):
+        class Injector(jeni.Injector):
+            pass
+
+        self.log = log = []
+
+        @Injector.provider('cache')
+        def cache():
+            log.append('open cache')
+            yield {'hello': 'world'}
+            log.append('close cache')
+
+        @Injector.provider('database')
+        def database():
+            log.append('open database')
+            yield 'database'
+            log.append('close database')
+
+        @Injector.factory('handler')
+        @jeni.annotate('database', cache=jeni.lazy('cache'))
+        def handler(database, cache):
+            return cache
+
+        self.Injector = Injector
+        self.injector = Injector()
+
+    def test_resolve_on_use(self):
+        cache = self.injector.get('handler')
+        self.assertIsInstance(cache, jeni.LazyProxy)
+        self.assertEqual(False, cache.resolved)
+        self.assertEqual(['open database'], self.log)
+        self.assertEqual('world', cache['hello'])
+        self.assertEqual(True, cache.resolved)
+        self.assertEqual(['world'], list(cache.values()))
+        self.assertEqual(
+            ['database', 'handler', 'cache'],
+            list(self.injector.get_order))
+        self.injector.close()
+        self.assertEqual(
+            ['open database', 'open cache',
+             'close cache', 'close database'], self.log)
+
+    def test_unused(self):
+        cache = self.injector.get('handler')
+        self.assertIn('unresolved', repr(cache))
+        self.injector.close()
+        self.assertEqual(['open database', 'close database'], self.log)
+        self.assertRaises(RuntimeError, lambda: cache['hello'])
+
+    def test_graph(self):
+        graph = self.Injector.dependency_graph()
+        self.assertEqual(True, graph.edges['handler']['cache'].lazy)
+        self.assertEqual(False, graph.edges['handler']['database'].lazy)
+        self.assertEqual(['database'], graph.dependencies('handler', False))
+
+
 class MoreAnnotationTests(unittest.TestCase):
     def test_multiple_annotations(self):
         @jeni.annotate('foo', 'bar')
@@ -938,6 +2580,80 @@ class MoreAnnotationTests(unittest.TestCase):
         self.assertEqual('spameggs!', injector.apply(X.eat))
 
 
+class InjectionPlanTestCase(unittest.TestCase):
+    def setUp(self):
+        self.injector = BasicInjector()
+        @jeni.annotate('hello:x', 'eggs', spam=jeni.maybe('spam:2'))
+        def fn(hello, eggs, spam=None):
+            return hello, eggs, spam
+        self.fn = fn
+
+    def test_compile(self):
+        plan = self.injector.get_plan(self.fn)
+        self.assertEqual(
+            (jeni.Note.parse('hello:x'), jeni.Note.parse('eggs')), plan.args)
+        self.assertEqual((('spam', jeni.Note.parse('spam:2'), True),),
+                         plan.kwargs)
+
+    def test_compile_partial(self):
+        note = jeni.partial(self.fn)
+        plan = jeni.InjectionPlan.compile((note,), {})
+        self.assertEqual(jeni.PARTIAL, plan.args[0].mode)
+
+    def test_cached(self):
+        plan = self.injector.get_plan(self.fn)
+        self.assertIs(plan, BasicInjector().get_plan(self.fn))
+        self.assertEqual(
+            ('Hello, x!', 'eggs!', 'spamspam'), self.injector.apply(self.fn))
+
+    def test_cached_method(self):
+        class X(object):
+            @jeni.annotate('spam', 'eggs')
+            def eat(self, spam, eggs):
+                return spam + eggs
+        self.assertIs(
+            self.injector.get_plan(X().eat), self.injector.get_plan(X().eat))
+
+    def test_bounded(self):
+        class Injector(BasicInjector):
+            plans = {}
+            plan_cache_size = 2
+        injector = Injector()
+        injector.get_plan(self.fn)
+        injector.get_plan(spam_eggs)
+        self.assertEqual(2, len(Injector.plans))
+        injector.get_plan(unset_arg)
+        self.assertEqual(1, len(Injector.plans))
+
+    def test_not_annotated(self):
+        self.assertRaises(
+            AttributeError, self.injector.get_plan, lambda: None)
+
+    def test_annotator_class(self):
+        class UpperAnnotator(jeni.Annotator):
+            @classmethod
+            def get_annotations(cls, fn):
+                notes, keyword_notes = super(
+                    UpperAnnotator, cls).get_annotations(fn)
+                return tuple(note.upper() for note in notes), keyword_notes
+
+        class Injector(jeni.Injector):
+            pass
+
+        class UpperInjector(Injector):
+            annotator_class = UpperAnnotator
+
+        Injector.value('x', 'lower')
+        Injector.value('X', 'upper')
+
+        @jeni.annotate('x')
+        def fn(x):
+            return x
+
+        self.assertEqual('lower', Injector().apply(fn))
+        self.assertEqual('upper', UpperInjector().apply(fn))
+
+
 class TestBrokenProvider(unittest.TestCase):
     class TestInjector(jeni.Injector):
         pass
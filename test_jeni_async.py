@@ -0,0 +1,551 @@
+import asyncio
+import unittest
+
+import jeni
+import jeni_async
+
+from test_jeni import BasicInjector, CloseMe
+
+
+class AsyncInjector(jeni_async.AsyncInjector, BasicInjector):
+    pass
+
+
+@AsyncInjector.factory('async_echo')
+async def async_echo(name=None):
+    await asyncio.sleep(0)
+    return name
+
+
+@AsyncInjector.provider('async_answer')
+async def async_answer():
+    yield 42
+
+
+@AsyncInjector.provider('async_spam', name=True)
+async def async_spam():
+    count_str = yield 'spam'
+    while True:
+        count_str = yield 'spam' * int(count_str)
+
+
+@AsyncInjector.provider('async_closing')
+async def async_closing():
+    thing = CloseMe('async_closing')
+    thing.open()
+    yield thing
+    thing.close()
+
+
+@AsyncInjector.provider('async_hello')
+class AsyncHelloProvider(jeni.Provider):
+    async def get(self, name=None):
+        if name is None:
+            name = 'world'
+        return 'Hello, {}!'.format(name)
+
+
+@AsyncInjector.factory('async_unset')
+async def async_unset():
+    raise jeni.UnsetError()
+
+
+class AsyncTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.injector = AsyncInjector()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_until_complete(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+
+class AsyncInjectorTestCase(AsyncTestCase):
+    def test_sync_providers(self):
+        get = lambda note: self.run_until_complete(self.injector.get(note))
+        self.assertEqual('Hello, thing!', get('hello:thing'))
+        self.assertEqual('eggs!', get('eggs'))
+        self.assertEqual(0, get('zero'))
+        self.assertEqual(42, get('answer'))
+        self.assertEqual('spamspam', get('spam:2'))
+
+    def test_async_providers(self):
+        get = lambda note: self.run_until_complete(self.injector.get(note))
+        self.assertEqual('thing', get('async_echo:thing'))
+        self.assertEqual(42, get('async_answer'))
+        self.assertEqual('spam', get('async_spam'))
+        self.assertEqual('spamspamspam', get('async_spam:3'))
+        self.assertEqual('Hello, async!', get('async_hello:async'))
+        self.assertEqual(1, self.injector.stats['async_spam:3'])
+
+    def test_not_registered(self):
+        self.assertRaises(
+            LookupError, self.run_until_complete, self.injector.get('nothing'))
+
+    def test_unset(self):
+        self.assertRaises(
+            jeni.UnsetError,
+            self.run_until_complete, self.injector.get('async_unset'))
+
+    def test_apply(self):
+        @jeni.annotate('async_hello', 'eggs', answer='async_answer')
+        async def fn(hello, eggs, answer=None):
+            return hello, eggs, answer
+        self.assertEqual(
+            ('Hello, world!', 'eggs!', 42),
+            self.run_until_complete(self.injector.apply(fn)))
+
+    def test_maybe(self):
+        @jeni.annotate(
+            'eggs', unset=jeni.maybe('async_unset'), no=jeni.maybe('nothing'))
+        def fn(eggs, unset=None, no=None):
+            return eggs, unset, no
+        self.assertEqual(
+            ('eggs!', None, None),
+            self.run_until_complete(self.injector.apply(fn)))
+
+    def test_first_error(self):
+        @jeni.annotate('nothing', 'async_unset')
+        def fn(nothing, unset):
+            "unused"
+        try:
+            self.run_until_complete(self.injector.apply(fn))
+        except LookupError as err:
+            self.assertNotIsInstance(err, jeni.UnsetError)
+        else:
+            self.fail('LookupError not raised')
+
+    def test_partial(self):
+        @jeni.annotate('eggs', unset='async_unset')
+        async def fn(eggs, extra, unset=None):
+            return eggs, extra, unset
+        partial = self.injector.partial(fn)
+        self.assertEqual(
+            ('eggs!', 'extra', None),
+            self.run_until_complete(partial('extra')))
+        eager = self.run_until_complete(self.injector.eager_partial(fn))
+        self.assertEqual(
+            ('eggs!', 'extra', None), self.run_until_complete(eager('extra')))
+
+    def test_partial_note(self):
+        @jeni.annotate('eggs')
+        def eat(eggs):
+            return eggs
+        @jeni.annotate(jeni.annotate.partial(eat))
+        async def fn(eat):
+            return await eat()
+        self.assertEqual(
+            'eggs!', self.run_until_complete(self.injector.apply(fn)))
+
+    def test_regardless(self):
+        async def fn(*a):
+            return a
+        self.assertEqual(
+            ('a',),
+            self.run_until_complete(self.injector.apply_regardless(fn, 'a')))
+        partial = self.injector.partial_regardless(fn, 'a')
+        self.assertEqual(('a', 'b'), self.run_until_complete(partial('b')))
+
+    def test_annotated_generator(self):
+        class Injector(AsyncInjector):
+            pass
+        @Injector.provider('annotated')
+        @jeni.annotate('async_echo:echo')
+        async def annotated(echo):
+            yield echo
+        injector = Injector()
+        self.assertEqual(
+            'echo', self.run_until_complete(injector.get('annotated')))
+
+
+class ConcurrencyTestCase(AsyncTestCase):
+    def setUp(self):
+        super(ConcurrencyTestCase, self).setUp()
+
+        class Injector(AsyncInjector):
+            running = 0
+            max_running = 0
+            inits = 0
+
+        async def slow(name=None):
+            Injector.running += 1
+            Injector.max_running = max(Injector.max_running, Injector.running)
+            await asyncio.sleep(0.01)
+            Injector.running -= 1
+            return name
+
+        @Injector.provider('slow_generator')
+        async def slow_generator():
+            Injector.inits += 1
+            yield await slow('generator')
+
+        Injector.factory('slow1', slow)
+        Injector.factory('slow2', slow)
+        Injector.factory('slow3', slow)
+        self.Injector = Injector
+        self.injector = Injector()
+
+    def test_concurrent(self):
+        @jeni.annotate('slow1:a', 'slow2:b', c='slow3:c')
+        def fn(a, b, c=None):
+            return a, b, c
+        self.assertEqual(
+            ('a', 'b', 'c'), self.run_until_complete(self.injector.apply(fn)))
+        self.assertEqual(3, self.Injector.max_running)
+
+    def test_single_flight(self):
+        @jeni.annotate('slow_generator', 'slow_generator', g='slow_generator')
+        def fn(a, b, g=None):
+            return a, b, g
+        self.assertEqual(
+            ('generator', 'generator', 'generator'),
+            self.run_until_complete(self.injector.apply(fn)))
+        self.assertEqual(1, self.Injector.inits)
+        self.assertEqual(['slow_generator'], list(self.injector.get_order))
+        self.assertEqual(3, self.injector.stats['slow_generator'])
+
+
+class AsyncScopeTestCase(AsyncTestCase):
+    def test_singleton(self):
+        class Injector(AsyncInjector):
+            pass
+
+        @Injector.provider('pool', scope=jeni.SINGLETON)
+        async def pool():
+            thing = CloseMe('async_pool')
+            thing.open()
+            yield thing
+            thing.close()
+
+        async def run():
+            async with Injector() as first:
+                pool = await first.get('pool')
+            async with Injector() as second:
+                self.assertIs(pool, await second.get('pool'))
+            self.assertEqual(False, pool.closed)
+            await Injector.shutdown()
+            return pool
+        self.assertEqual(True, self.run_until_complete(run()).closed)
+
+
+class AsyncCloseTestCase(AsyncTestCase):
+    def test_async_with(self):
+        async def run():
+            async with AsyncInjector() as injector:
+                thing = await injector.get('async_closing')
+                self.assertEqual(False, thing.closed)
+            return thing
+        thing = self.run_until_complete(run())
+        self.assertEqual(True, thing.closed)
+
+    def test_close_order(self):
+        num_prev_closed_items = len(CloseMe.closed_items)
+        async def run():
+            await self.injector.get('async_closing')
+            await self.injector.get('answer')
+            await self.injector.close()
+        self.run_until_complete(run())
+        self.assertEqual(
+            ['async_closing'],
+            [x.note for x in CloseMe.closed_items[num_prev_closed_items:]])
+        self.assertRaises(
+            RuntimeError, self.run_until_complete, self.injector.close())
+
+    def test_with_not_supported(self):
+        def with_block():
+            with self.injector:
+                "unused"
+        self.assertRaises(TypeError, with_block)
+
+
+class AsyncInstrumentTestCase(AsyncTestCase):
+    def test_instrument(self):
+        instrument = jeni.Instrument()
+        injector = AsyncInjector(instrument=instrument)
+        async def run():
+            await injector.get('async_closing')
+            await injector.get('async_closing')
+            await injector.get('async_echo:name')
+            with self.assertRaises(jeni.UnsetError):
+                await injector.get('async_unset')
+            await injector.close()
+        self.run_until_complete(run())
+        snapshot = instrument.snapshot()
+        timings = snapshot['async_closing']
+        self.assertEqual(1, timings['init']['count'])
+        self.assertEqual(1, timings['get_cold']['count'])
+        self.assertEqual(1, timings['get_warm']['count'])
+        self.assertEqual(1, timings['close']['count'])
+        self.assertEqual(1, snapshot['async_echo']['get_cold']['count'])
+        self.assertEqual(1, snapshot['async_unset']['unset'])
+
+
+class AsyncCyclicDependencyTestCase(AsyncTestCase):
+    @unittest.skipIf(jeni_async.contextvars is None, 'requires contextvars')
+    def test_cycle(self):
+        class Injector(AsyncInjector):
+            pass
+
+        @Injector.provider('a')
+        @jeni.annotate('eggs', 'b')
+        async def a(eggs, b):
+            yield b
+
+        @Injector.factory('b')
+        @jeni.annotate('eggs', 'a')
+        async def b(eggs, a):
+            return a
+
+        injector = Injector()
+        try:
+            self.run_until_complete(injector.get('a'))
+        except jeni.CyclicDependencyError as err:
+            self.assertEqual(['a', 'b', 'a'], err.cycle)
+        else:
+            self.fail('CyclicDependencyError not raised')
+        self.assertEqual({}, injector.pending)
+        self.assertEqual(
+            'eggs!', self.run_until_complete(injector.get('eggs')))
+
+
+class AsyncWarmTestCase(AsyncTestCase):
+    def test_warm(self):
+        class Injector(AsyncInjector):
+            pass
+
+        @Injector.provider('slow')
+        @jeni.annotate('async_echo:echo')
+        async def slow(echo):
+            await asyncio.sleep(0.01)
+            yield echo
+
+        @Injector.factory('broken')
+        async def broken():
+            raise ValueError('broken')
+
+        injector = Injector()
+        times = self.run_until_complete(injector.warm(['slow', 'eggs']))
+        self.assertEqual(set(['slow', 'eggs']), set(times))
+        self.assertEqual('echo', injector.values['slow'])
+        with self.assertRaises(jeni.WarmUpError) as cm:
+            self.run_until_complete(injector.warm(['broken', 'answer']))
+        self.assertEqual(['broken'], list(cm.exception.errors))
+        self.assertEqual(['answer'], list(cm.exception.times))
+
+    def test_by_name(self):
+        class Injector(AsyncInjector):
+            pass
+
+        @Injector.provider('async_kv')
+        class KeyValueProvider(jeni.Provider):
+            async def get(self, name=None):
+                if name is None:
+                    raise jeni.UnsetError()
+                return name
+
+        injector = Injector()
+        times = self.run_until_complete(injector.warm(['async_kv']))
+        self.assertEqual(['async_kv'], list(times))
+        self.assertIn('async_kv', injector.instances)
+
+
+class AsyncChildTestCase(AsyncTestCase):
+    def test_shared(self):
+        async def run():
+            thing = await self.injector.get('async_closing')
+            async with self.injector.child() as child:
+                self.assertIs(thing, await child.get('async_closing'))
+                self.assertEqual('spamspam', await child.get('async_spam:2'))
+            self.assertEqual(False, thing.closed)
+            self.assertEqual(['async_closing'], list(self.injector.get_order))
+            await self.injector.close()
+            return thing
+        self.assertEqual(True, self.run_until_complete(run()).closed)
+
+
+class AsyncPoolTestCase(AsyncTestCase):
+    def test_reuse(self):
+        pool = jeni_async.AsyncInjectorPool(AsyncInjector)
+        async def run():
+            async with pool.injector() as injector:
+                thing = await injector.get('async_closing')
+            async with pool.injector() as reused:
+                self.assertIs(injector, reused)
+                self.assertIsNot(thing, await reused.get('async_closing'))
+            return thing
+        self.assertEqual(True, self.run_until_complete(run()).closed)
+        self.assertEqual(1, len(pool))
+
+
+class AsyncLazyTestCase(AsyncTestCase):
+    def test_lazy(self):
+        @jeni.annotate(closing=jeni.lazy('async_closing'))
+        def fn(closing):
+            return closing
+        async def run():
+            closing = await self.injector.apply(fn)
+            self.assertEqual([], list(self.injector.get_order))
+            thing = await closing()
+            self.assertEqual(['async_closing'], list(self.injector.get_order))
+            await self.injector.close()
+            return thing
+        self.assertEqual(True, self.run_until_complete(run()).closed)
+
+
+class AsyncMemoTestCase(AsyncTestCase):
+    def test_memoize(self):
+        class Injector(AsyncInjector):
+            pass
+
+        calls = []
+
+        @Injector.factory('async_memo', memoize=True)
+        async def async_memo(name=None):
+            calls.append(name)
+            return name
+
+        injector = Injector()
+        async def run():
+            self.assertEqual('a', await injector.get('async_memo:a'))
+            self.assertEqual('a', await injector.get('async_memo:a'))
+        self.run_until_complete(run())
+        self.assertEqual(['a'], calls)
+        self.assertEqual(1, injector.memo_stats()['async_memo']['hits'])
+
+
+class AsyncGetManyTestCase(AsyncTestCase):
+    def test_get_many(self):
+        class Injector(AsyncInjector):
+            pass
+
+        calls = []
+
+        @Injector.provider('kv')
+        class KeyValueProvider(jeni.Provider):
+            async def get(self, name=None):
+                calls.append(name)
+                return name.upper()
+
+            async def get_many(self, names):
+                calls.append(names)
+                return [name.upper() for name in names]
+
+        @jeni.annotate('kv:a', b='kv:b')
+        def fn(a, b):
+            return a + b
+
+        injector = Injector()
+        async def run():
+            self.assertEqual('AB', await injector.apply(fn))
+            self.assertEqual(
+                ['C', 'D', 'E'],
+                await injector.get_many(['kv:c', 'kv:d', 'kv:e']))
+        self.run_until_complete(run())
+        self.assertEqual([('a', 'b'), ('c', 'd', 'e')], calls)
+
+
+class AsyncCompileTestCase(AsyncTestCase):
+    def test_compile(self):
+        @jeni.annotate('async_answer')
+        def fn(answer, *a):
+            return (answer,) + a
+        compiled = self.injector.compile(fn)
+        self.assertEqual('fn', compiled.__name__)
+        self.assertEqual((42, 1), self.run_until_complete(compiled(1)))
+
+
+class AsyncTryGetTestCase(AsyncTestCase):
+    def test_try_get(self):
+        @jeni.annotate(missing=jeni.maybe('missing'))
+        def fn(missing='default'):
+            return missing
+
+        async def run():
+            self.assertEqual(42, await self.injector.try_get('async_answer'))
+            self.assertIs(None, await self.injector.try_get('missing'))
+            self.assertEqual('default', await self.injector.apply(fn))
+        self.run_until_complete(run())
+        self.assertEqual(2, self.injector.stats['missing'])
+
+
+class AsyncTimeoutTestCase(AsyncTestCase):
+    def test_timeout(self):
+        class Injector(AsyncInjector):
+            pass
+
+        @Injector.factory('async_slow', timeout=0.01)
+        async def async_slow():
+            await asyncio.sleep(5)
+
+        @Injector.factory('async_handler')
+        @jeni.annotate('async_slow')
+        async def async_handler(slow):
+            return slow
+
+        @jeni.annotate(slow=jeni.maybe('async_slow'))
+        def fn(slow='default'):
+            return slow
+
+        injector = Injector(deadline=1.0)
+        async def run():
+            with self.assertRaises(jeni.ResolutionTimeoutError) as context:
+                await injector.get('async_handler')
+            self.assertEqual('async_slow', context.exception.note)
+            self.assertEqual(
+                ['async_handler', 'async_slow'], context.exception.path)
+            self.assertEqual('default', await injector.apply(fn))
+        self.run_until_complete(run())
+
+    def test_deadline_per_injector(self):
+        ticks = iter([0, 1.5])
+
+        class Injector(AsyncInjector):
+            clock = staticmethod(lambda: next(ticks))
+
+        injector = Injector(deadline=1.0)
+        async def run():
+            self.assertEqual(42, await injector.get('async_answer'))
+            with self.assertRaises(jeni.ResolutionTimeoutError) as context:
+                await injector.get('async_echo:echo')
+            self.assertEqual('async_echo:echo', context.exception.note)
+        self.run_until_complete(run())
+
+
+class AsyncGeneratorProviderTestCase(AsyncTestCase):
+    def test_generator(self):
+        provider = jeni_async.AsyncGeneratorProvider(async_answer)
+        self.assertRaises(
+            RuntimeError, self.run_until_complete, provider.get())
+        self.assertEqual(42, self.run_until_complete(provider.init()))
+        self.assertEqual(42, self.run_until_complete(provider.get()))
+        self.assertRaises(
+            TypeError, self.run_until_complete, provider.get(name='name'))
+        self.run_until_complete(provider.aclose())
+
+    def test_construction_error(self):
+        def fn():
+            yield
+        self.assertRaises(
+            TypeError, jeni_async.AsyncGeneratorProvider, fn)
+
+    def test_unyielding_generator(self):
+        async def fn(work=False):
+            if work:
+                yield 'foo'
+        provider = jeni_async.AsyncGeneratorProvider(fn)
+        self.assertRaises(
+            RuntimeError, self.run_until_complete, provider.init())
+
+    def test_generator_which_keeps_yielding(self):
+        async def fn():
+            yield 'one'
+            yield 'two'
+        provider = jeni_async.AsyncGeneratorProvider(fn)
+        self.run_until_complete(provider.init())
+        self.assertRaises(
+            RuntimeError, self.run_until_complete, provider.aclose())
+
+
+if __name__ == '__main__': unittest.main()